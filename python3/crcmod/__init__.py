@@ -1,8 +1,15 @@
 try:
     from crcmod.crcmod import *
-    import crcmod.predefined
 except ImportError:
     # Make this backward compatible
     from crcmod import *
     import predefined
 __doc__ = crcmod.__doc__
+
+def __getattr__(name):
+    # crcmod.predefined is imported on first use, which keeps importing crcmod
+    # cheap for the programs that do not need it.
+    if name == 'predefined':
+        import importlib
+        return importlib.import_module(__name__ + '.predefined')
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
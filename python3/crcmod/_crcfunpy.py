@@ -26,6 +26,8 @@
 # SOFTWARE.
 #-----------------------------------------------------------------------------
 
+import _thread, errno, os, stat
+
 def _get_buffer_view(in_obj):
     if isinstance(in_obj, str):
         raise TypeError('Unicode-objects must be encoded before calculating a CRC')
@@ -35,73 +37,1074 @@ def _get_buffer_view(in_obj):
     return mv
 
 
-def _crc8(data, crc, table):
+#-----------------------------------------------------------------------------
+# The data is processed in chunks of at most _CHUNK_SIZE bytes, so a large
+# buffer is never copied as a whole.  Iterating over a bytes object is the
+# fastest way to get at the bytes in Python.
+
+_CHUNK_SIZE = 1 << 16
+
+def _chunks(data):
+    if type(data) is bytes and len(data) <= _CHUNK_SIZE:
+        yield data
+        return
     mv = _get_buffer_view(data)
+    if mv.nbytes <= _CHUNK_SIZE or mv.ndim == 0:
+        yield mv.tobytes()
+        return
+    step = _CHUNK_SIZE
+    try:
+        mv = mv.cast('B')
+    except TypeError:
+        # Not contiguous or an unusual format, so slice by items.
+        step = max(1, _CHUNK_SIZE // mv.itemsize)
+    for i in range(0, len(mv), step):
+        yield mv[i:i+step].tobytes()
+
+#-----------------------------------------------------------------------------
+# Byte at a time loops using the table returned by _mkTable or _mkTable_r.
+# The CRC is kept within its width, so the index of the non-reflected loops
+# needs no mask.
+
+def _crc8(data, crc, table):
     crc = crc & 0xFF
-    for x in mv.tobytes():
-        crc = table[x ^ crc]
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ crc]
     return crc
 
 def _crc8r(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFF
-    for x in mv.tobytes():
-        crc = table[x ^ crc]
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ crc]
     return crc
 
 def _crc16(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ ((crc>>8) & 0xFF)] ^ ((crc << 8) & 0xFF00)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc >> 8)] ^ ((crc << 8) & 0xFF00)
     return crc
 
 def _crc16r(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
     return crc
 
 def _crc24(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ (crc>>16 & 0xFF)] ^ ((crc << 8) & 0xFFFF00)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc >> 16)] ^ ((crc << 8) & 0xFFFF00)
     return crc
 
 def _crc24r(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
     return crc
 
 def _crc32(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFFFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ ((crc>>24) & 0xFF)] ^ ((crc << 8) & 0xFFFFFF00)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc >> 24)] ^ ((crc << 8) & 0xFFFFFF00)
     return crc
 
 def _crc32r(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFFFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
     return crc
 
 def _crc64(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFFFFFFFFFFFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ ((crc>>56) & 0xFF)] ^ ((crc << 8) & 0xFFFFFFFFFFFFFF00)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc >> 56)] ^ ((crc << 8) & 0xFFFFFFFFFFFFFF00)
     return crc
 
 def _crc64r(data, crc, table):
-    mv = _get_buffer_view(data)
     crc = crc & 0xFFFFFFFFFFFFFFFF
-    for x in mv.tobytes():
-        crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    for chunk in _chunks(data):
+        for x in chunk:
+            crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    return crc
+
+#-----------------------------------------------------------------------------
+# Slicing-by-8 loops used by CrcEngine.  tables holds the 8 tables built by
+# _mkSliceTables, where table k is the CRC of each byte value followed by k
+# zero bytes.  Each step computes the CRC of 8 bytes from 8 independent
+# lookups: the bytes that overlap the CRC register are XORed with it, the
+# others are looked up directly.  The 8 bytes of each step come from strided
+# slices of the chunk, which is much faster than unpacking words with
+# int.from_bytes or struct.  Chunks shorter than _SLICE_MIN_LEN and the last
+# few bytes of each chunk are processed a byte at a time.
+
+_SLICE_MIN_LEN = 64
+
+def _slices(chunk):
+    n = len(chunk) & ~7
+    if n < _SLICE_MIN_LEN:
+        return 0, ()
+    return n, zip(chunk[0:n:8], chunk[1:n:8], chunk[2:n:8], chunk[3:n:8],
+                  chunk[4:n:8], chunk[5:n:8], chunk[6:n:8], chunk[7:n:8])
+
+def _slice8(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ crc] ^ t6[b] ^ t5[c] ^ t4[d] ^
+                   t3[e] ^ t2[f] ^ t1[g] ^ t0[h])
+        for x in chunk[n:]:
+            crc = t0[x ^ crc]
+    return crc
+
+_slice8r = _slice8
+
+def _slice16(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc >> 8)] ^ t6[b ^ (crc & 0xFF)] ^ t5[c] ^ t4[d] ^
+                   t3[e] ^ t2[f] ^ t1[g] ^ t0[h])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc >> 8)] ^ ((crc << 8) & 0xFF00)
+    return crc
+
+def _slice16r(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc & 0xFF)] ^ t6[b ^ (crc >> 8)] ^ t5[c] ^ t4[d] ^
+                   t3[e] ^ t2[f] ^ t1[g] ^ t0[h])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    return crc
+
+def _slice24(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc >> 16)] ^ t6[b ^ ((crc >> 8) & 0xFF)] ^
+                   t5[c ^ (crc & 0xFF)] ^ t4[d] ^
+                   t3[e] ^ t2[f] ^ t1[g] ^ t0[h])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc >> 16)] ^ ((crc << 8) & 0xFFFF00)
+    return crc
+
+def _slice24r(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc & 0xFF)] ^ t6[b ^ ((crc >> 8) & 0xFF)] ^
+                   t5[c ^ (crc >> 16)] ^ t4[d] ^
+                   t3[e] ^ t2[f] ^ t1[g] ^ t0[h])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    return crc
+
+def _slice32(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFFFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc >> 24)] ^ t6[b ^ ((crc >> 16) & 0xFF)] ^
+                   t5[c ^ ((crc >> 8) & 0xFF)] ^ t4[d ^ (crc & 0xFF)] ^
+                   t3[e] ^ t2[f] ^ t1[g] ^ t0[h])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc >> 24)] ^ ((crc << 8) & 0xFFFFFF00)
+    return crc
+
+def _slice32r(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFFFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc & 0xFF)] ^ t6[b ^ ((crc >> 8) & 0xFF)] ^
+                   t5[c ^ ((crc >> 16) & 0xFF)] ^ t4[d ^ (crc >> 24)] ^
+                   t3[e] ^ t2[f] ^ t1[g] ^ t0[h])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc & 0xFF)] ^ (crc >> 8)
+    return crc
+
+def _slice64(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFFFFFFFFFFFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc >> 56)] ^ t6[b ^ ((crc >> 48) & 0xFF)] ^
+                   t5[c ^ ((crc >> 40) & 0xFF)] ^ t4[d ^ ((crc >> 32) & 0xFF)] ^
+                   t3[e ^ ((crc >> 24) & 0xFF)] ^ t2[f ^ ((crc >> 16) & 0xFF)] ^
+                   t1[g ^ ((crc >> 8) & 0xFF)] ^ t0[h ^ (crc & 0xFF)])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc >> 56)] ^ ((crc << 8) & 0xFFFFFFFFFFFFFF00)
+    return crc
+
+def _slice64r(data, crc, tables):
+    t0, t1, t2, t3, t4, t5, t6, t7 = tables
+    crc = crc & 0xFFFFFFFFFFFFFFFF
+    for chunk in _chunks(data):
+        n, words = _slices(chunk)
+        for a, b, c, d, e, f, g, h in words:
+            crc = (t7[a ^ (crc & 0xFF)] ^ t6[b ^ ((crc >> 8) & 0xFF)] ^
+                   t5[c ^ ((crc >> 16) & 0xFF)] ^ t4[d ^ ((crc >> 24) & 0xFF)] ^
+                   t3[e ^ ((crc >> 32) & 0xFF)] ^ t2[f ^ ((crc >> 40) & 0xFF)] ^
+                   t1[g ^ ((crc >> 48) & 0xFF)] ^ t0[h ^ (crc >> 56)])
+        for x in chunk[n:]:
+            crc = t0[x ^ (crc & 0xFF)] ^ (crc >> 8)
     return crc
 
+#-----------------------------------------------------------------------------
+# Generate a slicing-by-8 function for one polynomial.  The masks and shifts
+# are constants of the code and the 8 tables are variables of the closure, and
+# the 8 bytes of each step are indexed in the chunk.  This lets the PyPy JIT
+# specialize the loop, where the generic functions above keep looking up their
+# arguments.  On CPython, the strided slices of the generic functions are
+# faster.  The function takes the same arguments as the generic ones and
+# ignores the tables passed to it.
+
+_specializedTemplate = """
+def _mkFun(t0, t1, t2, t3, t4, t5, t6, t7, _chunks):
+    def %(name)s(data, crc, tables=None):
+        crc = crc & %(mask)s
+        for chunk in _chunks(data):
+            n = len(chunk) & ~7
+            for i in range(0, n, 8):
+                crc = (%(step)s)
+            for x in chunk[n:]:
+                crc = %(byte)s
+        return crc
+    return %(name)s
+"""
+
+def _crcByte(width, rev, k):
+    # Return the expression of byte k of the CRC register, in the order in
+    # which the bytes are combined with the data.
+    shift = 8*k if rev else width - 8 - 8*k
+    expr = 'crc'
+    if shift:
+        expr = '(crc >> %d)' % shift
+    if shift + 8 < width:
+        expr = '(%s & 0xFF)' % expr
+    return expr
+
+def _mkSpecializedFun(tables, width, rev, poly):
+    mask = (1 << width) - 1
+    terms = []
+    for k in range(8):
+        index = 'chunk[i + %d]' % k if k else 'chunk[i]'
+        if 8*k < width:
+            index = '%s ^ %s' % (index, _crcByte(width, rev, k))
+        terms.append('t%d[%s]' % (7 - k, index))
+    step = ' ^\n                       '.join(
+        ' ^ '.join(terms[k:k+2]) for k in range(0, 8, 2))
+    if width == 8:
+        byte = 't0[x ^ crc]'
+    elif rev:
+        byte = 't0[x ^ (crc & 0xFF)] ^ (crc >> 8)'
+    else:
+        byte = 't0[x ^ (crc >> %d)] ^ ((crc << 8) & 0x%X)' % (width - 8,
+                                                              mask & ~0xFF)
+    name = '_crc%d%s_%x' % (width, 'r' if rev else '', poly & mask)
+    source = _specializedTemplate % { 'name': name, 'mask': '0x%X' % mask,
+                                      'step': step, 'byte': byte }
+    namespace = {}
+    exec(compile(source, '<crcmod %s>' % name, 'exec'), namespace)
+    return namespace['_mkFun'](*tables, _chunks)
+
+#-----------------------------------------------------------------------------
+# The standard library computes two of the CRCs natively: zlib.crc32 is the
+# reflected CRC-32 with the polynomial 0x104C11DB7, and binascii.crc_hqx is the
+# non-reflected CRC-16 with the polynomial 0x11021.  Both take the register as
+# an argument, so they work with any initial value and XOR out value.
+# zlib.crc32 complements the register before and after, which is undone here.
+# _mkNativeFun returns a function that takes the same arguments as the generic
+# ones and calls the native routine, or None if there is none for the
+# parameters.
+
+def _nativeChunks(data):
+    mv = _get_buffer_view(data)
+    if mv.c_contiguous:
+        yield mv
+    else:
+        yield from _chunks(mv)
+
+def _mkNativeFun(poly, width, rev):
+    if (poly, width, rev) == (0x104C11DB7, 32, True):
+        try:
+            import zlib
+        except ImportError:
+            return None
+        crc32 = zlib.crc32
+        def _zlibCrc32(data, crc, tables=None):
+            crc = (crc & 0xFFFFFFFF) ^ 0xFFFFFFFF
+            for chunk in _nativeChunks(data):
+                crc = crc32(chunk, crc)
+            return crc ^ 0xFFFFFFFF
+        return _zlibCrc32
+
+    if (poly, width, rev) == (0x11021, 16, False):
+        import binascii
+        crc_hqx = binascii.crc_hqx
+        def _binasciiCrcHqx(data, crc, tables=None):
+            crc = crc & 0xFFFF
+            for chunk in _nativeChunks(data):
+                crc = crc_hqx(chunk, crc)
+            return crc
+        return _binasciiCrcHqx
+
+    return None
+
+
+#-----------------------------------------------------------------------------
+# Computing the CRC of a file.  See the description in _crcfunext.c.
+
+_FILE_BUFFER_SIZE = 1 << 20
+_PROGRESS_INTERVAL = 64 << 20
+
+class _FileJob:
+    __slots__ = ('progress', 'interval', 'nextProgress', 'total')
+
+    def __init__(self, progress, interval):
+        if progress is not None and not callable(progress):
+            raise TypeError('progress must be callable')
+        interval = interval.__index__()
+        if interval <= 0:
+            raise ValueError('progress_interval must be > 0')
+        self.progress = progress
+        self.interval = interval
+        self.nextProgress = interval
+        self.total = 0
+
+    def add(self, n):
+        self.total += n
+        if self.progress is not None and self.total >= self.nextProgress:
+            self.report()
+
+    def report(self):
+        self.nextProgress = self.total + self.interval
+        self.progress(self.total)
+
+    def finish(self):
+        # Report the end of the file.
+        if (self.progress is not None and
+                self.total != self.nextProgress - self.interval):
+            self.report()
+
+def _optionalSize(value, name):
+    if value is None:
+        return -1
+    value = value.__index__()
+    if value < 0:
+        raise ValueError('%s must be >= 0' % name)
+    return value
+
+def _fileCrc(engine, crc, job, fd, offset, length, useMmap, sparse=False):
+    # Return the CRC of the data in the file descriptor.  An offset of None
+    # reads from the current position.
+    if sparse and hasattr(os, 'SEEK_DATA'):
+        crc = _fileSparseCrc(engine, crc, job, fd, offset, length, useMmap)
+    else:
+        crc = _fileLoop(engine, crc, job, fd, offset, length, useMmap)
+    job.finish()
+    return crc
+
+def _fileLoop(engine, crc, job, fd, offset, length, useMmap):
+    # Read the data starting job.total bytes after the offset.
+    if useMmap:
+        st = os.fstat(fd)
+        if stat.S_ISREG(st.st_mode):
+            return _fileMmapCrc(engine, crc, job, fd, offset, length, st.st_size)
+
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, offset or 0, max(length, 0),
+                             os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    while True:
+        size = _FILE_BUFFER_SIZE
+        if length >= 0:
+            size = min(size, length - job.total)
+            if size == 0:
+                break
+        if offset is None:
+            data = os.read(fd, size)
+        elif hasattr(os, 'pread'):
+            data = os.pread(fd, size, offset + job.total)
+        else:
+            os.lseek(fd, offset + job.total, os.SEEK_SET)
+            data = os.read(fd, size)
+        if not data:
+            break
+        crc = engine(data, crc)
+        job.add(len(data))
+    return crc
+
+def _fileMmapCrc(engine, crc, job, fd, offset, length, fileSize):
+    import mmap
+    start = os.lseek(fd, 0, os.SEEK_CUR) if offset is None else offset
+    end = fileSize
+    if length >= 0:
+        end = min(end, start + length)
+    window = 64 << 20
+    if job.progress is not None:
+        window = min(window, -(-job.interval // mmap.PAGESIZE) * mmap.PAGESIZE)
+    pos = start + job.total
+    while pos < end:
+        winStart = pos - pos % mmap.ALLOCATIONGRANULARITY
+        winLen = min(end - winStart, window)
+        with mmap.mmap(fd, winLen, access=mmap.ACCESS_READ,
+                       offset=winStart) as m:
+            crc = engine(memoryview(m)[pos - winStart:], crc)
+        job.add(winStart + winLen - pos)
+        pos = winStart + winLen
+    if offset is None:
+        os.lseek(fd, pos, os.SEEK_SET)
+    return crc
+
+def _fileSparseCrc(engine, crc, job, fd, offset, length, useMmap):
+    # Read only the data extents of a sparse file and extend the CRC over the
+    # holes.  See fileSparseLoop in _crcfunext.c.
+    st = os.fstat(fd)
+    if not stat.S_ISREG(st.st_mode):
+        return _fileLoop(engine, crc, job, fd, offset, length, False)
+    cur = os.lseek(fd, 0, os.SEEK_CUR)
+    start = cur if offset is None else offset
+    end = st.st_size
+    if length >= 0:
+        end = min(end, start + length)
+    pos = start
+    try:
+        while pos < end:
+            hole = end
+            try:
+                data = os.lseek(fd, pos, os.SEEK_DATA)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    data = end
+                elif e.errno == errno.EINVAL:
+                    data = pos
+                else:
+                    raise
+            else:
+                if data < end:
+                    hole = os.lseek(fd, data, os.SEEK_HOLE)
+            data = min(data, end)
+            hole = min(hole, end)
+
+            if data > pos:
+                crc = engine.extend_zeros(crc, data - pos)
+                job.add(data - pos)
+            if hole > data:
+                crc = _fileLoop(engine, crc, job, fd, start, hole - start,
+                                useMmap)
+                if job.total < hole - start:
+                    break
+            pos = start + job.total
+    finally:
+        os.lseek(fd, cur if offset is not None else start + job.total,
+                 os.SEEK_SET)
+    return crc
+
+#-----------------------------------------------------------------------------
+# Python version of the CrcEngine type in the extension module.  The table is
+# the list returned by _mkTable or _mkTable_r, or the 8 tables returned by
+# _mkSliceTables for the slicing-by-8 loops.  The folding constants and the
+# CRC-32C flag select hardware engines, so they are ignored here.  Instead, fun
+# can be a function returned by _mkSpecializedFun or _mkNativeFun, which is
+# then used in place of the generic loops.
+
+_engineFuns = {
+     8 : (_crc8, _crc8r),
+    16 : (_crc16, _crc16r),
+    24 : (_crc24, _crc24r),
+    32 : (_crc32, _crc32r),
+    64 : (_crc64, _crc64r),
+}
+
+_sliceFuns = {
+     8 : (_slice8, _slice8r),
+    16 : (_slice16, _slice16r),
+    24 : (_slice24, _slice24r),
+    32 : (_slice32, _slice32r),
+    64 : (_slice64, _slice64r),
+}
+
+def _reflect(x, width):
+    r = 0
+    for i in range(width):
+        r = (r << 1) | (x & 1)
+        x >>= 1
+    return r
+
+def _mulModP(a, b, poly, width):
+    # Return a*b mod P.  See mulModP in _crcfunext.c.
+    top = 1 << (width-1)
+    mask = (1 << width) - 1
+    r = 0
+    bit = top
+    while bit:
+        if r & top:
+            r = ((r << 1) ^ poly) & mask
+        else:
+            r = (r << 1) & mask
+        if a & bit:
+            r ^= b
+        bit >>= 1
+    return r
+
+def _xpowTable(poly, width):
+    # Return the list of x^(8*2^j) mod P for j = 0..63.
+    x = 2
+    for j in range(3):
+        x = _mulModP(x, x, poly, width)
+    xpow = []
+    for j in range(64):
+        xpow.append(x)
+        x = _mulModP(x, x, poly, width)
+    return xpow
+
+def _shiftCrc(xpow, poly, width, rev, crc, n):
+    # Return the CRC register value multiplied by x^(8*n) mod P.
+    if rev:
+        crc = _reflect(crc, width)
+    j = 0
+    while n:
+        if n & 1:
+            crc = _mulModP(crc, xpow[j], poly, width)
+        n >>= 1
+        j += 1
+    if rev:
+        crc = _reflect(crc, width)
+    return crc
+
+# Function used to compute the CRC of a large buffer with several threads,
+# registered by crcmod.  See callParallel in _crcfunext.c.
+_parallelHook = None
+
+def _setParallelHook(fun):
+    global _parallelHook
+    if not callable(fun):
+        raise TypeError('parallel hook must be callable')
+    _parallelHook = fun
+
+def _callParallel(engine, data, crc, workers):
+    if _parallelHook is None:
+        raise RuntimeError('parallel CRC is not available')
+    return _parallelHook(engine, data, crc, workers)
+
+class CrcEngine:
+    '''Compute a CRC with fixed tables and parameters.
+
+    engine(data, crc=initCrc) returns the CRC of the data.
+    '''
+    __slots__ = ('table', 'width', 'rev', 'initCrc', 'xorOut', '_fun',
+                 '_tables', '_poly', '_xpow')
+
+    def __init__(self, poly, table, width, rev, initCrc, xorOut, consts=None,
+                 crc32c=False, fun=None):
+        if width not in _engineFuns:
+            raise ValueError('invalid CRC width')
+        if len(table) not in (256, 8*256):
+            raise ValueError('invalid CRC table')
+        mask = (1 << width) - 1
+        self.table = table
+        self.width = width
+        self.rev = bool(rev)
+        self.initCrc = initCrc & mask
+        self.xorOut = xorOut & mask
+        if fun is not None:
+            self._fun = fun
+            self._tables = None
+        elif len(table) == 256:
+            self._fun = _engineFuns[width][self.rev]
+            self._tables = table
+        else:
+            self._fun = _sliceFuns[width][self.rev]
+            self._tables = tuple(table[256*k:256*(k+1)] for k in range(8))
+        self._poly = poly & mask
+        self._xpow = _xpowTable(self._poly, width)
+
+    def __call__(self, data, crc=None):
+        if crc is None:
+            crc = self.initCrc
+        elif not isinstance(crc, int):
+            raise TypeError('crc must be an integer, not %s'
+                            % type(crc).__name__)
+        xorOut = self.xorOut
+        return xorOut ^ self._fun(data, xorOut ^ crc, self._tables)
+
+    @property
+    def poly(self):
+        return (1 << self.width) | self._poly
+
+    def from_fd(self, fd, offset=0, length=None, crc=None, progress=None,
+                progress_interval=_PROGRESS_INTERVAL, use_mmap=False,
+                sparse=False):
+        '''from_fd(fd, offset=0, length=None, crc=initCrc, progress=None,
+        progress_interval=64 MiB, use_mmap=False, sparse=False) -> CRC of the
+        data in the file descriptor.
+        '''
+        if offset is not None:
+            offset = _optionalSize(offset, 'offset')
+        length = _optionalSize(length, 'length')
+        job = _FileJob(progress, progress_interval)
+        if crc is None:
+            crc = self.initCrc
+        return _fileCrc(self, crc, job, fd, offset, length, use_mmap, sparse)
+
+    def parallel(self, data, crc=None, workers=None):
+        '''parallel(data, crc=initCrc, workers=None) -> CRC of the data
+        computed by several threads.
+        '''
+        return _callParallel(self, data, crc, workers)
+
+    def combine(self, crcA, crcB, lenB):
+        '''combine(crcA, crcB, lenB) -> CRC of A+B from the CRCs of A and B
+        and the length of B.
+        '''
+        if not isinstance(crcA, int) or not isinstance(crcB, int):
+            raise TypeError('crc must be an integer')
+        lenB = lenB.__index__()
+        if lenB < 0:
+            raise ValueError('length must be >= 0')
+        mask = (1 << self.width) - 1
+        crc = _shiftCrc(self._xpow, self._poly, self.width, self.rev,
+                        (crcA ^ self.initCrc) & mask, lenB)
+        return crc ^ (crcB & mask)
+
+    def patch(self, crc, total_len, offset, old_bytes, new_bytes):
+        '''patch(crc, total_len, offset, old_bytes, new_bytes) -> CRC of the
+        message after old_bytes at offset were replaced by new_bytes, from the
+        CRC of the original message.
+        '''
+        if not isinstance(crc, int):
+            raise TypeError('crc must be an integer')
+        total_len = total_len.__index__()
+        offset = offset.__index__()
+        old = _get_buffer_view(old_bytes).tobytes()
+        new = _get_buffer_view(new_bytes).tobytes()
+        if len(old) != len(new):
+            raise ValueError('old_bytes and new_bytes must have the same length')
+        if offset < 0 or total_len < offset + len(old):
+            raise ValueError('patch is outside of the message')
+        # See CrcEngine_patch in _crcfunext.c.
+        n = len(old)
+        delta = (int.from_bytes(old, 'big') ^
+                 int.from_bytes(new, 'big')).to_bytes(n, 'big')
+        mask = (1 << self.width) - 1
+        value = _shiftCrc(self._xpow, self._poly, self.width, self.rev,
+                          self._fun(delta, 0, self._tables) & mask,
+                          total_len - offset - n)
+        return (crc & mask) ^ value
+
+    def extend_zeros(self, crc, n):
+        '''extend_zeros(crc, n) -> CRC of the data followed by n zero bytes
+        from the CRC of the data.
+        '''
+        if not isinstance(crc, int):
+            raise TypeError('crc must be an integer')
+        n = n.__index__()
+        if n < 0:
+            raise ValueError('length must be >= 0')
+        mask = (1 << self.width) - 1
+        crc = _shiftCrc(self._xpow, self._poly, self.width, self.rev,
+                        (crc ^ self.xorOut) & mask, n)
+        return crc ^ self.xorOut
+
+#-----------------------------------------------------------------------------
+# Python version of the CrcBase type in the extension module, which is the base
+# class of crcmod.Crc.
+
+class CrcBase:
+    '''Base type of crcmod.Crc holding the state of a CRC calculation.'''
+    __slots__ = ('_engine', 'poly', 'table', '_crcValue', '_lock')
+
+    # zlib.crc32 and file reads release the GIL, so the state is locked as in
+    # the extension module.  The lock is created before the engine is set.
+    def __init__(self, engine, poly=None, table=None):
+        if not isinstance(engine, CrcEngine):
+            raise TypeError('engine must be a CrcEngine')
+        try:
+            lock = self._lock
+        except AttributeError:
+            lock = self._lock = _thread.RLock()
+        with lock:
+            self._engine = engine
+            self.poly = poly
+            self.table = table
+            self._crcValue = engine.initCrc
+
+    def _ready(self):
+        try:
+            return self._engine
+        except AttributeError:
+            raise ValueError('Crc object is not initialized') from None
+
+    def _clone(self):
+        self._ready()
+        n = type(self).__new__(type(self))
+        n._lock = _thread.RLock()
+        with self._lock:
+            n._engine = self._engine
+            n.poly = self.poly
+            n.table = self.table
+            n._crcValue = self._crcValue
+        return n
+
+    def new(self, arg=None):
+        '''Create a new instance with the CRC set to the initial value.  The
+        data in the optional argument is passed to the update method.
+        '''
+        n = self._clone()
+        n._crcValue = n._engine.initCrc
+        if arg is not None:
+            n.update(arg)
+        return n
+
+    def copy(self):
+        '''Create a new instance with the CRC set to the current value.'''
+        return self._clone()
+
+    def _copyObject(self, memo):
+        # See crcBaseCopyObject in _crcfunext.c.
+        n = self._clone()
+        if memo is not None:
+            memo[id(self)] = n
+        d = getattr(self, '__dict__', None)
+        if d is not None:
+            if memo is None:
+                n.__dict__ = dict(d)
+            else:
+                import copy
+                n.__dict__ = copy.deepcopy(d, memo)
+        return n
+
+    def __copy__(self):
+        return self._copyObject(None)
+
+    def __deepcopy__(self, memo):
+        return self._copyObject(memo)
+
+    def update(self, data, workers=None):
+        '''update(data, workers=None)
+
+        Update the current CRC value with the data.  The CRC is computed by
+        several threads if workers is given.
+        '''
+        self._ready()
+        with self._lock:
+            if workers is None:
+                self._crcValue = self._engine(data, self._crcValue)
+            else:
+                self._crcValue = _callParallel(self._engine, data,
+                                               self._crcValue, workers)
+
+    def update_from_file(self, f, length=None, progress=None,
+                         progress_interval=_PROGRESS_INTERVAL, use_mmap=False,
+                         sparse=False):
+        '''update_from_file(f, length=None, progress=None,
+        progress_interval=64 MiB, use_mmap=False, sparse=False) -> number of
+        bytes read
+
+        Update the current CRC value with the data from a file object or a
+        file descriptor, starting at its current position.
+        '''
+        self._ready()
+        length = _optionalSize(length, 'length')
+        job = _FileJob(progress, progress_interval)
+        with self._lock:
+            return self._updateFromFile(f, length, job, use_mmap, sparse)
+
+    def _updateFromFile(self, f, length, job, use_mmap, sparse):
+        engine = self._engine
+        if isinstance(f, int):
+            self._crcValue = _fileCrc(engine, self._crcValue, job, f, None,
+                                      length, use_mmap, sparse)
+            return job.total
+
+        try:
+            fd = f.fileno()
+            offset = f.tell()
+        except (OSError, AttributeError):
+            # Read the file object with its read method.
+            while True:
+                size = _FILE_BUFFER_SIZE
+                if length >= 0:
+                    size = min(size, length - job.total)
+                    if size == 0:
+                        break
+                data = f.read(size)
+                self._crcValue = engine(data, self._crcValue)
+                if not data:
+                    break
+                job.add(len(data))
+            job.finish()
+            return job.total
+
+        self._crcValue = _fileCrc(engine, self._crcValue, job, fd, offset,
+                                  length, use_mmap, sparse)
+        f.seek(offset + job.total)
+        return job.total
+
+    def update_zeros(self, n):
+        '''update_zeros(n)
+
+        Update the current CRC value as if n zero bytes were passed to update.
+        '''
+        self._ready()
+        with self._lock:
+            self._crcValue = self._engine.extend_zeros(self._crcValue, n)
+
+    def combine(self, crcA, crcB, lenB):
+        '''combine(crcA, crcB, lenB) -> CRC of A+B from the CRCs of A and B
+        and the length of B.
+        '''
+        return self._ready().combine(crcA, crcB, lenB)
+
+    def patch(self, crc, total_len, offset, old_bytes, new_bytes):
+        '''patch(crc, total_len, offset, old_bytes, new_bytes) -> CRC of the
+        message after old_bytes at offset were replaced by new_bytes, from the
+        CRC of the original message.
+        '''
+        return self._ready().patch(crc, total_len, offset, old_bytes,
+                                   new_bytes)
+
+    def digest(self):
+        '''Return the current CRC value as a string of bytes.'''
+        self._ready()
+        with self._lock:
+            return self._crcValue.to_bytes(self._engine.width//8, 'big')
+
+    def hexdigest(self):
+        '''Return the current CRC value as a string of hex digits.'''
+        self._ready()
+        with self._lock:
+            return '%0*X' % (self._engine.width//4, self._crcValue)
+
+    @property
+    def crcValue(self):
+        self._ready()
+        with self._lock:
+            return self._crcValue
+
+    @crcValue.setter
+    def crcValue(self, value):
+        self._ready()
+        if not isinstance(value, int):
+            raise TypeError('crc must be an integer, not %s'
+                            % type(value).__name__)
+        with self._lock:
+            self._crcValue = value & ((1 << self._engine.width) - 1)
+
+    @property
+    def _crc(self):
+        return self._ready()
+
+    @property
+    def digest_size(self):
+        return self._ready().width//8
+
+    @property
+    def initCrc(self):
+        return self._ready().initCrc
+
+    @property
+    def xorOut(self):
+        return self._ready().xorOut
+
+    @property
+    def reverse(self):
+        return self._ready().rev
+
+#-----------------------------------------------------------------------------
+# Python version of the RollingBase type in the extension module, which is the
+# base class of crcmod.RollingCrc.  See the description in _crcfunext.c.
+
+class RollingBase:
+    '''Base type of crcmod.RollingCrc holding the window of a rolling CRC.'''
+    __slots__ = ('width', 'reverse', 'window', '_table', '_outTable', '_base',
+                 '_ring', '_pos', '_reg')
+
+    def __init__(self, width, rev, window, table, outTable, base):
+        if width not in _engineFuns:
+            raise ValueError('invalid CRC width')
+        window = window.__index__()
+        if window < 1:
+            raise ValueError('window must be >= 1')
+        if len(table) != 256 or len(outTable) != 256:
+            raise ValueError('invalid CRC table')
+        mask = (1 << width) - 1
+        self.width = width
+        self.reverse = bool(rev)
+        self.window = window
+        self._table = [ x & mask for x in table ]
+        self._outTable = [ x & mask for x in outTable ]
+        self._base = base & mask
+        self._ring = bytearray(window)
+        self._pos = 0
+        self._reg = 0
+
+    def _ready(self):
+        try:
+            return self._ring
+        except AttributeError:
+            raise ValueError('RollingCrc object is not initialized') from None
+
+    def _roll(self, data, out, find=None, bitmap=None, skip=0):
+        # Add the data to the window.  The CRCs are stored in out when it is
+        # not None.  When find is given as (mask, chunkLen, minSize, maxSize),
+        # stop after the first chunk boundary and return the number of bytes
+        # added, or -1.  See rollingFind in _crcfunext.c.  When bitmap is
+        # given, stop after the first match instead, see rollingMatch.
+        ring = self._ready()
+        data = _get_buffer_view(data).tobytes()
+        table = self._table
+        outTable = self._outTable
+        window = self.window
+        pos = self._pos
+        reg = self._reg
+        base = self._base
+        mask = (1 << self.width) - 1
+        shift = self.width - 8
+        rev = self.reverse
+        found = -1
+        if find is not None:
+            match, chunkLen, minSize, maxSize = find
+            matchBase = base & match
+        if bitmap is not None:
+            bitMask = len(bitmap)*8 - 1
+        n = len(data)
+        for i, b in enumerate(data):
+            if i < window:
+                o = ring[pos]
+                ring[pos] = b
+                pos += 1
+                if pos == window:
+                    pos = 0
+            else:
+                o = data[i - window]
+            if rev:
+                reg = (reg >> 8) ^ table[(reg ^ b) & 0xFF]
+            else:
+                reg = ((reg << 8) ^ table[((reg >> shift) ^ b) & 0xFF]) & mask
+            reg ^= outTable[o]
+            if out is not None:
+                out[i] = reg ^ base
+            if find is not None:
+                chunkLen += 1
+                if chunkLen >= maxSize or (chunkLen >= minSize and
+                                           (reg & match) == matchBase):
+                    found = n = i + 1
+                    break
+            if bitmap is not None:
+                bit = (reg ^ base) & bitMask
+                if bitmap[bit >> 3] & (1 << (bit & 7)) and i >= skip:
+                    found = n = i + 1
+                    break
+        if n > window:
+            ring[:] = data[n-window:n]
+            pos = 0
+        self._pos = pos
+        self._reg = reg
+        return found
+
+    def update(self, data):
+        '''update(data)
+
+        Add the data to the window.
+        '''
+        self._roll(data, None)
+
+    def roll_into(self, data, out):
+        '''roll_into(data, out)
+
+        Add the data to the window and store the CRC of the window after each
+        byte in the writable buffer out, such as an array of the CRC size.
+        '''
+        n = len(_get_buffer_view(data))
+        itemSize = 4 if self.width == 24 else self.width // 8
+        view = memoryview(out)
+        if view.readonly or view.itemsize != itemSize or len(view) < n:
+            raise ValueError('out must hold len(data) integers of %d bytes'
+                             % itemSize)
+        self._roll(data, view)
+
+    def find_boundary(self, data, mask, chunk_len, min_size, max_size):
+        '''find_boundary(data, mask, chunk_len, min_size, max_size) -> number
+        of bytes added up to the first content-defined chunk boundary, or -1.
+        '''
+        if max_size < 1:
+            raise ValueError('max_size must be >= 1')
+        return self._roll(data, None, (mask, chunk_len, min_size, max_size))
+
+    def find_match(self, data, bitmap, skip=0):
+        '''find_match(data, bitmap, skip=0) -> number of bytes added up to
+        the first window whose CRC may be in the set given by the bitmap, or
+        -1.
+        '''
+        bitmap = _get_buffer_view(bitmap).tobytes()
+        n = len(bitmap)
+        if n == 0 or n & (n - 1):
+            raise ValueError('the bitmap length must be a power of two')
+        return self._roll(data, None, None, bitmap, skip.__index__())
+
+    def copy(self):
+        '''Create a new instance with the same window.'''
+        self._ready()
+        n = type(self).__new__(type(self))
+        for name in RollingBase.__slots__:
+            setattr(n, name, getattr(self, name))
+        n._ring = bytearray(self._ring)
+        return n
+
+    __copy__ = copy
+
+    def reset(self):
+        '''Fill the window with zero bytes.'''
+        ring = self._ready()
+        ring[:] = bytes(self.window)
+        self._pos = 0
+        self._reg = 0
+
+    @property
+    def crcValue(self):
+        '''CRC of the bytes in the window.'''
+        self._ready()
+        return self._reg ^ self._base
+
+#-----------------------------------------------------------------------------
+# The Python implementation always holds the GIL.  The threshold is kept so
+# that the settings behave the same as with the extension module.
+
+_gilThreshold = 65536
+
+def _getGilThreshold():
+    return _gilThreshold
+
+def _setGilThreshold(size):
+    global _gilThreshold
+    size = size.__index__()
+    if size < 0:
+        raise ValueError('GIL threshold must be >= 0')
+    _gilThreshold = size
@@ -0,0 +1,174 @@
+#-----------------------------------------------------------------------------
+# CRC calculation for asyncio streams.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#-----------------------------------------------------------------------------
+'''
+crcmod.aio computes CRCs of data arriving on asyncio streams.
+
+To use it, e.g.:
+    import crcmod.aio
+
+    crc = await crcmod.aio.crc_stream(reader, 'crc-32c')
+    print(crc.hexdigest())
+
+    stream = crcmod.aio.CrcIterator(chunks, 'crc-32c')
+    async for chunk in stream:
+        writer.write(chunk)
+        await writer.drain()
+    print(stream.crc.hexdigest())
+
+Short chunks are computed on the event loop.  Chunks of at least the threshold
+size are computed by a thread pool, which runs while the next chunk is
+received since the extension module releases the GIL.  The chunks are always
+added to the CRC in order.
+'''
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# local imports
+import crcmod
+import crcmod.predefined
+from crcmod.crcmod import _crcfun
+
+__all__ = [
+    'crc_stream',
+    'CrcIterator',
+]
+
+_THRESHOLD = 64 << 10
+_CHUNK_SIZE = 256 << 10
+_MAX_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _default_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(_MAX_WORKERS, 'crcmod-aio')
+        return _executor
+
+def _make_crc(algorithm):
+    # Return the Crc instance that is updated for a predefined name, a Crc
+    # instance, or a function returned by mkCrcFun.
+    if isinstance(algorithm, str):
+        return crcmod.predefined.PredefinedCrc(algorithm)
+    if isinstance(algorithm, _crcfun.CrcBase):
+        return algorithm
+    if isinstance(algorithm, _crcfun.CrcEngine):
+        return crcmod.Crc._fromEngine(algorithm)
+    raise TypeError('algorithm must be a predefined CRC name, a Crc instance '
+                    'or a CRC function')
+
+#-----------------------------------------------------------------------------
+class _Updater:
+    # Adds chunks to a Crc in order.  A long chunk is computed by the executor
+    # while the caller goes on; the next chunk waits for it.
+
+    def __init__(self, crc, threshold, executor):
+        self.crc = crc
+        self.threshold = _THRESHOLD if threshold is None else threshold
+        self.executor = executor
+        self.pending = None
+
+    async def add(self, data):
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            await pending
+        if len(data) < self.threshold:
+            self.crc.update(data)
+        else:
+            executor = self.executor or _default_executor()
+            loop = asyncio.get_running_loop()
+            self.pending = loop.run_in_executor(executor, self.crc.update, data)
+
+    async def finish(self):
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            await pending
+        return self.crc
+
+#-----------------------------------------------------------------------------
+async def crc_stream(reader, algorithm, chunk_size=_CHUNK_SIZE, threshold=None,
+                     executor=None):
+    '''Compute the CRC of the data read from an asyncio.StreamReader until the
+    end of the stream, and return the Crc instance holding the result.
+
+    reader -- Object with an async read(n) method, such as a StreamReader.
+
+    algorithm -- Name of a predefined CRC algorithm, a Crc instance, which is
+    updated in place, or a function returned by mkCrcFun.
+
+    chunk_size -- Maximum number of bytes read at a time.
+
+    threshold -- Chunks of at least this many bytes are computed by the
+    executor instead of the event loop.  Defaults to 64 KiB.
+
+    executor -- Executor used for long chunks.  Defaults to a shared pool with
+    a few threads.
+    '''
+    updater = _Updater(_make_crc(algorithm), threshold, executor)
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        await updater.add(data)
+    return await updater.finish()
+
+#-----------------------------------------------------------------------------
+class CrcIterator:
+    '''Asynchronous iterator that passes through the chunks of an asynchronous
+    iterable, or of a StreamReader, while computing their CRC.
+
+    The crc attribute holds the Crc instance, which is complete when the
+    iteration ends.  The parameters are the same as for crc_stream.  The
+    chunks must not be modified while they are passed through.
+    '''
+
+    def __init__(self, source, algorithm, chunk_size=_CHUNK_SIZE,
+                 threshold=None, executor=None):
+        if isinstance(source, asyncio.StreamReader):
+            source = self._read_chunks(source, chunk_size)
+        self._source = source.__aiter__()
+        self._updater = _Updater(_make_crc(algorithm), threshold, executor)
+        self.crc = self._updater.crc
+
+    @staticmethod
+    async def _read_chunks(reader, chunk_size):
+        while True:
+            data = await reader.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            data = await self._source.__anext__()
+        except StopAsyncIteration:
+            await self._updater.finish()
+            raise
+        await self._updater.add(data)
+        return data
@@ -0,0 +1,125 @@
+#-----------------------------------------------------------------------------
+# Content-defined chunking using a rolling CRC.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#-----------------------------------------------------------------------------
+'''
+crcmod.chunking splits a stream into content-defined chunks and computes the
+CRC of each chunk.
+
+To use it, e.g.:
+    import crcmod.chunking
+
+    with open(path, 'rb') as f:
+        for offset, length, crc in crcmod.chunking.chunk_stream(f, 'crc-32c'):
+            print(offset, length, hex(crc))
+
+A chunk ends where the CRC of the last window bytes has its low bits equal to
+zero, so the boundaries depend only on the content near them.  Inserting or
+removing data only changes the chunks around the change, which is what makes
+the chunks useful for finding duplicate data.  The boundaries are found by the
+RollingCrc class and the CRC of each chunk is computed from the same buffer
+right after, so the data is read once.
+'''
+
+import math
+
+# local imports
+import crcmod
+from crcmod.files import _algorithm_params
+
+__all__ = [
+    'chunk_stream',
+]
+
+_BUFFER_SIZE = 1 << 20
+
+#-----------------------------------------------------------------------------
+def _boundary_mask(min_size, avg_size, max_size, width):
+    # Return the mask of the CRC bits that must be zero at a boundary.  The
+    # chunks are min_size bytes plus a geometrically distributed length with a
+    # mean of 2**bits.
+    if min_size < 0 or not min_size < avg_size <= max_size:
+        raise ValueError('the sizes must satisfy 0 <= min_size < avg_size '
+                         '<= max_size')
+    bits = max(1, round(math.log2(avg_size - min_size)))
+    if bits > width:
+        raise ValueError('avg_size is too large for the CRC width')
+    return (1 << bits) - 1
+
+#-----------------------------------------------------------------------------
+def chunk_stream(fileobj, algorithm, min_size=2 << 10, avg_size=8 << 10,
+                 max_size=64 << 10, window=48, buffer_size=_BUFFER_SIZE):
+    '''Split a stream into content-defined chunks.
+
+    Generates (offset, length, crc) for each chunk, in order.
+
+    fileobj -- Binary file object.  It is read with readinto into a buffer
+    that is reused for the whole stream.
+
+    algorithm -- Name of a predefined CRC algorithm or a Crc instance.  It is
+    used both for the rolling CRC and for the CRC of the chunks.
+
+    min_size, avg_size, max_size -- Minimum, approximate average, and maximum
+    chunk sizes in bytes.  Only the last chunk can be shorter than min_size.
+
+    window -- Number of bytes of the rolling CRC window.
+
+    buffer_size -- Size of the read buffer.
+    '''
+    params = _algorithm_params(algorithm)
+    crcfun = crcmod.mkCrcFun(*params)
+    rolling = crcmod.RollingCrc(params[0], window, *params[1:])
+    mask = _boundary_mask(min_size, avg_size, max_size, crcfun.width)
+
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    readinto = getattr(fileobj, 'readinto', None)
+
+    offset = 0
+    length = 0
+    crc = crcfun.initCrc
+    while True:
+        if readinto is not None:
+            n = readinto(view)
+        else:
+            data = fileobj.read(buffer_size)
+            n = len(data)
+            view[:n] = data
+        if not n:
+            break
+
+        pos = 0
+        while pos < n:
+            end = rolling.find_boundary(view[pos:n], mask, length, min_size,
+                                        max_size)
+            if end < 0:
+                crc = crcfun(view[pos:n], crc)
+                length += n - pos
+                break
+            crc = crcfun(view[pos:pos+end], crc)
+            length += end
+            pos += end
+            yield offset, length, crc
+            offset += length
+            length = 0
+            crc = crcfun.initCrc
+
+    if length:
+        yield offset, length, crc
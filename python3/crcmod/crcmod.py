@@ -35,7 +35,8 @@ polynomial and initial value.  This provides a much simpler interface if
 all you need is a function for CRC calculation.
 '''
 
-__all__ = '''mkCrcFun Crc
+__all__ = '''mkCrcFun Crc RollingCrc getGilThreshold setGilThreshold
+getParallelOptions setParallelOptions getTableCacheInfo clearTableCache
 '''.split()
 
 # Select the appropriate set of low-level CRC functions for this installation.
@@ -48,10 +49,17 @@ except ImportError:
     import crcmod._crcfunpy as _crcfun
     _usingExtension = False
 
-import sys, struct
+# Only modules that are cheap to import are imported here, since many short
+# lived programs import crcmod.  The others are imported where they are used.
+import sys, os, _thread
+
+# Generate a function for each polynomial in the Python implementation, which
+# is much faster on PyPy.  The cached tables must be cleared after changing
+# this.
+_specializeFuns = sys.implementation.name == 'pypy'
 
 #-----------------------------------------------------------------------------
-class Crc:
+class Crc(_crcfun.CrcBase):
     '''Compute a Cyclic Redundancy Check (CRC) using the specified polynomial.
 
     Instances of this class have the same interface as the algorithms in the
@@ -85,7 +93,12 @@ class Crc:
 
     xorOut -- Final value to XOR with the calculated CRC value.  Used by some
     CRC algorithms.  Defaults to zero.
+
+    The state of the calculation is kept by the CrcBase base class, which also
+    provides the new, copy, update, digest, and hexdigest methods.  It is
+    implemented in C when the extension module is available.
     '''
+
     def __init__(self, poly, initCrc=~0, rev=True, xorOut=0, initialize=True):
         if not initialize:
             # Don't want to perform the initialization when using new or copy
@@ -93,18 +106,17 @@ class Crc:
             return
 
         (sizeBits, initCrc, xorOut) = _verifyParams(poly, initCrc, xorOut)
-        self.digest_size = sizeBits//8
-        self.initCrc = initCrc
-        self.xorOut = xorOut
-
-        self.poly = poly
-        self.reverse = rev
-
         (crcfun, table) = _mkCrcFun(poly, sizeBits, initCrc, rev, xorOut)
-        self._crc = crcfun
-        self.table = table
+        super().__init__(crcfun, poly, table)
 
-        self.crcValue = self.initCrc
+    @classmethod
+    def _fromEngine(cls, engine):
+        # Return an instance that computes the CRC with a function returned by
+        # mkCrcFun, without building another one.
+        crc = cls.__new__(cls)
+        table = _mkTables(engine.poly, engine.width, engine.rev)[0]
+        _crcfun.CrcBase.__init__(crc, engine, engine.poly, table)
+        return crc
 
     def __str__(self):
         lst = []
@@ -116,69 +128,6 @@ class Crc:
         lst.append('crcValue = %s' % (fmt % self.crcValue))
         return '\n'.join(lst)
 
-    def new(self, arg=None):
-        '''Create a new instance of the Crc class initialized to the same
-        values as the original instance.  The current CRC is set to the initial
-        value.  If a string is provided in the optional arg parameter, it is
-        passed to the update method.
-        '''
-        n = Crc(poly=None, initialize=False)
-        n._crc = self._crc
-        n.digest_size = self.digest_size
-        n.initCrc = self.initCrc
-        n.xorOut = self.xorOut
-        n.table = self.table
-        n.crcValue = self.initCrc
-        n.reverse = self.reverse
-        n.poly = self.poly
-        if arg is not None:
-            n.update(arg)
-        return n
-
-    def copy(self):
-        '''Create a new instance of the Crc class initialized to the same
-        values as the original instance.  The current CRC is set to the current
-        value.  This allows multiple CRC calculations using a common initial
-        string.
-        '''
-        c = self.new()
-        c.crcValue = self.crcValue
-        return c
-
-    def update(self, data):
-        '''Update the current CRC value using the string specified as the data
-        parameter.
-        '''
-        self.crcValue = self._crc(data, self.crcValue)
-
-    def digest(self):
-        '''Return the current CRC value as a string of bytes.  The length of
-        this string is specified in the digest_size attribute.
-        '''
-        n = self.digest_size
-        crc = self.crcValue
-        lst = []
-        while n > 0:
-            lst.append(crc & 0xFF)
-            crc = crc >> 8
-            n -= 1
-        lst.reverse()
-        return bytes(lst)
-
-    def hexdigest(self):
-        '''Return the current CRC value as a string of hex digits.  The length
-        of this string is twice the digest_size attribute.
-        '''
-        n = self.digest_size
-        crc = self.crcValue
-        lst = []
-        while n > 0:
-            lst.append('%02X' % (crc & 0xFF))
-            crc = crc >> 8
-            n -= 1
-        lst.reverse()
-        return ''.join(lst)
-
     def generateCode(self, functionName, out, dataType=None, crcType=None):
         '''Generate a C/C++ function.
 
@@ -265,6 +214,48 @@ class Crc:
         }
         out.write(_codeTemplate % parms) 
 
+#-----------------------------------------------------------------------------
+class RollingCrc(_crcfun.RollingBase):
+    '''Compute the CRC of the last window bytes of a stream.
+
+    Each byte added to the window costs the same whatever the size of the
+    window.  The roll_many method returns the CRC of the window after each byte
+    of the data, which is the CRC of every window of the data once the window
+    is full.  Until window bytes have been added, the window is padded with
+    leading zero bytes.
+
+    poly, initCrc, rev, xorOut -- The CRC algorithm, as for the Crc class.
+
+    window -- Number of bytes in the window.
+
+    The state is kept by the RollingBase base class, which also provides the
+    update, roll_into, copy and reset methods and the crcValue attribute.  It
+    is implemented in C when the extension module is available.
+    '''
+    __slots__ = ()
+
+    def __init__(self, poly, window, initCrc=~0, rev=True, xorOut=0):
+        (sizeBits, initCrc, xorOut) = _verifyParams(poly, initCrc, xorOut)
+        (crcfun, table) = _mkCrcFun(poly, sizeBits, initCrc, rev, xorOut)
+        window = window.__index__()
+        if window < 1:
+            raise ValueError('window must be >= 1')
+        super().__init__(sizeBits, rev, window, table,
+                         _mkOutTable(crcfun, table, window),
+                         crcfun.extend_zeros(crcfun.initCrc, window))
+
+    def roll_many(self, data):
+        '''Add the data to the window and return an array with the CRC of the
+        window after each byte.
+        '''
+        import array
+        # One CRC for each byte, which is not len(data) for arrays of larger
+        # items.
+        out = array.array(_sizeToTypeCode[self.width], [0]) * \
+            memoryview(data).nbytes
+        self.roll_into(data, out)
+        return out
+
 #-----------------------------------------------------------------------------
 def mkCrcFun(poly, initCrc=~0, rev=True, xorOut=0):
     '''Return a function that computes the CRC using the specified polynomial.
@@ -283,6 +274,85 @@ def mkCrcFun(poly, initCrc=~0, rev=True, xorOut=0):
     # Make the function (and table), return the function
     return _mkCrcFun(poly, sizeBits, initCrc, rev, xorOut)[0]
 
+#-----------------------------------------------------------------------------
+def getGilThreshold():
+    '''Return the buffer size in bytes at which the CRC functions release the
+    GIL while computing the CRC.
+    '''
+    return _crcfun._getGilThreshold()
+
+#-----------------------------------------------------------------------------
+def setGilThreshold(size):
+    '''Set the buffer size in bytes at which the CRC functions release the GIL.
+
+    Other threads can run while the CRC of a buffer of at least this size is
+    computed.  Smaller buffers keep the GIL since releasing it costs more than
+    the CRC calculation.  Has no effect when the extension module is not
+    available.
+    '''
+    _crcfun._setGilThreshold(size)
+
+#-----------------------------------------------------------------------------
+def getParallelOptions():
+    '''Return a dictionary with the options used to compute the CRC of a
+    buffer with several threads.  See setParallelOptions.
+    '''
+    return dict(chunkSize=_parallelChunkSize, minSize=_parallelMinSize,
+                reusePool=_parallelReusePool)
+
+#-----------------------------------------------------------------------------
+def setParallelOptions(chunkSize=None, minSize=None, reusePool=None):
+    '''Set the options used to compute the CRC of a buffer with several
+    threads.  Options that are None are not changed.
+
+    chunkSize -- Minimum number of bytes given to each thread.  Fewer threads
+    than requested are used for buffers shorter than workers*chunkSize.
+
+    minSize -- Buffers shorter than this are computed by the calling thread.
+
+    reusePool -- When true, the threads are kept in a pool shared by all the
+    calls.  Otherwise the threads are created for each call.
+    '''
+    global _parallelChunkSize, _parallelMinSize, _parallelReusePool
+    if chunkSize is not None:
+        chunkSize = chunkSize.__index__()
+        if chunkSize < 1:
+            raise ValueError('chunkSize must be >= 1')
+    if minSize is not None:
+        minSize = minSize.__index__()
+        if minSize < 0:
+            raise ValueError('minSize must be >= 0')
+    with _parallelLock:
+        if chunkSize is not None:
+            _parallelChunkSize = chunkSize
+        if minSize is not None:
+            _parallelMinSize = minSize
+        if reusePool is not None:
+            _parallelReusePool = bool(reusePool)
+
+#-----------------------------------------------------------------------------
+def getTableCacheInfo():
+    '''Return a dictionary with the statistics of the cache of CRC tables
+    shared by the CRC functions and Crc instances with the same polynomial.
+
+    The keys are hits, misses, maxSize, and size, the number of cached
+    polynomials.
+    '''
+    with _tableCacheLock:
+        return dict(hits=_tableCacheHits, misses=_tableCacheMisses,
+                    maxSize=_TABLE_CACHE_SIZE, size=len(_tableCache))
+
+#-----------------------------------------------------------------------------
+def clearTableCache():
+    '''Empty the cache of CRC tables and reset its statistics.  Existing CRC
+    functions and Crc instances keep their tables.
+    '''
+    global _tableCacheHits, _tableCacheMisses
+    with _tableCacheLock:
+        _tableCache.clear()
+        _tableCacheHits = 0
+        _tableCacheMisses = 0
+
 #-----------------------------------------------------------------------------
 # Naming convention:
 # All function names ending with r are bit reverse variants of the ones
@@ -305,11 +375,7 @@ def _verifyPoly(poly):
 # Bit reverse the input value.
 
 def _bitrev(x, n):
-    y = 0
-    for i in range(n):
-        y = (y << 1) | (x & 1)
-        x = x >> 1
-    return y
+    return int(format(x, '0%db' % n)[::-1], 2)
 
 #-----------------------------------------------------------------------------
 # The following functions compute the CRC for a single byte.  These are used
@@ -342,21 +408,149 @@ def _bytecrc_r(crc, poly, n):
 # table is returned as a list.  Note that the array module does not support
 # 64-bit integers on a 32-bit architecture as of Python 2.3.
 #
+# The CRC is linear in the data, so table[a^b] = table[a]^table[b].  Only the
+# entries for the single bits are computed bit by bit, and each of them is
+# XORed into the entries built so far to double the table.  The extension
+# module has a C version, _mkTables, which also builds the slicing tables.
+#
 # These routines assume that the polynomial and the number of bits in the CRC
 # have been checked for validity by the caller.
 
 def _mkTable(poly, n):
     mask = (1<<n) - 1
     poly = poly & mask
-    table = [_bytecrc(i<<(n-8),poly,n) for i in range(256)]
+    table = [0]
+    for i in range(8):
+        crc = _bytecrc(1<<(n-8+i),poly,n)
+        table += [x ^ crc for x in table]
     return table
 
 def _mkTable_r(poly, n):
     mask = (1<<n) - 1
     poly = _bitrev(poly & mask, n)
-    table = [_bytecrc_r(i,poly,n) for i in range(256)]
+    table = [0]
+    for i in range(8):
+        crc = _bytecrc_r(1<<i,poly,n)
+        table += [x ^ crc for x in table]
     return table
 
+#-----------------------------------------------------------------------------
+# Extend a CRC table for the slicing-by-N algorithms used by the extension
+# module.  Table k of the result holds the CRC of each byte value followed by k
+# zero bytes, so table 0 is the original table.  The tables are returned
+# concatenated in a single list.
+
+def _mkSliceTables(table, n, rev, count):
+    mask = (1<<n) - 1
+    shift = n - 8
+    tables = list(table)
+    prev = table
+    for k in range(1, count):
+        if rev:
+            prev = [(x >> 8) ^ table[x & 0xFF] for x in prev]
+        else:
+            prev = [((x << 8) & mask) ^ table[x >> shift] for x in prev]
+        tables.extend(prev)
+    return tables
+
+# Number of tables used by the slicing-by-N engines and number of lanes used
+# by the braided engine in the extension module.  These must match the values
+# used by the table engines in _crcfunext.c.
+_SLICE_TABLES = 16
+_BRAID_LANES = 5
+
+# The numbers of zero bytes after the byte in the tables passed to the table
+# engines: the slicing tables followed by the braid tables.
+_ENGINE_SHIFTS = (tuple(range(_SLICE_TABLES)) +
+                  tuple(range(8*_BRAID_LANES - 8, 8*_BRAID_LANES)))
+
+#-----------------------------------------------------------------------------
+# Build the string of tables passed to the table engines in the extension
+# module.  This holds the slicing tables followed by the braid tables, which
+# are the tables for a byte followed by the words of the other braid lanes.
+# _mkEngineTableList returns the same tables as a list, which is also used to
+# generate the tables of the predefined algorithms compiled into the extension
+# module.
+
+def _mkEngineTableList(table, n, rev):
+    count = 8*_BRAID_LANES
+    tables = _mkSliceTables(table, n, rev, count)
+    return tables[:256*_SLICE_TABLES] + tables[256*(count-8):]
+
+def _mkEngineTable(table, n, rev):
+    import struct
+    tables = _mkEngineTableList(table, n, rev)
+    fmt = '%d%s' % (len(tables), _sizeToTypeCode[n])
+    return struct.pack(fmt, *tables)
+
+#-----------------------------------------------------------------------------
+# Build the outgoing byte table of a rolling CRC, which holds the contribution of
+# each byte to the CRC register window bytes after it was added.  It is the CRC
+# table shifted over the window.  The table is linear in the byte value, so
+# only the entries for single bits are shifted and the others are XORed
+# together.
+
+def _mkOutTable(crcfun, table, window):
+    xorOut = crcfun.xorOut
+    bits = [ crcfun.extend_zeros(table[1 << i] ^ xorOut, window) ^ xorOut
+             for i in range(8) ]
+    outTable = [0]*256
+    for i in range(1, 256):
+        low = i & -i
+        outTable[i] = outTable[i ^ low] ^ bits[low.bit_length() - 1]
+    return outTable
+
+# The CRC-32C (Castagnoli) polynomial, which has hardware support on x86-64.
+_CRC32C_POLY = 0x11EDC6F41
+
+#-----------------------------------------------------------------------------
+# The following functions compute the constants used by the carry-less
+# multiply folding engine in the extension module.  The engine computes a CRC
+# of width n with polynomial poly as a 64-bit CRC with polynomial
+# poly*x^(64-n), so all of the arithmetic here is done modulo that polynomial.
+# See the description of foldEngine in _crcfunext.c for the layout.
+
+def _polydiv(a, poly, n):
+    # Return the quotient of a divided by poly, where poly has degree n.
+    q = 0
+    for i in range(a.bit_length()-1, n-1, -1):
+        if (a >> i) & 1:
+            a = a ^ (poly << (i-n))
+            q = q | (1 << (i-n))
+    return q
+
+def _xpowmods(exponents, poly, n):
+    # Return a dictionary of x^e mod poly, where poly has degree n, for each of
+    # the exponents.  They are computed in one pass.
+    top = 1<<n
+    r = 1
+    powers = {}
+    for i in range(max(exponents) + 1):
+        if i in exponents:
+            powers[i] = r
+        r = r << 1
+        if r & top:
+            r = r ^ poly
+    return powers
+
+def _mkFoldConsts(poly, n, rev):
+    import struct
+    mask = (1<<64) - 1
+    poly = poly << (64-n)
+    mu = _polydiv(1<<128, poly, 64) & mask
+    if rev:
+        # The bit reversed product comes out shifted by one bit, which is
+        # compensated for by using one less power of x.
+        p = _xpowmods({575, 511, 191, 127}, poly, 64)
+        k = [_bitrev(p[e-1], 64) for e in (576, 512, 192, 128)]
+        consts = [n, 1, k[0], k[1], k[2], k[3],
+                  _bitrev(mu, 64), _bitrev(poly & mask, 64)]
+    else:
+        p = _xpowmods({512, 576, 128, 192}, poly, 64)
+        k = [p[e] for e in (512, 576, 128, 192)]
+        consts = [n, 0, k[0], k[1], k[2], k[3], mu, poly & mask]
+    return struct.pack('%dQ' % len(consts), *consts)
+
 #-----------------------------------------------------------------------------
 # Map the CRC size onto the functions that handle these sizes.
 
@@ -369,21 +563,17 @@ _sizeMap = {
 }
 
 #-----------------------------------------------------------------------------
-# Build a mapping of size to struct module type code.  This table is
-# constructed dynamically so that it has the best chance of picking the best
-# code to use for the platform we are running on.  This should properly adapt
-# to 32 and 64 bit machines.
-
-_sizeToTypeCode = {}
-
-for typeCode in 'B H I L Q'.split():
-    size = {1:8, 2:16, 4:32, 8:64}.get(struct.calcsize(typeCode),None)
-    if size is not None and size not in _sizeToTypeCode:
-        _sizeToTypeCode[size] = '256%s' % typeCode
-
-_sizeToTypeCode[24] = _sizeToTypeCode[32]
-
-del typeCode, size
+# Map the CRC size onto the struct and array module type code of the table
+# entries.  These native sizes are the same on all of the platforms supported
+# by Python 3, so the mapping is not computed at import time.
+
+_sizeToTypeCode = {
+     8 : 'B',
+    16 : 'H',
+    24 : 'I',
+    32 : 'I',
+    64 : 'Q',
+}
 
 #-----------------------------------------------------------------------------
 # The following function validates the parameters of the CRC, namely,
@@ -404,38 +594,165 @@ def _verifyParams(poly, initCrc, xorOut):
     return (sizeBits, initCrc, xorOut)
 
 #-----------------------------------------------------------------------------
-# The following function returns a Python function to compute the CRC.
+# The following function returns the tables for a polynomial: the CRC table as
+# a tuple, and for the extension module the engine tables and the folding
+# constants.  Generating them takes much longer than creating a CrcEngine, so
+# the most recently used ones are cached and shared by all of the CrcEngine
+# objects and Crc instances with the same polynomial.  The cache is keyed by
+# the polynomial only since the initial and XOR out values are not part of the
+# tables.  Two threads missing at the same time both generate the same tables,
+# which is harmless.
+#
+# The tables of the predefined algorithms are generated when the extension
+# module is built and compiled into it.  They are returned as read-only
+# memoryviews of static data, which costs nothing to create and is shared by
+# all of the processes using the module.
+
+_TABLE_CACHE_SIZE = 64
+_tableCache = {}        # in order of use, the most recent last
+_tableCacheHits = 0
+_tableCacheMisses = 0
+_tableCacheLock = _thread.allocate_lock()
+
+def _mkTables(poly, sizeBits, rev):
+    global _tableCacheHits, _tableCacheMisses
+    key = (poly, sizeBits, rev)
+    with _tableCacheLock:
+        tables = _tableCache.pop(key, None)
+        if tables is not None:
+            _tableCache[key] = tables
+            _tableCacheHits += 1
+            return tables
+        _tableCacheMisses += 1
+
+    tables = _genTables(poly, sizeBits, rev)
+    with _tableCacheLock:
+        _tableCache[key] = tables
+        while len(_tableCache) > _TABLE_CACHE_SIZE:
+            del _tableCache[next(iter(_tableCache))]
+    return tables
+
+def _genTables(poly, sizeBits, rev):
+    tables = None
+    if _usingExtension:
+        tables = _crcfun._predefinedTable(poly, sizeBits, rev)
+
+    fun = None
+    if tables is not None:
+        (table, consts) = tables
+        tableList = tuple(table.cast(_sizeToTypeCode[sizeBits])[:256])
+    elif _usingExtension:
+        table = _crcfun._mkTables(poly, sizeBits, rev, _ENGINE_SHIFTS)
+        tableList = tuple(memoryview(table).cast(_sizeToTypeCode[sizeBits])[:256])
+        consts = None
+        if _crcfun._hasClmul:
+            consts = _mkFoldConsts(poly, sizeBits, rev)
+    else:
+        if rev:
+            tableList = tuple(_mkTable_r(poly, sizeBits))
+        else:
+            tableList = tuple(_mkTable(poly, sizeBits))
+        # The Python engine uses slicing-by-8.  The function passed to it
+        # instead calls the native routine of the standard library for the
+        # polynomial if there is one, or is generated for the polynomial on
+        # PyPy.
+        table = tuple(_mkSliceTables(tableList, sizeBits, rev, 8))
+        consts = None
+        fun = _crcfun._mkNativeFun(poly, sizeBits, rev)
+        if fun is None and _specializeFuns:
+            fun = _crcfun._mkSpecializedFun(
+                [ table[256*k:256*(k+1)] for k in range(8) ], sizeBits, rev,
+                poly)
+
+    if _usingExtension and not _crcfun._hasClmul:
+        # Only the carry-less multiply folding engine uses the constants.
+        consts = None
+    return tableList, table, consts, fun
+
+#-----------------------------------------------------------------------------
+# The following function returns a callable CrcEngine object to compute the
+# CRC.
 #
 # It must be passed parameters that are already verified & sanitized by
 # _verifyParams().
 #
-# The returned function calls a low level function that is written in C if the
-# extension module could be loaded.  Otherwise, a Python implementation is
-# used.
+# The CrcEngine type is written in C if the extension module could be loaded.
+# Otherwise, a Python implementation is used.
 #
-# In addition to this function, a list containing the CRC table is returned.
+# In addition to this function, a tuple containing the CRC table is returned.
 
 def _mkCrcFun(poly, sizeBits, initCrc, rev, xorOut):
-    if rev:
-        tableList = _mkTable_r(poly, sizeBits)
-        _fun = _sizeMap[sizeBits][1]
-    else:
-        tableList = _mkTable(poly, sizeBits)
-        _fun = _sizeMap[sizeBits][0]
+    (tableList, table, consts, fun) = _mkTables(poly, sizeBits, bool(rev))
 
-    _table = tableList
     if _usingExtension:
-        _table = struct.pack(_sizeToTypeCode[sizeBits], *tableList)
-
-    if xorOut == 0:
-        def crcfun(data, crc=initCrc, table=_table, fun=_fun):
-            return fun(data, crc, table)
+        # The CPU may have an instruction for the CRC-32C polynomial.
+        crcfun = _crcfun.CrcEngine(poly, table, sizeBits, rev, initCrc,
+                                   xorOut, consts, rev and poly == _CRC32C_POLY)
     else:
-        def crcfun(data, crc=initCrc, table=_table, fun=_fun):
-            return xorOut ^ fun(data, xorOut ^ crc, table)
+        crcfun = _crcfun.CrcEngine(poly, table, sizeBits, rev, initCrc,
+                                   xorOut, fun=fun)
 
     return crcfun, tableList
 
+#-----------------------------------------------------------------------------
+# Compute the CRC of one large buffer with several threads.  The buffer is split
+# into one contiguous piece per thread, the CRCs of the pieces are computed
+# concurrently since the extension module releases the GIL, and the results are
+# merged in order with combine.  The result is the same as computing the CRC of
+# the whole buffer in one call.  This is called by the parallel method of the
+# CrcEngine objects and by Crc.update when workers is given.
+
+_parallelChunkSize = 4 << 20
+_parallelMinSize = 16 << 20
+_parallelReusePool = True
+_parallelPool = None
+_parallelPoolSize = 0
+_parallelLock = _thread.allocate_lock()
+
+def _parallelCrc(engine, data, crc, workers):
+    global _parallelPool, _parallelPoolSize
+    if crc is None:
+        crc = engine.initCrc
+    if workers is None:
+        workers = os.cpu_count() or 1
+    else:
+        workers = workers.__index__()
+        if workers < 1:
+            raise ValueError('workers must be >= 1')
+
+    if isinstance(data, str):
+        # Let the engine raise the usual error.
+        return engine(data, crc)
+    view = memoryview(data)
+    n = view.nbytes
+    tasks = min(workers, -(-n // _parallelChunkSize))
+    if tasks <= 1 or n < _parallelMinSize or view.ndim != 1:
+        return engine(data, crc)
+
+    view = view.cast('B')
+    size = -(-n // tasks)
+    pieces = [ view[i:i+size] for i in range(0, n, size) ]
+
+    from concurrent.futures import ThreadPoolExecutor
+    if _parallelReusePool:
+        with _parallelLock:
+            if _parallelPoolSize < tasks:
+                # Other threads may still be using the old pool.  Its threads
+                # exit once it is no longer referenced.
+                _parallelPool = ThreadPoolExecutor(tasks, 'crcmod')
+                _parallelPoolSize = tasks
+            pool = _parallelPool
+        crcs = list(pool.map(engine, pieces))
+    else:
+        with ThreadPoolExecutor(tasks, 'crcmod') as pool:
+            crcs = list(pool.map(engine, pieces))
+
+    for piece, pieceCrc in zip(pieces, crcs):
+        crc = engine.combine(crc, pieceCrc, len(piece))
+    return crc
+
+_crcfun._setParallelHook(_parallelCrc)
+
 #-----------------------------------------------------------------------------
 _codeTemplate = '''// Automatically generated CRC function
 // %(poly)s
@@ -0,0 +1,284 @@
+#-----------------------------------------------------------------------------
+# Block signatures and deltas of files, as used by rsync.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#-----------------------------------------------------------------------------
+'''
+crcmod.delta computes the differences between two versions of a file when
+only the old version's block signature is available, in the way rsync does.
+
+To use it, e.g.:
+    import crcmod.delta
+
+    with open(old_path, 'rb') as f:
+        sig = crcmod.delta.signature(f, 4096)
+    with open(new_path, 'rb') as f:
+        instructions = list(crcmod.delta.delta(sig, f))
+    with open(old_path, 'rb') as f, open(out_path, 'wb') as out:
+        crcmod.delta.apply_delta(f, instructions, out)
+
+The signature holds a weak and a strong CRC of each block of the old file.
+The delta slides a rolling CRC with the width of a block over the new file.
+A window whose weak CRC is in the signature is confirmed with the strong CRC
+and becomes a copy of the old block.  The other data is inserted.
+'''
+
+# local imports
+import crcmod
+import crcmod.predefined
+from crcmod.files import _algorithm_params
+
+__all__ = [
+    'Signature',
+    'signature',
+    'delta',
+    'apply_delta',
+]
+
+_BUFFER_SIZE = 1 << 20
+
+#-----------------------------------------------------------------------------
+class Signature:
+    '''Block signature of a file, as returned by signature().
+
+    block_size -- Number of bytes in each block.  The last block can be
+    shorter.
+
+    length -- Length of the file.
+
+    weak, strong -- Parameters of the CRC algorithms, as passed to mkCrcFun.
+
+    blocks -- List of the (weak, strong) CRCs of the blocks.
+    '''
+    __slots__ = ('block_size', 'length', 'weak', 'strong', 'blocks')
+
+    def __init__(self, block_size, length, weak, strong, blocks):
+        self.block_size = block_size
+        self.length = length
+        self.weak = weak
+        self.strong = strong
+        self.blocks = blocks
+
+def _read_full(fileobj, view):
+    # Fill the buffer unless the end of the file is reached, and return the
+    # number of bytes read.
+    total = 0
+    while total < len(view):
+        readinto = getattr(fileobj, 'readinto', None)
+        if readinto is not None:
+            n = readinto(view[total:])
+        else:
+            data = fileobj.read(len(view) - total)
+            n = len(data)
+            view[total:total+n] = data
+        if not n:
+            break
+        total += n
+    return total
+
+#-----------------------------------------------------------------------------
+def signature(fileobj, block_size, weak='crc-32c', strong='crc-64-jones'):
+    '''Compute the block signature of a file.
+
+    fileobj -- Binary file object, read to the end.
+
+    block_size -- Number of bytes in each block.
+
+    weak -- Name of a predefined CRC algorithm or a Crc instance used for the
+    rolling CRC.
+
+    strong -- Name of a predefined CRC algorithm or a Crc instance used to
+    confirm the matches.  It should be wider than the weak CRC.
+    '''
+    if block_size < 1:
+        raise ValueError('block_size must be >= 1')
+    weak = _algorithm_params(weak)
+    strong = _algorithm_params(strong)
+    weakfun = crcmod.mkCrcFun(*weak)
+    strongfun = crcmod.mkCrcFun(*strong)
+
+    buf = bytearray(max(1, _BUFFER_SIZE // block_size) * block_size)
+    view = memoryview(buf)
+    blocks = []
+    length = 0
+    while True:
+        n = _read_full(fileobj, view)
+        for pos in range(0, n, block_size):
+            block = view[pos:min(pos + block_size, n)]
+            blocks.append((weakfun(block), strongfun(block)))
+        length += n
+        if n < len(buf):
+            break
+    return Signature(block_size, length, weak, strong, blocks)
+
+#-----------------------------------------------------------------------------
+def _bitmap(crcs, width):
+    # Return the bitmap of the low bits of the CRCs used by find_match, with
+    # about 16 bits per CRC so that few windows need to be looked up.
+    bits = 64
+    while bits < 16*len(crcs) and bits < (1 << min(width, 27)):
+        bits <<= 1
+    bitmap = bytearray(bits // 8)
+    for crc in crcs:
+        bit = crc & (bits - 1)
+        bitmap[bit >> 3] |= 1 << (bit & 7)
+    return bytes(bitmap)
+
+def delta(sig, newfile, buffer_size=_BUFFER_SIZE):
+    '''Compute the delta of a file from the signature of its old version.
+
+    Generates the instructions that rebuild the new file from the old one:
+    ('copy', offset, length) copies length bytes of the old file at offset,
+    and ('insert', data) inserts the bytes data.  Consecutive copied blocks
+    are merged.
+
+    sig -- Signature of the old file.
+
+    newfile -- Binary file object of the new file, read to the end.
+
+    buffer_size -- Number of bytes read at a time.  Inserted data is also
+    emitted in pieces of about this size.
+    '''
+    size = sig.block_size
+    weakfun = crcmod.mkCrcFun(*sig.weak)
+    strongfun = crcmod.mkCrcFun(*sig.strong)
+    rolling = crcmod.RollingCrc(sig.weak[0], size, *sig.weak[1:])
+
+    # Index the full blocks by weak and then strong CRC.  The last block is
+    # matched separately at the end of the file when it is short.
+    full = sig.length // size
+    index = {}
+    for i in range(full):
+        weak, strong = sig.blocks[i]
+        index.setdefault(weak, {}).setdefault(strong, i)
+    bitmap = _bitmap(index, weakfun.width)
+    tail = sig.blocks[full] if len(sig.blocks) > full else None
+    tailLen = sig.length - full*size
+
+    data = b''
+    lit = 0             # start of the data not emitted yet
+    scan = 0            # end of the data added to the rolling CRC
+    minEnd = size       # a match can end here at the earliest
+    copyOffset = 0      # copy not emitted yet
+    copyLen = 0
+    eof = False
+    while True:
+        if scan == len(data):
+            if eof:
+                break
+            # Emit the data that can no longer be part of a match when there
+            # is enough of it, then drop what was emitted and read more.
+            cut = scan - size + 1
+            if cut - lit >= buffer_size:
+                if copyLen:
+                    yield ('copy', copyOffset, copyLen)
+                    copyLen = 0
+                yield ('insert', data[lit:cut])
+                lit = cut
+            more = newfile.read(buffer_size)
+            eof = not more
+            data = data[lit:] + more
+            scan -= lit
+            minEnd -= lit
+            lit = 0
+            continue
+
+        n = rolling.find_match(memoryview(data)[scan:], bitmap,
+                               max(0, minEnd - scan - 1))
+        if n < 0:
+            scan = len(data)
+            continue
+        scan += n
+        candidates = index.get(rolling.crcValue)
+        if candidates is None:
+            continue
+        start = scan - size
+        i = candidates.get(strongfun(memoryview(data)[start:scan]))
+        if i is None:
+            continue
+
+        if start > lit:
+            if copyLen:
+                yield ('copy', copyOffset, copyLen)
+                copyLen = 0
+            yield ('insert', data[lit:start])
+        if copyLen and copyOffset + copyLen == i*size:
+            copyLen += size
+        else:
+            if copyLen:
+                yield ('copy', copyOffset, copyLen)
+            copyOffset = i*size
+            copyLen = size
+        lit = scan
+        minEnd = scan + size
+
+    # The short last block of the old file can match the end of the new file.
+    start = len(data) - tailLen
+    if (tail is not None and start >= lit and
+            weakfun(memoryview(data)[start:]) == tail[0] and
+            strongfun(memoryview(data)[start:]) == tail[1]):
+        if start > lit:
+            if copyLen:
+                yield ('copy', copyOffset, copyLen)
+                copyLen = 0
+            yield ('insert', data[lit:start])
+        if copyLen and copyOffset + copyLen == full*size:
+            copyLen += tailLen
+        else:
+            if copyLen:
+                yield ('copy', copyOffset, copyLen)
+            copyOffset = full*size
+            copyLen = tailLen
+        lit = len(data)
+
+    if copyLen:
+        yield ('copy', copyOffset, copyLen)
+    if lit < len(data):
+        yield ('insert', data[lit:])
+
+#-----------------------------------------------------------------------------
+def apply_delta(basis, instructions, out):
+    '''Rebuild the new file from the old one and the delta instructions.
+
+    basis -- Seekable binary file object of the old file.
+
+    instructions -- Instructions generated by delta().
+
+    out -- Binary file object the new file is written to.
+
+    Returns the number of bytes written.
+    '''
+    total = 0
+    for instruction in instructions:
+        if instruction[0] == 'copy':
+            offset, length = instruction[1:]
+            basis.seek(offset)
+            while length:
+                data = basis.read(min(length, _BUFFER_SIZE))
+                if not data:
+                    raise ValueError('copy past the end of the old file')
+                out.write(data)
+                length -= len(data)
+                total += len(data)
+        elif instruction[0] == 'insert':
+            out.write(instruction[1])
+            total += len(instruction[1])
+        else:
+            raise ValueError('invalid instruction %r' % (instruction[0],))
+    return total
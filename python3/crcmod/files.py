@@ -0,0 +1,217 @@
+#-----------------------------------------------------------------------------
+# Compute the CRCs of many files using a pool of processes.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#-----------------------------------------------------------------------------
+'''
+crcmod.files computes the CRCs of many files using a pool of processes.
+
+To use it, e.g.:
+    import crcmod.files
+
+    for path, crc in crcmod.files.checksum_many(paths, 'crc-32c'):
+        print(path, hex(crc))
+
+This is useful when the pure Python implementation is used, or when threads
+do not help.  The files are read by the worker processes, and only the paths,
+offsets and CRC values are passed between the processes.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# local imports
+import crcmod
+import crcmod.predefined
+
+__all__ = [
+    'checksum_many',
+]
+
+_BUFFER_SIZE = 1 << 20
+
+#-----------------------------------------------------------------------------
+def _algorithm_params(algorithm):
+    # Return the parameters of mkCrcFun for a predefined name or a Crc instance.
+    if isinstance(algorithm, str):
+        definition = crcmod.predefined._get_definition_by_name(algorithm)
+        return (definition['poly'], definition['init'],
+                definition['reverse'], definition['xor_out'])
+    if isinstance(algorithm, crcmod.Crc):
+        return (algorithm.poly, algorithm.initCrc, algorithm.reverse,
+                algorithm.xorOut)
+    raise TypeError('algorithm must be a predefined CRC name or a Crc instance')
+
+#-----------------------------------------------------------------------------
+# The following runs in the worker processes.  Each process creates the CRC
+# function and the read buffer once and uses them for all its files.
+
+_worker_crcfun = None
+_worker_buffer = None
+
+def _init_worker(params):
+    global _worker_crcfun, _worker_buffer
+    _worker_crcfun = crcmod.mkCrcFun(*params)
+    _worker_buffer = bytearray(_BUFFER_SIZE)
+
+def _checksum_segment(path, offset, length):
+    # Return the CRC of length bytes of the file starting at offset, or of the
+    # rest of the file if length is None, and the number of bytes read.
+    crcfun = _worker_crcfun
+    view = memoryview(_worker_buffer)
+    crc = crcfun.initCrc
+    total = 0
+    with open(path, 'rb', buffering=0) as f:
+        if offset:
+            f.seek(offset)
+        while length is None or total < length:
+            size = len(view) if length is None else min(len(view), length - total)
+            n = f.readinto(view[:size])
+            if not n:
+                break
+            crc = crcfun(view[:n], crc)
+            total += n
+    return crc, total
+
+def _checksum_segments(segments):
+    results = []
+    for path, offset, length in segments:
+        try:
+            results.append(_checksum_segment(path, offset, length))
+        except OSError as e:
+            results.append(e)
+    return results
+
+#-----------------------------------------------------------------------------
+class _FileState:
+    # Collects the results for the segments of one file.
+    __slots__ = ('path', 'results', 'remaining')
+
+    def __init__(self, path, count):
+        self.path = path
+        self.results = [None]*count
+        self.remaining = count
+
+#-----------------------------------------------------------------------------
+def _segments(paths, chunk_size, onerror):
+    # Generate the (state, index, offset, length) segments of the files.  Files
+    # longer than chunk_size are split so that several processes can share the
+    # work.  The last segment of a file reads to the end of the file.
+    for path in paths:
+        try:
+            size = os.stat(path).st_size
+        except OSError as e:
+            if onerror is None:
+                raise
+            onerror(e)
+            continue
+        count = max(1, -(-size // chunk_size))
+        state = _FileState(path, count)
+        for i in range(count):
+            length = chunk_size if i < count - 1 else None
+            yield state, i, i*chunk_size, length
+
+def _batches(segments, chunk_size, batch_size):
+    # Group the segments of small files so that each task has a useful amount
+    # of work.
+    batch = []
+    total = 0
+    for segment in segments:
+        batch.append(segment)
+        length = segment[3]
+        total += chunk_size if length is None else length
+        if len(batch) >= batch_size or total >= chunk_size:
+            yield batch
+            batch = []
+            total = 0
+    if batch:
+        yield batch
+
+#-----------------------------------------------------------------------------
+def checksum_many(paths, algorithm, processes=None, chunk_size=64 << 20,
+                  batch_size=64, onerror=None):
+    '''Compute the CRCs of many files using a pool of processes.
+
+    Generates (path, crc) pairs in the order the files are finished.
+
+    paths -- Iterable of file paths.  It is consumed as the work progresses.
+
+    algorithm -- Name of a predefined CRC algorithm or a Crc instance.
+
+    processes -- Number of worker processes.  Defaults to the number of CPUs.
+
+    chunk_size -- Files longer than this are split into pieces of this size
+    that are processed separately, and the results are merged with combine.
+
+    batch_size -- Maximum number of files sent to a process in one task.
+
+    onerror -- Function called with the OSError when a file cannot be read.
+    The file is skipped.  By default the error is raised.
+    '''
+    params = _algorithm_params(algorithm)
+    crcfun = crcmod.mkCrcFun(*params)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be >= 1')
+
+    batches = _batches(_segments(paths, chunk_size, onerror), chunk_size,
+                       batch_size)
+    pool = ProcessPoolExecutor(processes, initializer=_init_worker,
+                               initargs=(params,))
+    try:
+        pending = {}
+        while True:
+            # Keep a few tasks per process queued without reading all the paths
+            # up front.
+            for batch in batches:
+                future = pool.submit(_checksum_segments,
+                                     [ (s.path, offset, length)
+                                       for s, i, offset, length in batch ])
+                pending[future] = batch
+                if len(pending) >= 2*processes:
+                    break
+            if not pending:
+                break
+
+            done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = pending.pop(future)
+                for (state, i, offset, length), result in \
+                        zip(batch, future.result()):
+                    state.results[i] = result
+                    state.remaining -= 1
+                    if state.remaining:
+                        continue
+
+                    crc = None
+                    for result in state.results:
+                        if isinstance(result, OSError):
+                            if onerror is None:
+                                raise result
+                            onerror(result)
+                            break
+                        if crc is None:
+                            crc = result[0]
+                        else:
+                            crc = crcfun.combine(crc, result[0], result[1])
+                    else:
+                        yield state.path, crc
+    finally:
+        pool.shutdown(cancel_futures=True)
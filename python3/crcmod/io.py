@@ -0,0 +1,179 @@
+#-----------------------------------------------------------------------------
+# File-like wrappers that compute the CRC of the data passing through them.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#-----------------------------------------------------------------------------
+'''
+crcmod.io provides file-like wrappers that compute the CRC of the data read
+from or written to another file object.
+
+To use it, e.g.:
+    import shutil
+    import crcmod, crcmod.io
+
+    with crcmod.io.CrcReader(open(path, 'rb'), crcmod.Crc(0x11EDC6F41)) as src:
+        shutil.copyfileobj(src, dst)
+    print(src.hexdigest())
+
+The data is passed to Crc.update without being copied, so the wrappers add
+little to the cost of large sequential copies.
+'''
+
+import io
+
+__all__ = [
+    'CrcReader',
+    'CrcWriter',
+]
+
+#-----------------------------------------------------------------------------
+class _CrcIO(io.RawIOBase):
+    # Common part of CrcReader and CrcWriter.
+
+    def __init__(self, raw, crc):
+        self.raw = raw
+        self.crc = crc
+        try:
+            self._pos = raw.tell()
+        except (OSError, AttributeError, ValueError):
+            self._pos = 0
+
+    def _update(self, b, n):
+        # Add the first n bytes of the buffer b to the CRC.
+        if n:
+            view = memoryview(b)
+            if view.nbytes != n:
+                view = view.cast('B')[:n]
+            self.crc.update(view)
+            self._pos += n
+
+    def digest(self):
+        return self.crc.digest()
+
+    def hexdigest(self):
+        return self.crc.hexdigest()
+
+    def tell(self):
+        '''Return the position in the stream, which is counted from the
+        position of the raw file when the wrapper was created.'''
+        self._checkClosed()
+        return self._pos
+
+    def detach(self):
+        '''Close the wrapper without closing the raw file and return it.'''
+        raw = self.raw
+        if not self.closed:
+            self.flush()
+            self.raw = None
+            super().close()
+        return raw
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            super().close()
+        finally:
+            self.raw.close()
+
+#-----------------------------------------------------------------------------
+class CrcReader(_CrcIO):
+    '''File-like object that reads from the raw file object and updates the
+    Crc instance crc with the data that is read.
+
+    The crc attribute holds the Crc instance.  Closing the wrapper closes the
+    raw file unless it has been detached.  Seeking is not supported since it
+    would make the CRC meaningless.
+    '''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        self._checkClosed()
+        if size is None or size < 0:
+            data = self.raw.read()
+        else:
+            data = self.raw.read(size)
+        if data:
+            self._update(data, len(data))
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, b):
+        self._checkClosed()
+        readinto = getattr(self.raw, 'readinto', None)
+        if readinto is not None:
+            n = readinto(b)
+        else:
+            view = memoryview(b).cast('B')
+            data = self.raw.read(len(view))
+            if data is None:
+                return None
+            n = len(data)
+            view[:n] = data
+        if n:
+            self._update(b, n)
+        return n
+
+    def read1(self, size=-1):
+        self._checkClosed()
+        read1 = getattr(self.raw, 'read1', None)
+        if read1 is None:
+            return self.read(size)
+        data = read1(size)
+        if data:
+            self._update(data, len(data))
+        return data
+
+    def readinto1(self, b):
+        self._checkClosed()
+        readinto1 = getattr(self.raw, 'readinto1', None)
+        if readinto1 is None:
+            return self.readinto(b)
+        n = readinto1(b)
+        if n:
+            self._update(b, n)
+        return n
+
+#-----------------------------------------------------------------------------
+class CrcWriter(_CrcIO):
+    '''File-like object that writes to the raw file object and updates the
+    Crc instance crc with the data that is written.
+
+    The crc attribute holds the Crc instance.  Only the bytes accepted by the
+    raw file are added to the CRC.  Closing the wrapper closes the raw file
+    unless it has been detached.
+    '''
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._checkClosed()
+        n = self.raw.write(b)
+        if n:
+            self._update(b, n)
+        return n
+
+    def flush(self):
+        if not self.closed and self.raw is not None:
+            self.raw.flush()
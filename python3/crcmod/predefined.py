@@ -118,26 +118,44 @@ def _simplify_name(name):
     return name
 
 
-_crc_definitions_by_name = {}
-_crc_definitions_by_identifier = {}
-_crc_definitions = []
-
 _crc_table_headings = [ 'name', 'identifier', 'poly', 'reverse', 'init', 'xor_out', 'check' ]
 
-for table_entry in _crc_definitions_table:
-    crc_definition = dict(zip(_crc_table_headings, table_entry))
-    _crc_definitions.append(crc_definition)
-    name = _simplify_name(table_entry[0])
-    if name in _crc_definitions_by_name:
-        raise Exception("Duplicate entry for '{0}' in CRC table".format(name))
-    _crc_definitions_by_name[name] = crc_definition
-    _crc_definitions_by_identifier[table_entry[1]] = crc_definition
+# The lookup tables below are built from _crc_definitions_table on first use,
+# which keeps importing this module cheap.
+_lookup_names = ('_crc_definitions', '_crc_definitions_by_name', '_crc_definitions_by_identifier')
+_lookup = None
+
+def _get_lookup():
+    global _lookup
+    if _lookup is not None:
+        return _lookup
+    crc_definitions_by_name = {}
+    crc_definitions_by_identifier = {}
+    crc_definitions = []
+    for table_entry in _crc_definitions_table:
+        crc_definition = dict(zip(_crc_table_headings, table_entry))
+        crc_definitions.append(crc_definition)
+        name = _simplify_name(table_entry[0])
+        if name in crc_definitions_by_name:
+            raise Exception("Duplicate entry for '{0}' in CRC table".format(name))
+        crc_definitions_by_name[name] = crc_definition
+        crc_definitions_by_identifier[table_entry[1]] = crc_definition
+    # Another thread may have built the tables too; either copy is fine.
+    _lookup = (crc_definitions, crc_definitions_by_name, crc_definitions_by_identifier)
+    return _lookup
+
+
+def __getattr__(name):
+    if name in _lookup_names:
+        return _get_lookup()[_lookup_names.index(name)]
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
 
 
 def _get_definition_by_name(crc_name):
-    definition = _crc_definitions_by_name.get(_simplify_name(crc_name), None)
+    (_, by_name, by_identifier) = _get_lookup()
+    definition = by_name.get(_simplify_name(crc_name), None)
     if not definition:
-        definition = _crc_definitions_by_identifier.get(crc_name, None)
+        definition = by_identifier.get(crc_name, None)
     if not definition:
         raise KeyError("Unkown CRC name '{0}'".format(crc_name))
     return definition
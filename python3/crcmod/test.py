@@ -27,12 +27,36 @@ import unittest
 
 from array import array
 import binascii
-
-from .crcmod import mkCrcFun, Crc
+import asyncio
+import copy
+import io
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+
+from .crcmod import mkCrcFun, Crc, RollingCrc
+from .crcmod import getGilThreshold, setGilThreshold
+from .crcmod import getParallelOptions, setParallelOptions
+from .crcmod import getTableCacheInfo, clearTableCache
 from .crcmod import _usingExtension
+from .crcmod import _mkTable, _mkTable_r, _mkEngineTable, _mkOutTable
+from .crcmod import _verifyPoly, _mkFoldConsts, _crcfun
+from .crcmod import _bytecrc, _bytecrc_r, _bitrev, _mkSliceTables, _sizeToTypeCode
+from . import _crcfunpy
 from .predefined import PredefinedCrc
 from .predefined import mkPredefinedCrcFun
 from .predefined import _crc_definitions as _predefined_crc_definitions
+from .files import checksum_many
+from .aio import crc_stream, CrcIterator
+from .io import CrcReader, CrcWriter
+from .chunking import chunk_stream
+from .delta import signature, delta, apply_delta
 
 
 #-----------------------------------------------------------------------------
@@ -338,6 +362,1216 @@ class CompareReferenceCrcTest(unittest.TestCase):
                 self.assertEqual(crcfun(msg), crc_poly_fun(msg))
 
 
+class LongMessageTest(unittest.TestCase):
+    """Check that the engines used for long messages agree with the
+    byte-at-a-time algorithm."""
+
+    test_polys = [ g8, g16, g24, g32, g64a, g64b ]
+
+    # Lengths straddling the thresholds at which the extension module switches
+    # from the byte-at-a-time loop to the slicing-by-8 and -16 loops and to the
+    # carry-less multiply folding engine.
+    test_lengths = list(range(0, 40)) + [ 127, 128, 143, 144, 191, 192,
+                                          255, 256, 257, 271, 1000, 4099 ]
+
+    @staticmethod
+    def make_message(n):
+        return bytes((i*7 + (i >> 3)) & 0xFF for i in range(n))
+
+    def test_against_single_bytes(self):
+        for poly in self.test_polys:
+            for rev in (False, True):
+                crcfun = mkCrcFun(poly, initCrc=0x123456789ABCDEF, rev=rev, xorOut=0x3C)
+                for n in self.test_lengths:
+                    msg = self.make_message(n)
+                    crc = crcfun(b'')
+                    for i in range(n):
+                        crc = crcfun(msg[i:i+1], crc)
+                    self.assertEqual(crcfun(msg), crc, "Wrong answer for poly 0x%X, rev %s, length %d" % (poly, rev, n))
+
+    @unittest.skipUnless(_usingExtension, "requires the extension module")
+    def test_table_engines(self):
+        """The table engines (byte-at-a-time, slicing and braided) are not
+        used by mkCrcFun for long messages when a hardware engine is available,
+        so use a CrcEngine without the folding constants and the CRC-32C
+        flag."""
+        lengths = self.test_lengths + [ 1023, 1024, 1025, 1063, 1064, 1065, 5000 ]
+        for poly in self.test_polys:
+            n = _verifyPoly(poly)
+            for rev in (False, True):
+                if rev:
+                    table = _mkTable_r(poly, n)
+                else:
+                    table = _mkTable(poly, n)
+                engine = _crcfun.CrcEngine(poly, _mkEngineTable(table, n, rev),
+                                           n, rev, 0, 0)
+                reference = _crcfunpy.CrcEngine(poly, table, n, rev, 0, 0)
+                crc = 0x0123456789ABCDEF & ((1<<n) - 1)
+                for length in lengths:
+                    msg = self.make_message(length)
+                    self.assertEqual(engine(msg, crc), reference(msg, crc),
+                            "Wrong answer for poly 0x%X, rev %s, length %d" % (poly, rev, length))
+
+    def test_python_engines(self):
+        """The Python engine uses slicing-by-8 on chunks of the data, so check
+        it against the byte-at-a-time loop across the chunk boundaries and with
+        buffers that are not contiguous or not made of bytes."""
+        chunk = _crcfunpy._CHUNK_SIZE
+        lengths = [ 0, 7, 63, 64, 65, 71, 72, chunk - 1, chunk, chunk + 9,
+                    2*chunk + 70 ]
+        for poly in self.test_polys:
+            n = _verifyPoly(poly)
+            for rev in (False, True):
+                table = (_mkTable_r if rev else _mkTable)(poly, n)
+                ref = _crcfunpy.CrcEngine(poly, table, n, rev, 0, 0)
+                sliced = _crcfunpy.CrcEngine(poly, _mkSliceTables(table, n, rev, 8),
+                                             n, rev, 0, 0)
+                crc = 0x0123456789ABCDEF & ((1<<n) - 1)
+                for length in lengths:
+                    msg = self.make_message(length)
+                    self.assertEqual(sliced(msg, crc), ref(msg, crc),
+                            "Wrong answer for poly 0x%X, rev %s, length %d" % (poly, rev, length))
+                msg = self.make_message(2*chunk + 70)
+                self.assertEqual(sliced(memoryview(msg)[1::2], crc),
+                                 ref(msg[1::2], crc))
+                words = array('H', msg)
+                self.assertEqual(sliced(words, crc), ref(words.tobytes(), crc))
+                self.assertEqual(sliced(memoryview(words)[::3], crc),
+                                 ref(words[::3].tobytes(), crc))
+
+    def test_specialized_functions(self):
+        """Check the functions generated for each polynomial, which are used
+        by the Python engine on PyPy."""
+        lengths = self.test_lengths + [ _crcfunpy._CHUNK_SIZE + 9 ]
+        for poly in self.test_polys:
+            n = _verifyPoly(poly)
+            for rev in (False, True):
+                table = (_mkTable_r if rev else _mkTable)(poly, n)
+                slices = _mkSliceTables(table, n, rev, 8)
+                fun = _crcfunpy._mkSpecializedFun(
+                    [ slices[256*k:256*(k+1)] for k in range(8) ], n, rev, poly)
+                ref = _crcfunpy.CrcEngine(poly, table, n, rev, 0, 0)
+                engine = _crcfunpy.CrcEngine(poly, slices, n, rev, 0, 0,
+                                             fun=fun)
+                crc = 0x0123456789ABCDEF & ((1<<n) - 1)
+                for length in lengths:
+                    msg = self.make_message(length)
+                    self.assertEqual(engine(msg, crc), ref(msg, crc),
+                            "Wrong answer for poly 0x%X, rev %s, length %d" % (poly, rev, length))
+                self.assertEqual(engine.patch(crc, 100, 10, b'ab', b'xy'),
+                                 ref.patch(crc, 100, 10, b'ab', b'xy'))
+
+    @unittest.skipIf(_usingExtension, "requires the Python implementation")
+    def test_specialize_option(self):
+        from . import crcmod as crcmodule
+        msg = self.make_message(1000)
+        expected = mkCrcFun(g24)(msg)
+        saved = crcmodule._specializeFuns
+        try:
+            crcmodule._specializeFuns = True
+            clearTableCache()
+            crcfun = mkCrcFun(g24)
+            self.assertTrue(crcfun._fun.__name__.startswith('_crc24r_'))
+            self.assertEqual(crcfun(msg), expected)
+        finally:
+            crcmodule._specializeFuns = saved
+            clearTableCache()
+
+    def test_against_reference(self):
+        msg = self.make_message(1000)
+        for crcfun_params, crc_poly_fun in CompareReferenceCrcTest.test_poly_crcs:
+            crcfun = mkCrcFun(*crcfun_params)
+            self.assertEqual(crcfun(msg), crc_poly_fun(msg))
+
+
+class NativeFunTest(unittest.TestCase):
+    """Check the functions of the Python implementation that call zlib.crc32
+    and binascii.crc_hqx against the generic loops."""
+
+    params = [ (g32, 32, True), (g16, 16, False) ]
+
+    def test_native_funs(self):
+        lengths = [ 0, 1, 9, 1000, _crcfunpy._CHUNK_SIZE + 3 ]
+        for poly, n, rev in self.params:
+            table = (_mkTable_r if rev else _mkTable)(poly, n)
+            fun = _crcfunpy._mkNativeFun(poly, n, rev)
+            self.assertIsNotNone(fun)
+            mask = (1 << n) - 1
+            for initCrc, xorOut in ((0, 0), (mask, mask), (0x1D0F, 0x5A5A)):
+                ref = _crcfunpy.CrcEngine(poly, table, n, rev, initCrc, xorOut)
+                engine = _crcfunpy.CrcEngine(poly, table, n, rev, initCrc,
+                                             xorOut, fun=fun)
+                for length in lengths:
+                    msg = LongMessageTest.make_message(length)
+                    self.assertEqual(engine(msg), ref(msg))
+                    self.assertEqual(engine(msg, 0x12345), ref(msg, 0x12345))
+                msg = LongMessageTest.make_message(1000)
+                self.assertEqual(engine(memoryview(msg)[::3]), ref(msg[::3]))
+                self.assertEqual(engine(array('I', msg)), ref(array('I', msg)))
+            self.assertRaises(TypeError, engine, 'abc')
+        self.assertIsNone(_crcfunpy._mkNativeFun(g32, 32, False))
+        self.assertIsNone(_crcfunpy._mkNativeFun(g16, 16, True))
+
+    @unittest.skipIf(_usingExtension, "requires the Python implementation")
+    def test_mkCrcFun(self):
+        self.assertEqual(mkCrcFun(g32)._fun.__name__, '_zlibCrc32')
+        self.assertEqual(mkCrcFun(g16, rev=False)._fun.__name__,
+                         '_binasciiCrcHqx')
+        self.assertEqual(mkPredefinedCrcFun('crc-32')(b'123456789'), 0xCBF43926)
+        self.assertEqual(mkPredefinedCrcFun('xmodem')(b'123456789'), 0x31C3)
+        self.assertEqual(mkPredefinedCrcFun('crc-ccitt-false')(b'123456789'),
+                         0x29B1)
+
+
+class Crc32cTest(unittest.TestCase):
+    """Check the CRC-32C results, which may come from a hardware engine,
+    against the pure Python implementation."""
+
+    poly = 0x11EDC6F41
+
+    # Lengths straddling the block sizes of the interleaved hardware engine.
+    test_lengths = [ 0, 1, 7, 8, 9, 767, 768, 769, 3*8192 - 1, 3*8192,
+                     3*8192 + 5, 100000 ]
+
+    def reference(self, msg, initCrc, xorOut):
+        table = _mkTable_r(self.poly, 32)
+        return xorOut ^ _crcfunpy._crc32r(msg, initCrc ^ xorOut, table)
+
+    def test_predefined(self):
+        crcfun = mkPredefinedCrcFun('crc-32c')
+        for n in self.test_lengths:
+            # Use an odd offset so that the data is not aligned.
+            msg = LongMessageTest.make_message(n + 3)[3:]
+            expected = self.reference(msg, 0, 0xFFFFFFFF)
+            self.assertEqual(crcfun(msg), expected)
+
+            crc = PredefinedCrc('crc-32c')
+            crc.update(msg)
+            self.assertEqual(crc.crcValue, expected)
+
+    def test_init_and_xor_out(self):
+        for initCrc, xorOut in [ (0x12345678, 0x9ABCDEF0), (0xFFFFFFFF, 0), (0, 0) ]:
+            crcfun = mkCrcFun(self.poly, initCrc=initCrc, xorOut=xorOut)
+            for n in self.test_lengths:
+                msg = LongMessageTest.make_message(n)
+                self.assertEqual(crcfun(msg), self.reference(msg, initCrc, xorOut))
+
+
+class CrcEngineTest(unittest.TestCase):
+    """Check the calling conventions of the objects returned by mkCrcFun."""
+
+    def test_arguments(self):
+        crcfun = mkCrcFun(0x104C11DB7, initCrc=0, xorOut=0xFFFFFFFF)
+        self.assertEqual(crcfun(b'123456789'), 0xCBF43926)
+        self.assertEqual(crcfun(data=b'123456789'), 0xCBF43926)
+        self.assertEqual(crcfun(b'123456789', None), 0xCBF43926)
+        self.assertEqual(crcfun(b'123456789', 0), 0xCBF43926)
+        self.assertEqual(crcfun(b'56789', crc=crcfun(b'1234')), 0xCBF43926)
+        self.assertEqual(crcfun(crc=crcfun(b'1234'), data=b'56789'), 0xCBF43926)
+        self.assertEqual(crcfun(b'', 0x1FFFFFFFF), 0xFFFFFFFF)
+
+        self.assertRaises(TypeError, crcfun)
+        self.assertRaises(TypeError, crcfun, b'1', 0, 0)
+        self.assertRaises(TypeError, crcfun, b'1', '0')
+        self.assertRaises(TypeError, crcfun, b'1', 1.0)
+        self.assertRaises(TypeError, crcfun, b'1', table=None)
+        self.assertRaises(TypeError, crcfun, b'1', 0, crc=0)
+
+    def test_attributes(self):
+        crcfun = mkCrcFun(0x18005, initCrc=0x1234, rev=False, xorOut=0x5678)
+        self.assertEqual(crcfun.width, 16)
+        self.assertEqual(crcfun.rev, False)
+        self.assertEqual(crcfun.initCrc, 0x1234)
+        self.assertEqual(crcfun.xorOut, 0x5678)
+
+    def test_tables(self):
+        """Compare the tables built by linearity with the ones computed entry
+        by entry, and with the tables built by the extension module"""
+        for p in [ g8, g16, g24, g32, g64a ]:
+            n = _verifyPoly(p)
+            mask = (1<<n) - 1
+            self.assertEqual(_mkTable(p, n),
+                             [ _bytecrc(i<<(n-8), p & mask, n) for i in range(256) ])
+            rpoly = _bitrev(p & mask, n)
+            self.assertEqual(rpoly, int(bin(p & mask)[2:].zfill(n)[::-1], 2))
+            self.assertEqual(_mkTable_r(p, n),
+                             [ _bytecrc_r(i, rpoly, n) for i in range(256) ])
+
+            if not _usingExtension:
+                continue
+            for rev in (True, False):
+                table = _mkTable_r(p, n) if rev else _mkTable(p, n)
+                slices = _mkSliceTables(table, n, rev, 40)
+                shifts = [ 0, 7, 39, 1 ]
+                packed = _crcfun._mkTables(p, n, rev, shifts)
+                entries = memoryview(packed).cast(_sizeToTypeCode[n])
+                for i, k in enumerate(shifts):
+                    self.assertEqual(list(entries[256*i:256*(i+1)]),
+                                     slices[256*k:256*(k+1)])
+                self.assertEqual(_crcfun._mkTables(p, n, rev, []), b'')
+
+        if _usingExtension:
+            self.assertRaises(ValueError, _crcfun._mkTables, g32, 12, True, [0])
+            self.assertRaises(ValueError, _crcfun._mkTables, g32, 32, True, [-1])
+            self.assertRaises(TypeError, _crcfun._mkTables, g32, 32, True, 3)
+
+    def test_table_cache(self):
+        clearTableCache()
+        info = getTableCacheInfo()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (0, 0, 0))
+
+        a = Crc(0x104C11DB7)
+        b = Crc(0x104C11DB7, initCrc=0, xorOut=0xFFFFFFFF)
+        c = PredefinedCrc('crc-32')
+        self.assertTrue(a.table is b.table is c.table)
+        self.assertEqual(a.table, tuple(_mkTable_r(0x104C11DB7, 32)))
+        self.assertFalse(Crc(0x104C11DB7, rev=False).table is a.table)
+        c.update(b'123456789')
+        self.assertEqual(c.crcValue, 0xCBF43926)
+
+        info = getTableCacheInfo()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (2, 2, 2))
+        self.assertTrue(info['maxSize'] >= 2)
+
+        # Concurrent misses and hits give correct functions.
+        clearTableCache()
+        results = []
+        def worker():
+            for i in range(20):
+                results.append(mkCrcFun(0x11EDC6F41)(b'123456789'))
+        ts = [ threading.Thread(target=worker) for i in range(4) ]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        self.assertEqual(set(results), { mkCrcFun(0x11EDC6F41)(b'123456789') })
+
+
+#-----------------------------------------------------------------------------
+# Importing crcmod must take less than importBudget times as long as importing
+# zlib, which costs about as much as loading the extension module.  Before the
+# imports of crcmod were trimmed, it took about 18 times as long.
+
+importBudget = 5
+
+def importTime(module, runs=7):
+    """Return the best cumulative time in microseconds to import the module
+    in a new interpreter, as reported by -X importtime, or None if it cannot be
+    imported.  The bytecode is cached in a temporary directory, so only the
+    first run compiles crcmod, even if writing bytecode is disabled."""
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ path ] + [ p for p in [ env.get('PYTHONPATH') ] if p ])
+    best = None
+    with tempfile.TemporaryDirectory() as cache:
+        env['PYTHONPYCACHEPREFIX'] = cache
+        for i in range(runs + 1):
+            proc = subprocess.run([ sys.executable, '-X', 'importtime', '-c',
+                                    'import ' + module ],
+                                  env=env, stderr=subprocess.PIPE,
+                                  universal_newlines=True)
+            if proc.returncode != 0:
+                return None
+            for line in proc.stderr.splitlines():
+                fields = line.split('|')
+                if i > 0 and len(fields) == 3 and fields[2].strip() == module:
+                    t = int(fields[1])
+                    if best is None or t < best:
+                        best = t
+    return best
+
+
+class ImportTest(unittest.TestCase):
+    """Check that importing crcmod stays cheap."""
+
+    # Modules that importing crcmod may add.  Anything else, such as the
+    # threading or struct modules or crcmod.predefined, makes every program
+    # that imports crcmod slower to start.
+    allowed = { 'crcmod', 'crcmod.crcmod', 'crcmod._crcfunext',
+                'crcmod._crcfunpy', 'errno' }
+
+    def run_python(self, code):
+        env = dict(os.environ)
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(
+            [ path ] + [ p for p in [ env.get('PYTHONPATH') ] if p ])
+        return subprocess.check_output([ sys.executable, '-c', code ],
+                                       env=env, universal_newlines=True)
+
+    def test_import(self):
+        out = self.run_python('import sys\n'
+                              'before = set(sys.modules)\n'
+                              'import crcmod\n'
+                              'print(" ".join(set(sys.modules) - before))\n')
+        self.assertEqual(set(out.split()) - self.allowed, set())
+
+    def test_lazy_predefined(self):
+        out = self.run_python('import crcmod\n'
+                              'print(crcmod.predefined.mkCrcFun("crc-32")(b"123456789"))\n'
+                              'print(crcmod.predefined.PredefinedCrc("crc-32").crcValue)\n'
+                              'print(crcmod.predefined._crc_definitions[0]["name"])\n')
+        self.assertEqual(out.split(), [ str(0xCBF43926), '0', 'crc-8' ])
+
+    def test_import_time(self):
+        reference = importTime('zlib')
+        if reference is None:
+            self.skipTest("requires zlib")
+        t = importTime('crcmod')
+        self.assertLess(t, importBudget*reference,
+                        "importing crcmod took %d us, zlib %d us" % (t, reference))
+
+
+class CombineTest(unittest.TestCase):
+    """Verify combining the CRCs of two messages into the CRC of their
+    concatenation."""
+
+    lengths = [ (0, 0), (9, 0), (0, 9), (1, 1), (17, 300), (1000, 70001) ]
+
+    def check(self, crcfun):
+        for lenA, lenB in self.lengths:
+            msg = LongMessageTest.make_message(lenA + lenB)
+            a, b = msg[:lenA], msg[lenA:]
+            self.assertEqual(crcfun.combine(crcfun(a), crcfun(b), lenB),
+                             crcfun(msg))
+
+    def test_predefined(self):
+        for definition in _predefined_crc_definitions:
+            self.check(mkPredefinedCrcFun(definition['name']))
+
+    def test_init_and_xor_out(self):
+        for poly in (g8, g16, g24, g32, g64a):
+            n = _verifyPoly(poly)
+            mask = (1 << n) - 1
+            for rev in (False, True):
+                self.check(mkCrcFun(poly, initCrc=0x5A5A5A5A5A5A5A5A & mask,
+                                    rev=rev, xorOut=0x0123456789ABCDEF & mask))
+
+    def test_against_reference(self):
+        """Compare with the Python version for long lengths"""
+        for poly in (g8, g16, g24, g32, g64a):
+            n = _verifyPoly(poly)
+            for rev in (False, True):
+                table = (_mkTable_r if rev else _mkTable)(poly, n)
+                crcfun = mkCrcFun(poly, rev=rev, xorOut=0x1234)
+                ref = _crcfunpy.CrcEngine(poly, table, n, rev, crcfun.initCrc,
+                                          crcfun.xorOut)
+                for lenB in (1, 255, 1 << 20, (1 << 40) + 3, (1 << 62) - 1):
+                    self.assertEqual(crcfun.combine(0x12345, 0x6789, lenB),
+                                     ref.combine(0x12345, 0x6789, lenB))
+
+    def test_class(self):
+        crc = PredefinedCrc('crc-32')
+        a = crc.new(b'1234')
+        b = crc.new(b'56789')
+        self.assertEqual(crc.combine(a.crcValue, b.crcValue, 5), 0xCBF43926)
+        self.assertRaises(ValueError, crc.combine, 0, 0, -1)
+
+    def test_patch(self):
+        msg = LongMessageTest.make_message(20000)
+        patches = [ (0, b'abc'), (100, b'x'*5000), (19990, b'0123456789'),
+                    (5, b''), (7, msg[7:9]) ]
+        for definition in _predefined_crc_definitions:
+            crcfun = mkPredefinedCrcFun(definition['name'])
+            table = (_mkTable_r if crcfun.rev else _mkTable)(
+                definition['poly'], crcfun.width)
+            ref = _crcfunpy.CrcEngine(definition['poly'], table, crcfun.width,
+                                      crcfun.rev, crcfun.initCrc,
+                                      crcfun.xorOut)
+            crc = crcfun(msg)
+            for offset, new in patches:
+                old = msg[offset:offset+len(new)]
+                patched = msg[:offset] + new + msg[offset+len(new):]
+                for fun in (crcfun, ref):
+                    self.assertEqual(fun.patch(crc, len(msg), offset, old, new),
+                                     crcfun(patched))
+
+        crcfun = mkPredefinedCrcFun('crc-32')
+        crc = PredefinedCrc('crc-32')
+        self.assertEqual(crc.patch(0xCBF43926, 9, 2, b'3', bytearray(b'x')),
+                         crcfun(b'12x456789'))
+        for fun in (crcfun, crc):
+            self.assertRaises(ValueError, fun.patch, 0, 9, 2, b'3', b'xy')
+            self.assertRaises(ValueError, fun.patch, 0, 9, 8, b'12', b'xy')
+            self.assertRaises(ValueError, fun.patch, 0, 9, -1, b'1', b'x')
+
+    def test_extend_zeros(self):
+        for definition in _predefined_crc_definitions:
+            crcfun = mkPredefinedCrcFun(definition['name'])
+            table = (_mkTable_r if crcfun.rev else _mkTable)(
+                definition['poly'], crcfun.width)
+            ref = _crcfunpy.CrcEngine(definition['poly'], table, crcfun.width,
+                                      crcfun.rev, crcfun.initCrc,
+                                      crcfun.xorOut)
+            for n in (0, 1, 15, 1000, 70001):
+                crc = crcfun(b'123456789')
+                expected = crcfun(bytes(n), crc)
+                self.assertEqual(crcfun.extend_zeros(crc, n), expected)
+                self.assertEqual(ref.extend_zeros(crc, n), expected)
+            self.assertEqual(crcfun.extend_zeros(0x1234, 1 << 50),
+                             ref.extend_zeros(0x1234, 1 << 50))
+
+        crc = PredefinedCrc('crc-32')
+        x = crc.new(b'1234')
+        x.update_zeros(100)
+        self.assertEqual(x.crcValue, crc.new(b'1234' + bytes(100)).crcValue)
+        self.assertRaises(ValueError, x.update_zeros, -1)
+        self.assertRaises(ValueError, mkPredefinedCrcFun('crc-32').extend_zeros,
+                          0, -1)
+
+
+class ThreadTest(unittest.TestCase):
+    """Compute CRCs of large buffers from several threads at once, which
+    releases the GIL in the extension module."""
+
+    def setUp(self):
+        self.saved_threshold = getGilThreshold()
+
+    def tearDown(self):
+        setGilThreshold(self.saved_threshold)
+
+    def test_threshold(self):
+        setGilThreshold(0)
+        self.assertEqual(getGilThreshold(), 0)
+        setGilThreshold(4096)
+        self.assertEqual(getGilThreshold(), 4096)
+        self.assertRaises(ValueError, setGilThreshold, -1)
+        self.assertEqual(getGilThreshold(), 4096)
+
+    def test_concurrent(self):
+        setGilThreshold(1024)
+        msgs = [ LongMessageTest.make_message(100000 + 4099*i) for i in range(4) ]
+        funs = [ mkPredefinedCrcFun(name) for name in
+                 ('crc-32', 'crc-32c', 'crc-64', 'crc-16', 'xmodem') ]
+        expected = [ [ f(msg) for msg in msgs ] for f in funs ]
+        results = {}
+
+        def worker(i):
+            crc = Crc(0x104C11DB7)
+            for _ in range(3):
+                results[i] = [ [ f(msg) for msg in msgs ] for f in funs ]
+            for msg in msgs:
+                crc.update(msg)
+            results[i, 'class'] = crc.crcValue
+
+        threads = [ threading.Thread(target=worker, args=(i,)) for i in range(4) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        crc = Crc(0x104C11DB7)
+        for msg in msgs:
+            crc.update(msg)
+        for i in range(4):
+            self.assertEqual(results[i], expected)
+            self.assertEqual(results[i, 'class'], crc.crcValue)
+
+    def test_shared_crc(self):
+        """The state of a Crc object is locked while the GIL is released, so
+        no update is lost and __init__ from another thread is serialized."""
+        setGilThreshold(1024)
+        msg = LongMessageTest.make_message(100000)
+        expected = Crc(g32, initCrc=0)
+        expected.update(msg * 12)
+        crc = Crc(g32, initCrc=0)
+
+        def worker():
+            for i in range(3):
+                crc.update(msg)
+        threads = [ threading.Thread(target=worker) for i in range(4) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(crc.crcValue, expected.crcValue)
+
+        threads = [ threading.Thread(target=worker) for i in range(4) ]
+        for t in threads:
+            t.start()
+        for i in range(20):
+            crc.__init__(g32, initCrc=i)
+            crc.copy().hexdigest()
+        for t in threads:
+            t.join()
+        crc.__init__(g32, initCrc=0)
+        crc.update(msg * 12)
+        self.assertEqual(crc.crcValue, expected.crcValue)
+
+    @unittest.skipUnless(_usingExtension, "requires the extension module")
+    def test_reentrant(self):
+        """Using a Crc object from a function it calls while it holds its lock
+        raises an exception instead of waiting forever."""
+        class Reader:
+            def read(self, size):
+                return crc.digest()
+        crc = Crc(g32)
+        self.assertRaises(RuntimeError, crc.update_from_file, Reader())
+        crc.update(b'123456789')
+        self.assertEqual(crc.crcValue, mkCrcFun(g32)(b'123456789'))
+
+
+class ParallelTest(unittest.TestCase):
+    """Verify that computing the CRC of a buffer with several threads gives
+    the same result as the serial computation."""
+
+    def setUp(self):
+        self.saved_options = getParallelOptions()
+        setParallelOptions(chunkSize=1000, minSize=0)
+
+    def tearDown(self):
+        setParallelOptions(**self.saved_options)
+
+    def test_engine(self):
+        msg = LongMessageTest.make_message(10007)
+        for name in ('crc-32', 'crc-32c', 'crc-64', 'crc-24', 'crc-8', 'x-25'):
+            crcfun = mkPredefinedCrcFun(name)
+            for workers in (1, 2, 3, 8, 20):
+                self.assertEqual(crcfun.parallel(msg, workers=workers), crcfun(msg))
+                self.assertEqual(crcfun.parallel(msg, 0x1234, workers),
+                                 crcfun(msg, 0x1234))
+            self.assertEqual(crcfun.parallel(memoryview(msg)[5:]), crcfun(msg[5:]))
+            self.assertEqual(crcfun.parallel(array('L', msg[:8000])),
+                             crcfun(msg[:8000]))
+
+    def test_options(self):
+        msg = LongMessageTest.make_message(5000)
+        crcfun = mkPredefinedCrcFun('crc-32')
+        setParallelOptions(reusePool=False)
+        self.assertEqual(crcfun.parallel(msg, workers=4), crcfun(msg))
+        setParallelOptions(chunkSize=10**6, minSize=10**6)
+        self.assertEqual(crcfun.parallel(msg, workers=4), crcfun(msg))
+        self.assertEqual(getParallelOptions(),
+                         dict(chunkSize=10**6, minSize=10**6, reusePool=False))
+        self.assertRaises(ValueError, setParallelOptions, chunkSize=0)
+        self.assertRaises(ValueError, crcfun.parallel, msg, workers=0)
+        self.assertRaises(TypeError, crcfun.parallel, '123', workers=2)
+
+    def test_class(self):
+        msg = LongMessageTest.make_message(10007)
+        crc = PredefinedCrc('crc-32')
+        x = crc.new(msg[:3])
+        x.update(msg[3:], workers=4)
+        y = crc.new(msg)
+        self.assertEqual(x.crcValue, y.crcValue)
+        x.update(data=msg, workers=None)
+        y.update(msg)
+        self.assertEqual(x.crcValue, y.crcValue)
+        self.assertRaises(TypeError, x.update, msg, 2, 3)
+        self.assertRaises(TypeError, x.update, msg, work=2)
+
+
+class RollingCrcTest(unittest.TestCase):
+    """Verify the CRC of a sliding window against the CRC of each window."""
+
+    msg = LongMessageTest.make_message(1000)
+
+    def params(self):
+        for poly in (g8, g16, g24, g32, g64a):
+            n = _verifyPoly(poly)
+            mask = (1 << n) - 1
+            for rev in (False, True):
+                yield poly, 0x5A5A5A5A5A5A5A5A & mask, rev, 0x12345 & mask
+
+    def check(self, crcfun, window, data, crcs):
+        for i, crc in enumerate(crcs):
+            start = i + 1 - window
+            if start >= 0:
+                expected = crcfun(data[start:i+1])
+            else:
+                expected = crcfun(bytes(-start) + data[:i+1])
+            self.assertEqual(crc, expected)
+
+    def test_roll_many(self):
+        for poly, initCrc, rev, xorOut in self.params():
+            crcfun = mkCrcFun(poly, initCrc, rev, xorOut)
+            for window in (1, 7, 64):
+                r = RollingCrc(poly, window, initCrc, rev, xorOut)
+                self.check(crcfun, window, self.msg, r.roll_many(self.msg))
+                self.assertEqual(r.crcValue, crcfun(self.msg[-window:]))
+
+    def test_stream(self):
+        # The window continues across calls, with pieces shorter and longer
+        # than the window.
+        poly = 0x11EDC6F41
+        crcfun = mkCrcFun(poly)
+        r = RollingCrc(poly, 48)
+        crcs = []
+        pos = 0
+        for n in (5, 30, 100, 1, 47, 48, 49, 300):
+            crcs.extend(r.roll_many(self.msg[pos:pos+n]))
+            pos += n
+        self.check(crcfun, 48, self.msg[:pos], crcs)
+
+        x = r.copy()
+        r.update(self.msg[:10])
+        self.assertEqual(x.roll_many(self.msg[:10])[-1], r.crcValue)
+        r.reset()
+        self.assertEqual(r.crcValue, crcfun(bytes(48)))
+        self.assertEqual((r.width, r.window, r.reverse), (32, 48, True))
+
+    def test_buffer_types(self):
+        # roll_many returns a CRC for each byte of the buffer.
+        crcfun = mkCrcFun(g32)
+        words = array('H', range(10))
+        out = RollingCrc(g32, 4).roll_many(words)
+        self.assertEqual(len(out), 20)
+        self.check(crcfun, 4, words.tobytes(), out)
+        out = RollingCrc(g32, 4).roll_many(memoryview(self.msg)[:30])
+        self.check(crcfun, 4, self.msg[:30], out)
+
+    def test_reference(self):
+        """Compare the extension module with the Python version"""
+        for poly, initCrc, rev, xorOut in self.params():
+            r = RollingCrc(poly, 33, initCrc, rev, xorOut)
+            n = _verifyPoly(poly)
+            table = (_mkTable_r if rev else _mkTable)(poly, n)
+            crcfun = mkCrcFun(poly, initCrc, rev, xorOut)
+            ref = _crcfunpy.RollingBase(
+                n, rev, 33, table, _mkOutTable(crcfun, table, 33),
+                crcfun.extend_zeros(crcfun.initCrc, 33))
+            out = r.roll_many(self.msg[:200])
+            refOut = array(out.typecode, [0]) * 200
+            ref.roll_into(self.msg[:200], refOut)
+            self.assertEqual(out, refOut)
+
+    def test_errors(self):
+        self.assertRaises(ValueError, RollingCrc, g32, 0)
+        r = RollingCrc(g32, 4)
+        self.assertRaises(ValueError, r.roll_into, b'abc', bytearray(3))
+        self.assertRaises(ValueError, r.roll_into, b'abc', array('I', [0]*2))
+
+    def test_threads(self):
+        """The state is locked while the GIL is released, so updates and
+        __init__ from other threads are serialized."""
+        data = bytes(range(256)) * (getGilThreshold() // 64)
+        r = RollingCrc(g32, 48)
+        r.update(data)
+        expected = r.crcValue
+
+        def worker():
+            for i in range(4):
+                r.update(data)
+        threads = [ threading.Thread(target=worker) for i in range(4) ]
+        for t in threads:
+            t.start()
+        for i in range(20):
+            r.__init__(g32, 16 + i)
+        for t in threads:
+            t.join()
+        r.__init__(g32, 48)
+        r.update(data)
+        self.assertEqual(r.crcValue, expected)
+
+
+class ChunkingTest(unittest.TestCase):
+    """Verify the content-defined chunks of a stream."""
+
+    data = random.Random(17).getrandbits(8*200000).to_bytes(200000, 'little')
+
+    def chunks(self, data, **kw):
+        return list(chunk_stream(io.BytesIO(data), 'crc-32c', min_size=512,
+                                 avg_size=2048, max_size=8192, **kw))
+
+    def check(self, data, chunks):
+        crcfun = mkPredefinedCrcFun('crc-32c')
+        offset = 0
+        for i, (start, length, crc) in enumerate(chunks):
+            self.assertEqual(start, offset)
+            self.assertTrue(length <= 8192)
+            if i < len(chunks) - 1:
+                self.assertTrue(length >= 512)
+            self.assertEqual(crc, crcfun(data[start:start+length]))
+            offset += length
+        self.assertEqual(offset, len(data))
+
+    def test_chunks(self):
+        chunks = self.chunks(self.data)
+        self.check(self.data, chunks)
+        self.assertTrue(40 < len(chunks) < 200)
+
+        # The boundaries do not depend on the read buffer.
+        self.assertEqual(self.chunks(self.data, buffer_size=1000), chunks)
+
+        # A run of zero bytes is split at the maximum size.
+        data = bytes(30000)
+        self.check(data, self.chunks(data))
+        self.assertEqual(self.chunks(b''), [])
+
+    def test_insert(self):
+        # Inserting data only changes the chunks near the insertion.
+        chunks = self.chunks(self.data)
+        data = self.data[:100000] + b'inserted' + self.data[100000:]
+        new = self.chunks(data)
+        self.check(data, new)
+        old = set(crc for offset, length, crc in chunks)
+        changed = [ c for c in new if c[2] not in old ]
+        self.assertTrue(1 <= len(changed) <= 3)
+
+    def test_reference(self):
+        """Compare the boundaries found by the extension module and the Python
+        version"""
+        crcfun = mkPredefinedCrcFun('crc-32c')
+        table = _mkTable_r(0x11EDC6F41, 32)
+        r = RollingCrc(0x11EDC6F41, 48, crcfun.initCrc, True, crcfun.xorOut)
+        ref = _crcfunpy.RollingBase(32, True, 48, table,
+                                    _mkOutTable(crcfun, table, 48),
+                                    crcfun.extend_zeros(crcfun.initCrc, 48))
+        data = self.data[:20000]
+        pos = 0
+        while pos < len(data):
+            end = r.find_boundary(data[pos:], 0x1FF, 0, 100, 4000)
+            self.assertEqual(ref.find_boundary(data[pos:], 0x1FF, 0, 100, 4000),
+                             end)
+            self.assertEqual(r.crcValue, ref.crcValue)
+            if end < 0:
+                break
+            pos += end
+
+    def test_errors(self):
+        f = io.BytesIO(b'')
+        self.assertRaises(ValueError, list, chunk_stream(f, 'crc-32c', 100, 50))
+        self.assertRaises(ValueError, list,
+                          chunk_stream(f, 'crc-8', 0, 1 << 20, 1 << 21))
+
+
+class DeltaTest(unittest.TestCase):
+    """Verify that the deltas rebuild the new file and copy the unchanged
+    blocks."""
+
+    old = random.Random(5).getrandbits(8*50000).to_bytes(50000, 'little')
+
+    def rebuild(self, old, new, block_size, **kw):
+        sig = signature(io.BytesIO(old), block_size)
+        instructions = list(delta(sig, io.BytesIO(new), **kw))
+        out = io.BytesIO()
+        self.assertEqual(apply_delta(io.BytesIO(old), instructions, out),
+                         len(new))
+        self.assertEqual(out.getvalue(), new)
+        return instructions
+
+    def inserted(self, instructions):
+        return sum(len(i[1]) for i in instructions if i[0] == 'insert')
+
+    def test_unchanged(self):
+        instructions = self.rebuild(self.old, self.old, 1000)
+        self.assertEqual(instructions, [ ('copy', 0, len(self.old)) ])
+        # The short last block is matched at the end.
+        instructions = self.rebuild(self.old[:49500], self.old[:49500], 1000)
+        self.assertEqual(instructions, [ ('copy', 0, 49500) ])
+
+    def test_changes(self):
+        old = self.old
+        new = old[:1234] + b'inserted' + old[1234:20000] + old[21000:] + b'end'
+        instructions = self.rebuild(old, new, 1000)
+        self.assertTrue(self.inserted(instructions) < 2100)
+
+        # Moved blocks, small buffers, and short files.
+        new = old[30000:40000] + old[:30000] + b'x'
+        instructions = self.rebuild(old, new, 500, buffer_size=700)
+        self.assertTrue(self.inserted(instructions) < 1100)
+        self.rebuild(old, b'', 1000)
+        self.rebuild(b'', old[:3000], 1000)
+        self.rebuild(old[:10], old[:10] + b'abc', 16)
+
+    def test_signature(self):
+        sig = signature(io.BytesIO(self.old[:2500]), 1000, weak='crc-16')
+        self.assertEqual(sig.length, 2500)
+        weak = mkPredefinedCrcFun('crc-16')
+        strong = mkPredefinedCrcFun('crc-64-jones')
+        self.assertEqual(sig.blocks[2], (weak(self.old[2000:2500]),
+                                         strong(self.old[2000:2500])))
+        new = self.old[:1000] + b'?' + self.old[1000:2500]
+        self.assertEqual(list(delta(sig, io.BytesIO(new))),
+                         [ ('copy', 0, 1000), ('insert', b'?'),
+                           ('copy', 1000, 1500) ])
+        self.assertRaises(ValueError, signature, io.BytesIO(b''), 0)
+
+    def test_find_match(self):
+        """Compare the matches found by the extension module and the Python
+        version"""
+        crcfun = mkPredefinedCrcFun('crc-32c')
+        table = _mkTable_r(0x11EDC6F41, 32)
+        r = RollingCrc(0x11EDC6F41, 16, crcfun.initCrc, True, crcfun.xorOut)
+        ref = _crcfunpy.RollingBase(32, True, 16, table,
+                                    _mkOutTable(crcfun, table, 16),
+                                    crcfun.extend_zeros(crcfun.initCrc, 16))
+        bitmap = bytes([ 0x11 ]) * 8
+        data = self.old[:5000]
+        pos = 0
+        while pos < len(data):
+            n = r.find_match(data[pos:], bitmap, 20)
+            self.assertEqual(ref.find_match(data[pos:], bitmap, 20), n)
+            if n < 0:
+                break
+            self.assertTrue(n > 20)
+            self.assertTrue((r.crcValue & 7) in (0, 4))
+            pos += n
+        self.assertRaises(ValueError, r.find_match, data, b'abc')
+
+
+class FileCrcTest(unittest.TestCase):
+    """Verify computing the CRC of data read from files."""
+
+    def setUp(self):
+        self.msg = LongMessageTest.make_message(300001)
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, self.msg)
+        os.close(fd)
+        self.fd = os.open(self.path, os.O_RDONLY)
+
+    def tearDown(self):
+        os.close(self.fd)
+        os.unlink(self.path)
+
+    def engines(self):
+        crcfun = mkPredefinedCrcFun('crc-32c')
+        table = _mkTable_r(0x11EDC6F41, 32)
+        return [ crcfun, _crcfunpy.CrcEngine(0x11EDC6F41, table, 32, True,
+                                             crcfun.initCrc, crcfun.xorOut) ]
+
+    @unittest.skipUnless(hasattr(signal, 'setitimer') and
+                         os.path.exists('/dev/zero'), "requires setitimer")
+    def test_signals(self):
+        """An endless file can be interrupted without a progress function"""
+        class Interrupted(Exception):
+            pass
+        def handler(signum, frame):
+            raise Interrupted()
+        crcfun = mkPredefinedCrcFun('crc-32c')
+        fd = os.open('/dev/zero', os.O_RDONLY)
+        old = signal.signal(signal.SIGALRM, handler)
+        try:
+            signal.setitimer(signal.ITIMER_REAL, 0.2)
+            self.assertRaises(Interrupted, crcfun.from_fd, fd)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old)
+            os.close(fd)
+
+    def test_from_fd(self):
+        msg = self.msg
+        for crcfun in self.engines():
+            for use_mmap in (False, True):
+                def check(expected, *args, **kw):
+                    self.assertEqual(crcfun.from_fd(self.fd, *args,
+                                                    use_mmap=use_mmap, **kw),
+                                     crcfun(expected))
+                check(msg)
+                check(msg[5000:], 5000)
+                check(msg[4097:5000], 4097, 903)
+                check(msg[-10:], len(msg) - 10, 1000)
+                check(b'', len(msg) + 10)
+                self.assertEqual(crcfun.from_fd(self.fd, crc=0x1234,
+                                                use_mmap=use_mmap),
+                                 crcfun(msg, 0x1234))
+
+                # Read from the current position.
+                os.lseek(self.fd, 10, os.SEEK_SET)
+                check(msg[10:20010], None, 20000)
+                self.assertEqual(os.lseek(self.fd, 0, os.SEEK_CUR), 20010)
+
+    def test_progress(self):
+        class Cancel(Exception):
+            pass
+        def cancel(n):
+            raise Cancel()
+
+        for crcfun in self.engines():
+            for use_mmap in (False, True):
+                reports = []
+                self.assertEqual(crcfun.from_fd(self.fd, progress=reports.append,
+                                                progress_interval=100000,
+                                                use_mmap=use_mmap),
+                                 crcfun(self.msg))
+                self.assertEqual(reports[-1], len(self.msg))
+                self.assertEqual(reports, sorted(reports))
+                self.assertRaises(Cancel, crcfun.from_fd, self.fd,
+                                  progress=cancel, progress_interval=100000,
+                                  use_mmap=use_mmap)
+            self.assertRaises(ValueError, crcfun.from_fd, self.fd, -1)
+            self.assertRaises(ValueError, crcfun.from_fd, self.fd,
+                              progress_interval=0)
+
+    def test_update_from_file(self):
+        msg = self.msg
+        for crcfun in self.engines():
+            crc = _crcfunpy.CrcBase(crcfun) if isinstance(crcfun, _crcfunpy.CrcEngine) \
+                else PredefinedCrc('crc-32c')
+            with open(self.path, 'rb') as f:
+                self.assertEqual(f.read(7), msg[:7])
+                x = crc.new()
+                self.assertEqual(x.update_from_file(f, length=1000), 1000)
+                self.assertEqual(f.read(3), msg[1007:1010])
+                self.assertEqual(x.update_from_file(f, use_mmap=True),
+                                 len(msg) - 1010)
+                self.assertEqual(f.read(), b'')
+                self.assertEqual(x.crcValue, crcfun(msg[7:1007] + msg[1010:]))
+
+            x = crc.new()
+            self.assertEqual(x.update_from_file(io.BytesIO(msg), length=12345),
+                             12345)
+            self.assertEqual(x.crcValue, crcfun(msg[:12345]))
+
+            r, w = os.pipe()
+            os.write(w, msg[:1000])
+            os.close(w)
+            x = crc.new()
+            try:
+                self.assertEqual(x.update_from_file(r), 1000)
+            finally:
+                os.close(r)
+            self.assertEqual(x.crcValue, crcfun(msg[:1000]))
+
+    def test_sparse(self):
+        # Data extents separated by holes, and a hole at the end.
+        fd, path = tempfile.mkstemp()
+        try:
+            os.pwrite(fd, self.msg[:5000], 1 << 20)
+            os.pwrite(fd, self.msg[:100], 3 << 20)
+            os.ftruncate(fd, 5 << 20)
+            data = bytearray(5 << 20)
+            data[1 << 20:(1 << 20) + 5000] = self.msg[:5000]
+            data[3 << 20:(3 << 20) + 100] = self.msg[:100]
+
+            for crcfun in self.engines():
+                for use_mmap in (False, True):
+                    def check(offset, length=None):
+                        end = len(data) if length is None else offset + length
+                        self.assertEqual(
+                            crcfun.from_fd(fd, offset, length, sparse=True,
+                                           use_mmap=use_mmap),
+                            crcfun(data[offset:end]))
+                    check(0)
+                    check(1000, 1 << 20)
+                    check((1 << 20) + 10, 100)
+                    check((3 << 20) + 50)
+                    check(4 << 20)
+
+                    # Read from the current position.
+                    os.lseek(fd, 100, os.SEEK_SET)
+                    self.assertEqual(crcfun.from_fd(fd, None, 3 << 20,
+                                                    sparse=True),
+                                     crcfun(data[100:(3 << 20) + 100]))
+                    self.assertEqual(os.lseek(fd, 0, os.SEEK_CUR),
+                                     (3 << 20) + 100)
+
+                reports = []
+                crcfun.from_fd(fd, sparse=True, progress=reports.append,
+                               progress_interval=1 << 20)
+                self.assertEqual(reports[-1], len(data))
+                self.assertEqual(reports, sorted(reports))
+
+            x = PredefinedCrc('crc-32c')
+            with open(path, 'rb') as f:
+                f.seek(10)
+                self.assertEqual(x.update_from_file(f, sparse=True),
+                                 len(data) - 10)
+                self.assertEqual(f.tell(), len(data))
+            self.assertEqual(x.crcValue, self.engines()[0](data[10:]))
+        finally:
+            os.close(fd)
+            os.unlink(path)
+
+
+class AsyncioTest(unittest.TestCase):
+    """Verify the CRC of asyncio streams, with chunks on both sides of the
+    threshold for computing them in the thread pool."""
+
+    sizes = [ 0, 10, 70000, 3, 100000, 1, 65535, 65536 ]
+
+    def chunks(self):
+        msg = LongMessageTest.make_message(sum(self.sizes))
+        pos = 0
+        for n in self.sizes:
+            yield msg[pos:pos+n]
+            pos += n
+
+    def reader(self):
+        reader = asyncio.StreamReader()
+        for chunk in self.chunks():
+            reader.feed_data(chunk)
+        reader.feed_eof()
+        return reader
+
+    def test_crc_stream(self):
+        expected = mkPredefinedCrcFun('crc-32')(b''.join(self.chunks()))
+
+        async def run():
+            crc = await crc_stream(self.reader(), 'crc-32', chunk_size=50000)
+            self.assertEqual(crc.crcValue, expected)
+
+            crc = PredefinedCrc('crc-32')
+            result = await crc_stream(self.reader(), crc, threshold=0)
+            self.assertTrue(result is crc)
+            self.assertEqual(crc.crcValue, expected)
+
+            crcfun = mkPredefinedCrcFun('crc-32')
+            crc = await crc_stream(self.reader(), crcfun)
+            self.assertTrue(isinstance(crc, Crc))
+            self.assertEqual(crc.crcValue, expected)
+            self.assertEqual(crc.hexdigest(), '%08X' % expected)
+            self.assertEqual(crc.poly, PredefinedCrc('crc-32').poly)
+            self.assertEqual(str(crc.new()), str(PredefinedCrc('crc-32')))
+        asyncio.run(run())
+
+    def test_iterator(self):
+        expected = mkPredefinedCrcFun('crc-64')(b''.join(self.chunks()))
+
+        async def source():
+            for chunk in self.chunks():
+                await asyncio.sleep(0)
+                yield chunk
+
+        async def run():
+            stream = CrcIterator(source(), 'crc-64', threshold=1000)
+            chunks = [ chunk async for chunk in stream ]
+            self.assertEqual(chunks, list(self.chunks()))
+            self.assertEqual(stream.crc.crcValue, expected)
+
+            stream = CrcIterator(self.reader(), 'crc-64', chunk_size=4096)
+            data = b''.join([ chunk async for chunk in stream ])
+            self.assertEqual(data, b''.join(self.chunks()))
+            self.assertEqual(stream.crc.crcValue, expected)
+        asyncio.run(run())
+
+
+class CrcIOTest(unittest.TestCase):
+    """Verify the CRC computed by the file-like wrappers."""
+
+    msg = LongMessageTest.make_message(300000)
+
+    def crc(self):
+        return PredefinedCrc('crc-32c')
+
+    def expected(self, data):
+        return mkPredefinedCrcFun('crc-32c')(data)
+
+    def test_reader(self):
+        reader = CrcReader(io.BytesIO(self.msg), self.crc())
+        dst = io.BytesIO()
+        shutil.copyfileobj(reader, dst, 10000)
+        self.assertEqual(dst.getvalue(), self.msg)
+        self.assertEqual(reader.crc.crcValue, self.expected(self.msg))
+        self.assertEqual(reader.hexdigest(), reader.crc.hexdigest())
+        self.assertEqual(reader.tell(), len(self.msg))
+
+    def test_reader_readinto(self):
+        reader = CrcReader(io.BytesIO(self.msg), self.crc())
+        buf = bytearray(7777)
+        data = bytearray()
+        while True:
+            n = reader.readinto(buf)
+            if not n:
+                break
+            data += buf[:n]
+        self.assertEqual(data, self.msg)
+        self.assertEqual(reader.crc.crcValue, self.expected(self.msg))
+
+        # Buffers with items longer than a byte and a raw file without
+        # readinto.
+        class Raw(object):
+            def __init__(self, data):
+                self.f = io.BytesIO(data)
+            def read(self, n=-1):
+                return self.f.read(n)
+        for raw in [ io.BytesIO(self.msg[:10]), Raw(self.msg[:10]) ]:
+            reader = CrcReader(raw, self.crc())
+            buf = array('i', [0]*4)
+            self.assertEqual(reader.readinto(buf), 10)
+            self.assertEqual(buf.tobytes()[:10], self.msg[:10])
+            self.assertEqual(reader.crc.crcValue, self.expected(self.msg[:10]))
+
+    def test_reader_methods(self):
+        reader = io.BufferedReader(CrcReader(io.BytesIO(self.msg), self.crc()))
+        data = reader.read(100) + reader.read1(1000) + reader.read()
+        self.assertEqual(data, self.msg)
+        self.assertEqual(reader.raw.crc.crcValue, self.expected(self.msg))
+
+        raw = io.BytesIO(self.msg)
+        reader = CrcReader(raw, self.crc())
+        reader.read(10)
+        self.assertTrue(reader.detach() is raw)
+        self.assertFalse(raw.closed)
+        self.assertTrue(reader.closed)
+        self.assertRaises(ValueError, reader.read)
+
+        reader = CrcReader(raw, self.crc())
+        self.assertFalse(reader.seekable())
+        reader.close()
+        self.assertTrue(raw.closed)
+
+    def test_writer(self):
+        raw = io.BytesIO()
+        writer = CrcWriter(raw, self.crc())
+        shutil.copyfileobj(io.BytesIO(self.msg), writer, 10000)
+        writer.write(memoryview(self.msg)[:5])
+        self.assertEqual(raw.getvalue(), self.msg + self.msg[:5])
+        self.assertEqual(writer.crc.crcValue,
+                         self.expected(self.msg + self.msg[:5]))
+
+    def test_tarfile(self):
+        raw = io.BytesIO()
+        writer = CrcWriter(raw, self.crc())
+        with tarfile.open(fileobj=writer, mode='w') as tar:
+            info = tarfile.TarInfo('msg')
+            info.size = len(self.msg)
+            tar.addfile(info, io.BytesIO(self.msg))
+        self.assertEqual(writer.crc.crcValue, self.expected(raw.getvalue()))
+
+        reader = CrcReader(io.BytesIO(raw.getvalue()), self.crc())
+        with tarfile.open(fileobj=reader, mode='r|') as tar:
+            for info in tar:
+                self.assertEqual(tar.extractfile(info).read(), self.msg)
+            reader.read()
+        self.assertEqual(reader.crc.crcValue, self.expected(raw.getvalue()))
+
+
+class FilesTest(unittest.TestCase):
+    """Verify the CRCs of files computed by a pool of processes."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, n in enumerate([ 0, 1, 100, 4999, 5000, 5001, 23456 ]):
+            path = os.path.join(self.tmpdir.name, 'file%d' % i)
+            with open(path, 'wb') as f:
+                f.write(LongMessageTest.make_message(n + i)[i:])
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def expected(self, crcfun):
+        result = {}
+        for path in self.paths:
+            with open(path, 'rb') as f:
+                result[path] = crcfun(f.read())
+        return result
+
+    def test_checksum_many(self):
+        results = dict(checksum_many(self.paths, 'crc-32c', processes=2,
+                                     chunk_size=5000, batch_size=3))
+        self.assertEqual(results, self.expected(mkPredefinedCrcFun('crc-32c')))
+
+        crc = Crc(g16, initCrc=0x1234, rev=False, xorOut=0xFFFF)
+        results = dict(checksum_many(iter(self.paths), crc, processes=1))
+        self.assertEqual(results, self.expected(crc._crc))
+
+    def test_errors(self):
+        missing = os.path.join(self.tmpdir.name, 'missing')
+        errors = []
+        results = dict(checksum_many(self.paths + [missing], 'crc-32',
+                                     processes=2, onerror=errors.append))
+        self.assertEqual(results, self.expected(mkPredefinedCrcFun('crc-32')))
+        self.assertEqual([ e.filename for e in errors ], [missing])
+        with self.assertRaises(FileNotFoundError):
+            list(checksum_many([missing], 'crc-32', processes=1))
+        with self.assertRaises(TypeError):
+            list(checksum_many(self.paths, 0x104C11DB7))
+
+
 class CrcClassTest(unittest.TestCase):
     """Verify the Crc class"""
 
@@ -418,6 +1652,51 @@ xorOut   = 0xFFFFFFFF
 crcValue = 0x00000000'''
         self.assertEqual(str(y), str_rep)
 
+    def test_new_and_copy(self):
+        """Verify that new and copy keep the type and are independent"""
+        crc = PredefinedCrc('crc-24')
+        x = crc.new(self.msg[:8])
+        self.assertTrue(type(x) is PredefinedCrc)
+        self.assertEqual(crc.crcValue, crc.initCrc)
+        y = x.copy()
+        y.update(self.msg[8:])
+        z = crc.new(arg=self.msg)
+        self.assertEqual(y.crcValue, z.crcValue)
+        self.assertNotEqual(x.crcValue, y.crcValue)
+        self.assertEqual(copy.copy(z).digest(), z.digest())
+        self.assertEqual(len(z.digest()), 3)
+        self.assertEqual(z.hexdigest(), '%06X' % z.crcValue)
+
+        z.note = [ 'data' ]
+        for c in (copy.copy(z), copy.deepcopy(z)):
+            self.assertTrue(type(c) is PredefinedCrc)
+            self.assertEqual(c.crcValue, z.crcValue)
+            self.assertEqual(c.note, z.note)
+            c.update(b'1')
+            self.assertNotEqual(c.crcValue, z.crcValue)
+        self.assertTrue(copy.copy(z).note is z.note)
+        self.assertFalse(copy.deepcopy(z).note is z.note)
+        crc = Crc(g32)
+        crc.update(b'123')
+        crc.name = 'g32'
+        d = copy.deepcopy([crc, crc])
+        self.assertTrue(d[0] is d[1])
+        self.assertEqual((d[0].crcValue, d[0].name), (crc.crcValue, 'g32'))
+
+        crc = Crc(0x142F0E1EBA9EA3693, initCrc=0, rev=False)
+        crc.crcValue = 0x0102030405060708
+        self.assertEqual(crc.digest(), bytes(range(1, 9)))
+        self.assertEqual(crc.hexdigest(), '0102030405060708')
+        crc.crcValue = -1
+        self.assertEqual(crc.crcValue, 0xFFFFFFFFFFFFFFFF)
+
+    def test_uninitialized(self):
+        """Verify that an uninitialized instance raises an error"""
+        crc = Crc(poly=None, initialize=False)
+        self.assertRaises(ValueError, crc.update, self.msg)
+        self.assertRaises(ValueError, crc.new)
+        self.assertRaises(ValueError, crc.hexdigest)
+
 
 class PredefinedCrcTest(unittest.TestCase):
     """Verify the predefined CRCs"""
@@ -478,6 +1757,37 @@ class PredefinedCrcTest(unittest.TestCase):
             crc1.update(b"123456789")
             self.assertEqual(crc1.crcValue, table_entry['check'], "Wrong answer for CRC '%s'" % table_entry['name'])
 
+    @unittest.skipUnless(_usingExtension, 'requires the extension module')
+    def test_compiled_tables(self):
+        """Check the tables compiled into the extension module against the
+        generated ones"""
+        if _crcfun._predefinedTable(0x104C11DB7, 32, True) is None:
+            self.skipTest('the extension module was built without the tables')
+        for table_entry in _predefined_crc_definitions:
+            poly = table_entry['poly']
+            n = _verifyPoly(poly)
+            rev = table_entry['reverse']
+            table, consts = _crcfun._predefinedTable(poly, n, rev)
+            self.assertTrue(table.readonly)
+            if rev:
+                expected = _mkTable_r(poly, n)
+            else:
+                expected = _mkTable(poly, n)
+            self.assertEqual(bytes(table), _mkEngineTable(expected, n, rev),
+                             "Wrong table for CRC '%s'" % table_entry['name'])
+            self.assertEqual(consts, _mkFoldConsts(poly, n, rev))
+
+            crc_func = mkPredefinedCrcFun(table_entry['name'])
+            self.assertTrue(isinstance(crc_func.table, memoryview))
+            self.assertEqual(PredefinedCrc(table_entry['name']).table,
+                             tuple(expected))
+
+        self.assertEqual(_crcfun._predefinedTable(0x1000000AF, 32, True), None)
+        self.assertRaises(TypeError, _crcfun.CrcEngine, 0x104C11DB7,
+                          memoryview(_mkEngineTable(_mkTable_r(0x104C11DB7, 32),
+                                                    32, True)),
+                          32, True, 0, 0)
+
 
 class InputTypesTest(unittest.TestCase):
     """Check the various input types that CRC functions can accept."""
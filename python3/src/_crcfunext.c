@@ -28,6 +28,31 @@
 
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <structmember.h>
+
+#include <errno.h>
+#include <stdlib.h>
+#if defined(_WIN32)
+#include <io.h>
+#else
+#define HAVE_POSIX_FILES
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#endif
+
+// Calls to CrcEngine objects use the vectorcall protocol when it is available.
+#if PY_VERSION_HEX >= 0x03080000
+#define HAVE_VECTORCALL
+#if PY_VERSION_HEX >= 0x03090000
+#define TPFLAGS_VECTORCALL Py_TPFLAGS_HAVE_VECTORCALL
+#else
+#define TPFLAGS_VECTORCALL _Py_TPFLAGS_HAVE_VECTORCALL
+#endif
+#else
+#define TPFLAGS_VECTORCALL 0
+#endif
 
 // Note: the type declarations are set up to work on 32-bit and 64-bit
 // platforms using the GNU C compiler.  They may need to be adjusted for other
@@ -47,30 +72,39 @@ typedef unsigned long long UINT64;
 #define INPUT32 "OIs#"
 #define INPUT64 "OKs#"
 
-// The following macro is taken from hashlib.h in the Python 3.1 code,
+// The following is adapted from the macro in hashlib.h in the Python 3.1 code,
 // providing "Common code for use by all hashlib related modules".
 
 // Given a PyObject* obj, fill in the Py_buffer* viewp with the result
-// of PyObject_GetBuffer.  Sets an exception and issues a return NULL
-// on any errors.
+// of PyObject_GetBuffer.  Sets an exception and returns -1 on any errors.
+static int
+getBufferView(PyObject* obj, Py_buffer* viewp)
+{
+    if (PyUnicode_Check(obj)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "Unicode-objects must be encoded before calculating a CRC");
+        return -1;
+    }
+    if (!PyObject_CheckBuffer(obj)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "object supporting the buffer API required");
+        return -1;
+    }
+    if (PyObject_GetBuffer(obj, viewp, PyBUF_SIMPLE) == -1) {
+        return -1;
+    }
+    if (viewp->ndim > 1) {
+        PyErr_SetString(PyExc_BufferError,
+                        "Buffer must be single dimension");
+        PyBuffer_Release(viewp);
+        return -1;
+    }
+    return 0;
+}
+
+// Same as getBufferView but issues a return NULL on any errors.
 #define GET_BUFFER_VIEW_OR_ERROUT(obj, viewp) do { \
-        if (PyUnicode_Check((obj))) { \
-            PyErr_SetString(PyExc_TypeError, \
-                            "Unicode-objects must be encoded before calculating a CRC");\
-            return NULL; \
-        } \
-        if (!PyObject_CheckBuffer((obj))) { \
-            PyErr_SetString(PyExc_TypeError, \
-                            "object supporting the buffer API required"); \
-            return NULL; \
-        } \
-        if (PyObject_GetBuffer((obj), (viewp), PyBUF_SIMPLE) == -1) { \
-            return NULL; \
-        } \
-        if ((viewp)->ndim > 1) { \
-            PyErr_SetString(PyExc_BufferError, \
-                            "Buffer must be single dimension"); \
-            PyBuffer_Release((viewp)); \
+        if (getBufferView((obj), (viewp)) < 0) { \
             return NULL; \
         } \
     } while(0);
@@ -83,13 +117,609 @@ typedef unsigned long long UINT64;
 #define BYTE3(x) ((UINT8)((x) >> 24))
 #define BYTE7(x) ((UINT8)((x) >> 56))
 
+//-----------------------------------------------------------------------------
+// The table passed in from Python may be extended for the slicing-by-N
+// algorithms.  In that case it holds SLICE_TABLES tables of 256 entries, where
+// table k contains the CRC of each byte value followed by k zero bytes.  Table
+// 0 is the usual byte-at-a-time table.
+#define SLICE_TABLES 16
+
+// Buffers shorter than these lengths are processed by the byte-at-a-time loop
+// since the setup cost and cache footprint of the larger tables do not pay off.
+#define SLICE8_MIN_LEN 32
+#define SLICE16_MIN_LEN 256
+
+// The slicing tables may in turn be followed by BRAID_TABLES tables for the
+// braided engine.  That engine keeps BRAID_LANES independent CRCs, each of
+// which processes every BRAID_LANES'th 64-bit word of the data, so braid table
+// t holds the CRC of each byte value followed by 8*(BRAID_LANES-1) + t zero
+// bytes.  The lanes have no dependencies on each other, which lets the CPU
+// overlap their table lookups.  The number of lanes must match _BRAID_LANES
+// in crcmod.py, and BRAID_LOOP is written out for that number of lanes.
+#define BRAID_LANES 5
+#define BRAID_TABLES 8
+#define BRAID_MIN_LEN 1024
+
+// Return the number of 256 entry tables in a table string, or zero if the
+// length is not one that the engines below understand.
+static int
+tableCount(Py_ssize_t tableLen, Py_ssize_t entrySize)
+{
+    Py_ssize_t n = tableLen / (256*entrySize);
+
+    if (n*256*entrySize != tableLen)
+    {
+        return 0;
+    }
+    if (n == 1 || n == 8 || n == SLICE_TABLES ||
+        n == SLICE_TABLES + BRAID_TABLES)
+    {
+        return (int)n;
+    }
+    return 0;
+}
+
+// Load a 64-bit word with the first data byte in the low byte (bit reversed
+// algorithms) or the high byte (forward algorithms).  The data may be
+// unaligned.
+static inline UINT64
+load64le(const UINT8* data)
+{
+#if PY_LITTLE_ENDIAN
+    UINT64 w;
+
+    memcpy(&w, data, 8);
+    return w;
+#else
+    return (UINT64)data[0] | ((UINT64)data[1] << 8) |
+           ((UINT64)data[2] << 16) | ((UINT64)data[3] << 24) |
+           ((UINT64)data[4] << 32) | ((UINT64)data[5] << 40) |
+           ((UINT64)data[6] << 48) | ((UINT64)data[7] << 56);
+#endif
+}
+
+static inline UINT64
+load64be(const UINT8* data)
+{
+#if defined(__GNUC__) || defined(__clang__)
+    UINT64 w;
+
+    memcpy(&w, data, 8);
+#if PY_LITTLE_ENDIAN
+    w = __builtin_bswap64(w);
+#endif
+    return w;
+#else
+    return ((UINT64)data[0] << 56) | ((UINT64)data[1] << 48) |
+           ((UINT64)data[2] << 40) | ((UINT64)data[3] << 32) |
+           ((UINT64)data[4] << 24) | ((UINT64)data[5] << 16) |
+           ((UINT64)data[6] << 8) | (UINT64)data[7];
+#endif
+}
+
+#define LOAD_WORD(p, REV) ((REV) ? load64le(p) : load64be(p))
+
+// Line the CRC register up with the first bytes of a word loaded by LOAD_WORD.
+// Any garbage above the width of a forward CRC is shifted out.
+#define CRC_WORD(crc, WIDTH, REV) \
+    ((REV) ? (UINT64)(crc) : (UINT64)(crc) << (64 - (WIDTH)))
+
+// Extract data byte j from a word loaded by LOAD_WORD.
+#define WORD_BYTE(w, j, REV) \
+    ((UINT8)((REV) ? (w) >> (8*(j)) : (w) >> (56 - 8*(j))))
+
+// Look up the eight bytes of a word in tables k to k+7, where the last byte
+// of the word uses table k.
+#define WORD_LOOKUP(w, table, k, REV) \
+    ((table)[((k)+7)*256 + WORD_BYTE(w, 0, REV)] ^ \
+     (table)[((k)+6)*256 + WORD_BYTE(w, 1, REV)] ^ \
+     (table)[((k)+5)*256 + WORD_BYTE(w, 2, REV)] ^ \
+     (table)[((k)+4)*256 + WORD_BYTE(w, 3, REV)] ^ \
+     (table)[((k)+3)*256 + WORD_BYTE(w, 4, REV)] ^ \
+     (table)[((k)+2)*256 + WORD_BYTE(w, 5, REV)] ^ \
+     (table)[((k)+1)*256 + WORD_BYTE(w, 6, REV)] ^ \
+     (table)[(k)*256 + WORD_BYTE(w, 7, REV)])
+
+// Process 8 or 16 bytes with the slicing-by-N algorithm.  The CRC register is
+// folded into the leading bytes of the block and each byte is then looked up
+// in the table that accounts for the number of bytes following it.
+#define SLICE8_STEP(crc, data, table, WIDTH, REV) do { \
+        UINT64 w_ = LOAD_WORD(data, REV) ^ CRC_WORD(crc, WIDTH, REV); \
+        (crc) = WORD_LOOKUP(w_, table, 0, REV); \
+    } while (0)
+
+#define SLICE16_STEP(crc, data, table, WIDTH, REV) do { \
+        UINT64 w0_ = LOAD_WORD(data, REV) ^ CRC_WORD(crc, WIDTH, REV); \
+        UINT64 w1_ = LOAD_WORD((data) + 8, REV); \
+        (crc) = WORD_LOOKUP(w0_, table, 8, REV) ^ \
+                WORD_LOOKUP(w1_, table, 0, REV); \
+    } while (0)
+
+// Process the data in blocks of BRAID_LANES 64-bit words, one word per lane.
+// Each lane treats the words of the other lanes as zeros, which the braid
+// tables account for.  The last block is processed serially, folding in each
+// lane's CRC as the position of its next word is reached, which merges the
+// lanes into a single CRC.  At least two blocks of data are required.  The
+// lanes are kept in separate variables so that they stay in registers.
+#define BRAID_LOOP(crc, data, dataLen, table, WIDTH, REV, TYPE) do { \
+        const TYPE* braid_ = (table) + SLICE_TABLES*256; \
+        Py_ssize_t blocks_ = (dataLen) / (8*BRAID_LANES); \
+        TYPE c0_ = (crc); \
+        TYPE c1_ = 0; \
+        TYPE c2_ = 0; \
+        TYPE c3_ = 0; \
+        TYPE c4_ = 0; \
+        (dataLen) -= blocks_*8*BRAID_LANES; \
+        while (--blocks_ > 0) \
+        { \
+            SLICE8_STEP(c0_, (data), braid_, WIDTH, REV); \
+            SLICE8_STEP(c1_, (data) + 8, braid_, WIDTH, REV); \
+            SLICE8_STEP(c2_, (data) + 16, braid_, WIDTH, REV); \
+            SLICE8_STEP(c3_, (data) + 24, braid_, WIDTH, REV); \
+            SLICE8_STEP(c4_, (data) + 32, braid_, WIDTH, REV); \
+            (data) += 8*BRAID_LANES; \
+        } \
+        SLICE8_STEP(c0_, (data), table, WIDTH, REV); \
+        c1_ ^= c0_; \
+        SLICE8_STEP(c1_, (data) + 8, table, WIDTH, REV); \
+        c2_ ^= c1_; \
+        SLICE8_STEP(c2_, (data) + 16, table, WIDTH, REV); \
+        c3_ ^= c2_; \
+        SLICE8_STEP(c3_, (data) + 24, table, WIDTH, REV); \
+        c4_ ^= c3_; \
+        SLICE8_STEP(c4_, (data) + 32, table, WIDTH, REV); \
+        (crc) = c4_; \
+        (data) += 8*BRAID_LANES; \
+    } while (0)
+
+// Define the low level engine for one CRC width and direction.  The braided
+// and slicing loops handle the bulk of long buffers and the byte-at-a-time
+// loop handles whatever is left over at the end.  A 24-bit forward CRC may be
+// left with garbage in the high byte, which the caller is expected to mask off.
+#define DEFINE_TABLE_ENGINE(NAME, TYPE, WIDTH, REV) \
+static TYPE \
+NAME(TYPE crc, const UINT8* data, Py_ssize_t dataLen, const TYPE* table, \
+     int nTables) \
+{ \
+    if (nTables >= SLICE_TABLES + BRAID_TABLES && dataLen >= BRAID_MIN_LEN) \
+    { \
+        BRAID_LOOP(crc, data, dataLen, table, WIDTH, REV, TYPE); \
+    } \
+    if (nTables >= 16 && dataLen >= SLICE16_MIN_LEN) \
+    { \
+        while (dataLen >= 16) \
+        { \
+            SLICE16_STEP(crc, data, table, WIDTH, REV); \
+            data += 16; \
+            dataLen -= 16; \
+        } \
+    } \
+    else if (nTables >= 8 && dataLen >= SLICE8_MIN_LEN) \
+    { \
+        while (dataLen >= 8) \
+        { \
+            SLICE8_STEP(crc, data, table, WIDTH, REV); \
+            data += 8; \
+            dataLen -= 8; \
+        } \
+    } \
+    while (dataLen--) \
+    { \
+        if (REV) \
+            crc = table[*data ^ BYTE0(crc)] ^ (crc >> 8); \
+        else \
+            crc = table[*data ^ (UINT8)(crc >> ((WIDTH) - 8))] ^ (crc << 8); \
+        data++; \
+    } \
+    return crc; \
+}
+
+DEFINE_TABLE_ENGINE(crc8Engine, UINT8, 8, 0)
+DEFINE_TABLE_ENGINE(crc8rEngine, UINT8, 8, 1)
+DEFINE_TABLE_ENGINE(crc16Engine, UINT16, 16, 0)
+DEFINE_TABLE_ENGINE(crc16rEngine, UINT16, 16, 1)
+DEFINE_TABLE_ENGINE(crc24Engine, UINT32, 24, 0)
+DEFINE_TABLE_ENGINE(crc24rEngine, UINT32, 24, 1)
+DEFINE_TABLE_ENGINE(crc32Engine, UINT32, 32, 0)
+DEFINE_TABLE_ENGINE(crc32rEngine, UINT32, 32, 1)
+DEFINE_TABLE_ENGINE(crc64Engine, UINT64, 64, 0)
+DEFINE_TABLE_ENGINE(crc64rEngine, UINT64, 64, 1)
+
+// Run the table engine that matches the CRC width and direction.  The CRC is
+// passed and returned in a 64-bit variable so that callers that handle every
+// width do not need to know the data type used by each engine.
+static UINT64
+tableEngine(int width, int rev, UINT64 crc, const UINT8* data,
+            Py_ssize_t dataLen, const void* table, int nTables)
+{
+    switch (width)
+    {
+    case 8:
+        if (rev)
+            return crc8rEngine((UINT8)crc, data, dataLen, table, nTables);
+        return crc8Engine((UINT8)crc, data, dataLen, table, nTables);
+    case 16:
+        if (rev)
+            return crc16rEngine((UINT16)crc, data, dataLen, table, nTables);
+        return crc16Engine((UINT16)crc, data, dataLen, table, nTables);
+    case 24:
+        if (rev)
+            return crc24rEngine((UINT32)crc & 0xFFFFFFU, data, dataLen,
+                                table, nTables);
+        return crc24Engine((UINT32)crc, data, dataLen, table,
+                           nTables) & 0xFFFFFFU;
+    case 32:
+        if (rev)
+            return crc32rEngine((UINT32)crc, data, dataLen, table, nTables);
+        return crc32Engine((UINT32)crc, data, dataLen, table, nTables);
+    default:
+        if (rev)
+            return crc64rEngine(crc, data, dataLen, table, nTables);
+        return crc64Engine(crc, data, dataLen, table, nTables);
+    }
+}
+
+// Size in bytes of the table entries used for a CRC width.
+#define ENTRY_SIZE(width) ((width) == 24 ? 4 : (width)/8)
+
+// Mask selecting the bits of a CRC of the given width.
+#define WIDTH_MASK(width) \
+    ((width) == 64 ? ~(UINT64)0 : (((UINT64)1 << (width)) - 1))
+
+//-----------------------------------------------------------------------------
+// The GIL is released while the engines run over buffers of at least this many
+// bytes so that other threads can run.  Shorter buffers keep the lock since
+// releasing and reacquiring it costs more than computing their CRC.  The
+// caller holds a buffer view on the data and references to the tables, so
+// none of them can go away while the lock is released.
+
+#define GIL_THRESHOLD 65536
+
+static Py_ssize_t gilThreshold = GIL_THRESHOLD;
+
+static PyThreadState*
+releaseGil(Py_ssize_t dataLen)
+{
+    if (dataLen >= gilThreshold)
+    {
+        return PyEval_SaveThread();
+    }
+    return NULL;
+}
+
+static void
+acquireGil(PyThreadState* save)
+{
+    if (save != NULL)
+    {
+        PyEval_RestoreThread(save);
+    }
+}
+
+//-----------------------------------------------------------------------------
+// The hardware engines below are only built for x86-64 with compilers that
+// support per-function target attributes.  The CPU features are checked when
+// the module is loaded, and the table engines are used when they are missing.
+
+static int hasClmul = 0;
+static int hasCrc32c = 0;
+
+#if defined(__x86_64__) && (defined(__GNUC__) || defined(__clang__))
+#define HAVE_X86_ENGINES 1
+
+#include <cpuid.h>
+#include <immintrin.h>
+
+// Return the feature flags in ECX reported by CPUID leaf 1.
+static unsigned int
+cpuidFeatures(void)
+{
+    unsigned int eax, ebx, ecx, edx;
+
+    if (!__get_cpuid(1, &eax, &ebx, &ecx, &edx))
+    {
+        return 0;
+    }
+    return ecx;
+}
+
+#endif // HAVE_X86_ENGINES
+
+//-----------------------------------------------------------------------------
+// Carry-less multiply folding engine.
+//
+// The buffer is folded 128 bits at a time using PCLMULQDQ and the remaining
+// 128-bit value is reduced with a Barrett reduction.  To handle every CRC
+// width with the same code, a CRC of width n with polynomial P is computed as
+// a 64-bit CRC with polynomial P*x^(64-n).  The result is then the desired CRC
+// shifted up by 64-n bits (or, for the bit reversed algorithms, exactly the
+// desired CRC).
+//
+// The folding constants are computed by _mkFoldConsts in crcmod.py and passed
+// in as a string of FOLD_CONSTS 64-bit values:
+//   0 - width of the CRC in bits
+//   1 - non-zero for the bit reversed algorithm
+//   2, 3 - constants for folding across 512 bits
+//   4, 5 - constants for folding across 128 bits
+//   6 - low 64 bits of the Barrett constant floor(x^128 / P')
+//   7 - low 64 bits of the polynomial P'
+// The folding constants are stored in the order in which they line up with
+// the two halves of the 128-bit accumulator.  For the bit reversed algorithms
+// all of the constants are bit reversed, and the folding constants carry one
+// less power of x to account for the bit reversed product being shifted by one
+// position.
+
+#define FOLD_CONSTS 8
+
+// Buffers shorter than this are left to the table engines.
+#define FOLD_MIN_LEN 128
+
+#ifdef HAVE_X86_ENGINES
+
+#define CLMUL_TARGET __attribute__((target("pclmul,ssse3,sse4.1")))
+
+// Check whether the CPU supports the instructions used by the folding engine.
+static int
+detectClmul(void)
+{
+    unsigned int ecx = cpuidFeatures();
+
+    return (ecx & bit_PCLMUL) && (ecx & bit_SSSE3) && (ecx & bit_SSE4_1);
+}
+
+// Fold the 128-bit accumulator x across the distance encoded in k.
+CLMUL_TARGET static inline __m128i
+fold128(__m128i x, __m128i k)
+{
+    return _mm_xor_si128(_mm_clmulepi64_si128(x, k, 0x00),
+                         _mm_clmulepi64_si128(x, k, 0x11));
+}
+
+// Load 16 bytes of data so that the first bit of the data is the highest
+// degree coefficient (forward) or the lowest bit (bit reversed).
+CLMUL_TARGET static inline __m128i
+foldLoad(const UINT8* data, int rev)
+{
+    __m128i x = _mm_loadu_si128((const __m128i*)data);
+
+    if (!rev)
+    {
+        x = _mm_shuffle_epi8(x, _mm_set_epi8(0, 1, 2, 3, 4, 5, 6, 7,
+                                             8, 9, 10, 11, 12, 13, 14, 15));
+    }
+    return x;
+}
+
+// Return the full carry-less product of two 64-bit values.
+CLMUL_TARGET static inline __m128i
+clmul64(UINT64 a, UINT64 b)
+{
+    return _mm_clmulepi64_si128(_mm_cvtsi64_si128((long long)a),
+                                _mm_cvtsi64_si128((long long)b), 0x00);
+}
+
+#define LO64(x) ((UINT64)_mm_cvtsi128_si64(x))
+#define HI64(x) ((UINT64)_mm_extract_epi64((x), 1))
+
+// Compute the CRC of a buffer whose length is a multiple of 16 bytes and at
+// least 64 bytes.  The CRC is passed and returned at its natural width.
+CLMUL_TARGET static UINT64
+foldEngine(UINT64 crc, const UINT8* data, Py_ssize_t dataLen,
+           const UINT64* consts)
+{
+    int width = (int)consts[0];
+    int rev = consts[1] != 0;
+    __m128i k4 = _mm_loadu_si128((const __m128i*)(consts + 2));
+    __m128i k1 = _mm_loadu_si128((const __m128i*)(consts + 4));
+    UINT64 mu = consts[6];
+    UINT64 poly = consts[7];
+    __m128i x0, x1, x2, x3, t;
+    UINT64 hi, lo, q;
+
+    x0 = foldLoad(data, rev);
+    x1 = foldLoad(data + 16, rev);
+    x2 = foldLoad(data + 32, rev);
+    x3 = foldLoad(data + 48, rev);
+    data += 64;
+    dataLen -= 64;
+
+    // Fold the CRC register into the leading bits of the data.
+    if (rev)
+    {
+        x0 = _mm_xor_si128(x0, _mm_set_epi64x(0, (long long)crc));
+    }
+    else
+    {
+        x0 = _mm_xor_si128(x0,
+                           _mm_set_epi64x((long long)(crc << (64 - width)), 0));
+    }
+
+    // Four independent accumulators keep the multipliers busy.
+    while (dataLen >= 64)
+    {
+        x0 = _mm_xor_si128(fold128(x0, k4), foldLoad(data, rev));
+        x1 = _mm_xor_si128(fold128(x1, k4), foldLoad(data + 16, rev));
+        x2 = _mm_xor_si128(fold128(x2, k4), foldLoad(data + 32, rev));
+        x3 = _mm_xor_si128(fold128(x3, k4), foldLoad(data + 48, rev));
+        data += 64;
+        dataLen -= 64;
+    }
+
+    x0 = _mm_xor_si128(fold128(x0, k1), x1);
+    x0 = _mm_xor_si128(fold128(x0, k1), x2);
+    x0 = _mm_xor_si128(fold128(x0, k1), x3);
+
+    while (dataLen >= 16)
+    {
+        x0 = _mm_xor_si128(fold128(x0, k1), foldLoad(data, rev));
+        data += 16;
+        dataLen -= 16;
+    }
+
+    // The CRC is now x0*x^64 mod P'.  Fold the high half of x0 into a 128-bit
+    // value T and finish with a Barrett reduction of T modulo P'.
+    if (rev)
+    {
+        t = _mm_xor_si128(_mm_clmulepi64_si128(x0, k1, 0x10),
+                          _mm_srli_si128(x0, 8));
+        hi = LO64(t);
+        lo = HI64(t);
+        q = hi ^ (LO64(clmul64(hi, mu)) << 1);
+        t = clmul64(q, poly);
+        return lo ^ (HI64(t) << 1) ^ (LO64(t) >> 63);
+    }
+
+    t = _mm_xor_si128(_mm_clmulepi64_si128(x0, k1, 0x01),
+                      _mm_slli_si128(x0, 8));
+    hi = HI64(t);
+    lo = LO64(t);
+    q = hi ^ HI64(clmul64(hi, mu));
+    return (lo ^ LO64(clmul64(q, poly))) >> (64 - width);
+}
+
+#endif // HAVE_X86_ENGINES
+
+
+//-----------------------------------------------------------------------------
+// Hardware CRC-32C engine.
+//
+// SSE4.2 provides an instruction that updates a bit reversed CRC register
+// with the CRC-32C (Castagnoli) polynomial 0x11EDC6F41.  The instruction has a
+// latency of three cycles but can start one every cycle, so long buffers are
+// split into three streams that are computed in parallel and then combined by
+// shifting the CRC of one stream over the length of the next.  The shift is a
+// linear operator on the CRC register, which is applied a byte at a time with
+// the tables below.
+
+#ifdef HAVE_X86_ENGINES
+
+#define CRC32C_LONG 8192
+#define CRC32C_SHORT 256
+
+static UINT32 crc32cLong[4][256];
+static UINT32 crc32cShort[4][256];
+
+#define CRC32C_TARGET __attribute__((target("sse4.2")))
+
+// Check whether the CPU supports the SSE4.2 crc32 instruction.
+static int
+detectCrc32c(void)
+{
+    return (cpuidFeatures() & bit_SSE4_2) != 0;
+}
+
+// Fill in the tables that shift a CRC register over len zero bytes, where len
+// is a multiple of eight.  The operator is found by running each bit of the
+// register through the crc32 instruction.
+CRC32C_TARGET static void
+crc32cZerosTable(UINT32 zeros[4][256], Py_ssize_t len)
+{
+    UINT32 op[32];
+    UINT64 crc;
+    Py_ssize_t i;
+    int k, n, bit;
+
+    for (bit = 0; bit < 32; bit++)
+    {
+        crc = (UINT64)1 << bit;
+        for (i = 0; i < len; i += 8)
+        {
+            crc = _mm_crc32_u64(crc, 0);
+        }
+        op[bit] = (UINT32)crc;
+    }
+
+    for (k = 0; k < 4; k++)
+    {
+        for (n = 0; n < 256; n++)
+        {
+            UINT32 sum = 0;
+            UINT32 vec = (UINT32)n << (8*k);
+
+            for (bit = 0; vec; bit++, vec >>= 1)
+            {
+                if (vec & 1)
+                {
+                    sum ^= op[bit];
+                }
+            }
+            zeros[k][n] = sum;
+        }
+    }
+}
+
+// Apply a zeros operator table to a CRC register.
+static inline UINT32
+crc32cShift(UINT32 zeros[4][256], UINT32 crc)
+{
+    return zeros[0][BYTE0(crc)] ^ zeros[1][BYTE1(crc)] ^
+           zeros[2][BYTE2(crc)] ^ zeros[3][BYTE3(crc)];
+}
+
+// Update the CRC using three interleaved streams of the given block length.
+#define CRC32C_STREAMS(crc0, data, dataLen, BLOCK, zeros) do { \
+        while ((dataLen) >= 3*(BLOCK)) \
+        { \
+            UINT64 crc1 = 0; \
+            UINT64 crc2 = 0; \
+            const UINT8* end = (data) + (BLOCK); \
+            do \
+            { \
+                crc0 = _mm_crc32_u64(crc0, load64le(data)); \
+                crc1 = _mm_crc32_u64(crc1, load64le((data) + (BLOCK))); \
+                crc2 = _mm_crc32_u64(crc2, load64le((data) + 2*(BLOCK))); \
+                (data) += 8; \
+            } while ((data) < end); \
+            crc0 = crc32cShift(zeros, (UINT32)crc0) ^ crc1; \
+            crc0 = crc32cShift(zeros, (UINT32)crc0) ^ crc2; \
+            (data) += 2*(BLOCK); \
+            (dataLen) -= 3*(BLOCK); \
+        } \
+    } while (0)
+
+// Compute the CRC-32C register update over the data.
+CRC32C_TARGET static UINT32
+crc32cEngine(UINT32 crc, const UINT8* data, Py_ssize_t dataLen)
+{
+    UINT64 crc0 = crc;
+
+    // Process bytes until the data is aligned on a word boundary.
+    while (dataLen > 0 && ((Py_uintptr_t)data & 7) != 0)
+    {
+        crc0 = _mm_crc32_u8((UINT32)crc0, *data);
+        data++;
+        dataLen--;
+    }
+
+    CRC32C_STREAMS(crc0, data, dataLen, CRC32C_LONG, crc32cLong);
+    CRC32C_STREAMS(crc0, data, dataLen, CRC32C_SHORT, crc32cShort);
+
+    while (dataLen >= 8)
+    {
+        crc0 = _mm_crc32_u64(crc0, load64le(data));
+        data += 8;
+        dataLen -= 8;
+    }
+
+    while (dataLen > 0)
+    {
+        crc0 = _mm_crc32_u8((UINT32)crc0, *data);
+        data++;
+        dataLen--;
+    }
+
+    return (UINT32)crc0;
+}
+
+#endif // HAVE_X86_ENGINES
+
 //-----------------------------------------------------------------------------
 // Compute a 8-bit crc over the input data.
 // Inputs:
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 8-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -103,6 +733,8 @@ _crc8(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT8* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT8, &obj, &crc,
                             &table, &tableLen))
@@ -110,7 +742,8 @@ _crc8(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256)
+    nTables = tableCount(tableLen, 1);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -120,11 +753,9 @@ _crc8(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ crc];
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc8Engine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -138,7 +769,7 @@ _crc8(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 8-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -152,6 +783,8 @@ _crc8r(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT8* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT8, &obj, &crc,
                             &table, &tableLen))
@@ -159,7 +792,8 @@ _crc8r(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256)
+    nTables = tableCount(tableLen, 1);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -169,11 +803,9 @@ _crc8r(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ crc];
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc8rEngine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -186,7 +818,7 @@ _crc8r(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 16-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -200,6 +832,8 @@ _crc16(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT16* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT16, &obj, &crc,
                             &table, &tableLen))
@@ -207,7 +841,8 @@ _crc16(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*2)
+    nTables = tableCount(tableLen, 2);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -217,11 +852,9 @@ _crc16(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE1(crc)] ^ (crc << 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc16Engine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -235,7 +868,7 @@ _crc16(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 16-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -249,6 +882,8 @@ _crc16r(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT16* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT16, &obj, &crc,
                             &table, &tableLen))
@@ -256,7 +891,8 @@ _crc16r(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*2)
+    nTables = tableCount(tableLen, 2);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -266,11 +902,9 @@ _crc16r(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE0(crc)] ^ (crc >> 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc16rEngine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -283,7 +917,7 @@ _crc16r(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 24-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -297,6 +931,8 @@ _crc24(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT32* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT32, &obj, &crc,
                             &table, &tableLen))
@@ -304,7 +940,8 @@ _crc24(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*4)
+    nTables = tableCount(tableLen, 4);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -314,11 +951,9 @@ _crc24(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE2(crc)] ^ (crc << 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc24Engine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -332,7 +967,7 @@ _crc24(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 24-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -346,6 +981,8 @@ _crc24r(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT32* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT32, &obj, &crc,
                             &table, &tableLen))
@@ -353,7 +990,8 @@ _crc24r(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*4)
+    nTables = tableCount(tableLen, 4);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -364,11 +1002,9 @@ _crc24r(PyObject* self, PyObject* args)
     dataLen = buf.len;
 
     crc = crc & 0xFFFFFFU;
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE0(crc)] ^ (crc >> 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc24rEngine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -381,7 +1017,7 @@ _crc24r(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 32-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -395,6 +1031,8 @@ _crc32(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT32* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT32, &obj, &crc,
                             &table, &tableLen))
@@ -402,7 +1040,8 @@ _crc32(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*4)
+    nTables = tableCount(tableLen, 4);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -412,11 +1051,9 @@ _crc32(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE3(crc)] ^ (crc << 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc32Engine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -430,7 +1067,7 @@ _crc32(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 32-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -444,6 +1081,8 @@ _crc32r(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT32* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT32, &obj, &crc,
                             &table, &tableLen))
@@ -451,7 +1090,8 @@ _crc32r(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*4)
+    nTables = tableCount(tableLen, 4);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -461,11 +1101,9 @@ _crc32r(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE0(crc)] ^ (crc >> 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc32rEngine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -478,7 +1116,7 @@ _crc32r(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 64-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -492,6 +1130,8 @@ _crc64(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT64* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT64, &obj, &crc,
                             &table, &tableLen))
@@ -499,7 +1139,8 @@ _crc64(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*8)
+    nTables = tableCount(tableLen, 8);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -509,11 +1150,9 @@ _crc64(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE7(crc)] ^ (crc << 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc64Engine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -527,7 +1166,7 @@ _crc64(PyObject* self, PyObject* args)
 //   data - string containing the data
 //   crc - unsigned integer containing the initial crc
 //   table - string containing the 64-bit table corresponding to the generator
-//           polynomial.
+//           polynomial, optionally extended with the slicing tables.
 // Returns:
 //   crc - unsigned integer containing the resulting crc
 
@@ -541,6 +1180,8 @@ _crc64r(PyObject* self, PyObject* args)
     Py_ssize_t dataLen;
     UINT64* table;
     Py_ssize_t tableLen;
+    int nTables;
+    PyThreadState* save;
 
     if (!PyArg_ParseTuple(args, INPUT64, &obj, &crc,
                             &table, &tableLen))
@@ -548,7 +1189,8 @@ _crc64r(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    if (tableLen != 256*8)
+    nTables = tableCount(tableLen, 8);
+    if (nTables == 0)
     {
         PyErr_SetString(PyExc_ValueError, "invalid CRC table");
         return NULL;
@@ -558,11 +1200,9 @@ _crc64r(PyObject* self, PyObject* args)
     data = buf.buf;
     dataLen = buf.len;
 
-    while (dataLen--)
-    {
-        crc = table[*data ^ BYTE0(crc)] ^ (crc >> 8);
-        data++;
-    }
+    save = releaseGil(dataLen);
+    crc = crc64rEngine(crc, data, dataLen, table, nTables);
+    acquireGil(save);
 
     PyBuffer_Release(&buf);
 
@@ -570,40 +1210,3337 @@ _crc64r(PyObject* self, PyObject* args)
 }
 
 //-----------------------------------------------------------------------------
-static PyMethodDef methodTable[] = {
-{"_crc8", _crc8, METH_VARARGS},
-{"_crc8r", _crc8r, METH_VARARGS},
-{"_crc16", _crc16, METH_VARARGS},
-{"_crc16r", _crc16r, METH_VARARGS},
-{"_crc24", _crc24, METH_VARARGS},
-{"_crc24r", _crc24r, METH_VARARGS},
-{"_crc32", _crc32, METH_VARARGS},
-{"_crc32r", _crc32r, METH_VARARGS},
-{"_crc64", _crc64, METH_VARARGS},
-{"_crc64r", _crc64r, METH_VARARGS},
-{NULL, NULL}
-};
+// Arithmetic on polynomials modulo the generator polynomial, used to combine
+// CRCs.  The values hold the coefficients of the polynomials with x^(width-1)
+// in the top bit, and poly holds the generator polynomial without its leading
+// term.  Bit reversed CRCs are reflected before and after.
 
-//-----------------------------------------------------------------------------
-static struct PyModuleDef moduleDef = {
-   PyModuleDef_HEAD_INIT,
-   "_crcfunext",  // name of module
-   NULL,          // module documentation, may be NULL
-   -1,            // size of per-interpreter state of the module,
-                  // or -1 if the module keeps state in global variables.
-   methodTable
-};
+static UINT64
+reflect(UINT64 x, int width)
+{
+    UINT64 r = 0;
+    int i;
 
-//-----------------------------------------------------------------------------
-PyMODINIT_FUNC
-PyInit__crcfunext(void)
+    for (i = 0; i < width; i++)
+    {
+        r = (r << 1) | (x & 1);
+        x >>= 1;
+    }
+    return r;
+}
+
+// Return a*b mod P.
+static UINT64
+mulModP(UINT64 a, UINT64 b, UINT64 poly, int width)
 {
-    if ((sizeof(UINT8) != 1) || (sizeof(UINT16) != 2) || 
-        (sizeof(UINT32) != 4) || (sizeof(UINT64) != 8))
+    UINT64 top = (UINT64)1 << (width-1);
+    UINT64 mask = WIDTH_MASK(width);
+    UINT64 r = 0;
+    UINT64 bit;
+
+    for (bit = top; bit != 0; bit >>= 1)
     {
-        Py_FatalError("crcfunext: One of the data types is invalid");
+        r = (r & top) ? ((r << 1) ^ poly) & mask : (r << 1) & mask;
+        if (a & bit)
+        {
+            r ^= b;
+        }
+    }
+    return r;
+}
+
+// Fill in xpow[j] = x^(8*2^j) mod P, which are the factors that shift a CRC
+// over 2^j bytes.
+static void
+xpowTable(UINT64* xpow, UINT64 poly, int width)
+{
+    UINT64 x = 2;
+    int j;
+
+    for (j = 0; j < 3; j++)
+    {
+        x = mulModP(x, x, poly, width);
+    }
+    for (j = 0; j < 64; j++)
+    {
+        xpow[j] = x;
+        x = mulModP(x, x, poly, width);
+    }
+}
+
+// Return the CRC register value crc multiplied by x^(8*len) mod P, which is the
+// effect of len zero bytes on the register when the initial value is zero.
+static UINT64
+shiftCrc(const UINT64* xpow, UINT64 poly, int width, int rev, UINT64 crc,
+         UINT64 len)
+{
+    int j;
+
+    if (rev)
+    {
+        crc = reflect(crc, width);
+    }
+    for (j = 0; len != 0; j++, len >>= 1)
+    {
+        if (len & 1)
+        {
+            crc = mulModP(crc, xpow[j], poly, width);
+        }
+    }
+    if (rev)
+    {
+        crc = reflect(crc, width);
+    }
+    return crc;
+}
+
+//-----------------------------------------------------------------------------
+// The tables of the algorithms in crcmod.predefined are generated by
+// mktables.py when the extension module is built and compiled in, so creating
+// a CrcEngine for them costs nothing and the tables are in read-only memory
+// shared by all of the processes using the module.  Each entry holds the
+// polynomial without its leading term, the packed tables passed to CrcEngine,
+// and the folding constants.
+
+typedef struct {
+    UINT64 poly;
+    int width;
+    int rev;
+    const void* table;
+    Py_ssize_t tableLen;
+    const UINT64* consts;
+} PredefinedTable;
+
+#ifdef HAVE_PREDEFINED_TABLES
+#include "_crctables.h"
+#else
+static const PredefinedTable predefinedTables[1];
+#define PREDEFINED_TABLES 0
+#endif
+
+static const PredefinedTable*
+findPredefinedTable(UINT64 poly, int width, int rev)
+{
+    int i;
+
+    for (i = 0; i < PREDEFINED_TABLES; i++)
+    {
+        const PredefinedTable* p = &predefinedTables[i];
+        if (p->poly == (poly & WIDTH_MASK(width)) && p->width == width &&
+            p->rev == (rev != 0))
+        {
+            return p;
+        }
+    }
+    return NULL;
+}
+
+// Return the data and length of a table passed to CrcEngine, which is either a
+// bytes object or a memoryview of one of the predefined tables as returned by
+// _predefinedTable.  Returns -1 with an exception set otherwise.
+static int
+getEngineTable(PyObject* table, const void** data, Py_ssize_t* len)
+{
+    int i;
+
+    if (PyBytes_Check(table))
+    {
+        *data = PyBytes_AS_STRING(table);
+        *len = PyBytes_GET_SIZE(table);
+        return 0;
+    }
+    if (PyMemoryView_Check(table))
+    {
+        Py_buffer* view = PyMemoryView_GET_BUFFER(table);
+        for (i = 0; i < PREDEFINED_TABLES; i++)
+        {
+            if (view->buf == predefinedTables[i].table &&
+                view->len == predefinedTables[i].tableLen)
+            {
+                *data = view->buf;
+                *len = view->len;
+                return 0;
+            }
+        }
+    }
+    PyErr_SetString(PyExc_TypeError,
+                    "table must be bytes or a predefined table");
+    return -1;
+}
+
+//-----------------------------------------------------------------------------
+// A CrcEngine object holds everything needed to compute one CRC algorithm: the
+// packed tables, the width and bit order, the initial and final XOR values, and
+// the engine selected for this CPU.  Calling the object computes the CRC of the
+// data directly.  This avoids the Python wrapper function and the parsing of
+// the table on each call, which cost more than the CRC itself for short
+// messages.
+
+#define ENGINE_TABLE 0
+#define ENGINE_FOLD 1
+#define ENGINE_CRC32C 2
+
+typedef struct {
+    PyObject_HEAD
+#ifdef HAVE_VECTORCALL
+    vectorcallfunc vectorcall;
+#endif
+    PyObject* table;
+    const void* tableData;
+    int nTables;
+    int width;
+    int rev;
+    int engine;
+    UINT64 poly;
+    UINT64 initCrc;
+    UINT64 xorOut;
+    UINT64 consts[FOLD_CONSTS];
+    UINT64 xpow[64];
+} CrcEngineObject;
+
+// Compute the CRC register update with the engine selected for the object.
+// Called without the GIL, so it must not touch any Python objects other than
+// reading the table data.
+static UINT64
+engineCrc(CrcEngineObject* self, UINT64 crc, const UINT8* data,
+          Py_ssize_t dataLen, const void* table)
+{
+#ifdef HAVE_X86_ENGINES
+    if (self->engine == ENGINE_CRC32C)
+    {
+        return crc32cEngine((UINT32)crc, data, dataLen);
+    }
+    if (self->engine == ENGINE_FOLD && dataLen >= FOLD_MIN_LEN)
+    {
+        Py_ssize_t foldLen = dataLen & ~(Py_ssize_t)15;
+
+        crc = foldEngine(crc, data, foldLen, self->consts);
+        data += foldLen;
+        dataLen -= foldLen;
+    }
+#endif
+    return tableEngine(self->width, self->rev, crc, data, dataLen, table,
+                       self->nTables);
+}
+
+// Update the CRC value *crc with the data in obj.  The CRC value includes the
+// final XOR.  Returns -1 with an exception set on errors.
+static int
+engineUpdate(CrcEngineObject* self, PyObject* obj, UINT64* crc)
+{
+    Py_buffer buf;
+    UINT64 mask = WIDTH_MASK(self->width);
+    const void* table = self->tableData;
+    PyThreadState* save;
+    UINT64 value;
+
+    if (getBufferView(obj, &buf) < 0)
+    {
+        return -1;
+    }
+
+    value = (*crc ^ self->xorOut) & mask;
+    save = releaseGil(buf.len);
+    value = engineCrc(self, value, buf.buf, buf.len, table);
+    acquireGil(save);
+
+    PyBuffer_Release(&buf);
+
+    *crc = (value & mask) ^ self->xorOut;
+    return 0;
+}
+
+// Compute the CRC of the data in obj starting from the CRC value crc.  Both the
+// starting and the returned value include the final XOR.
+static PyObject*
+engineCompute(CrcEngineObject* self, PyObject* obj, UINT64 crc)
+{
+    if (engineUpdate(self, obj, &crc) < 0)
+    {
+        return NULL;
+    }
+    return PyLong_FromUnsignedLongLong(crc);
+}
+
+// Convert the optional crc argument.  As with the module functions, the value
+// is truncated to the width of the CRC.
+static int
+engineStartCrc(CrcEngineObject* self, PyObject* obj, UINT64* crc)
+{
+    if (obj == NULL || obj == Py_None)
+    {
+        *crc = self->initCrc;
+        return 0;
+    }
+    if (!PyLong_Check(obj))
+    {
+        PyErr_Format(PyExc_TypeError, "crc must be an integer, not %.100s",
+                     Py_TYPE(obj)->tp_name);
+        return -1;
+    }
+    *crc = PyLong_AsUnsignedLongLongMask(obj);
+    if (*crc == (UINT64)-1 && PyErr_Occurred())
+    {
+        return -1;
+    }
+    return 0;
+}
+
+// Parse the arguments of a METH_FASTCALL or vectorcall function that takes up
+// to nNames arguments with the given names.  The first argument is required
+// and the missing ones are left NULL in out.  Returns -1 with an exception set
+// on errors.
+static int
+parseFastArgs(const char* funcName, PyObject* const* args, Py_ssize_t nargs,
+              PyObject* kwnames, const char* const* names, int nNames,
+              PyObject** out)
+{
+    Py_ssize_t nkw = (kwnames == NULL) ? 0 : PyTuple_GET_SIZE(kwnames);
+    Py_ssize_t i;
+    int k;
+
+    if (nargs > nNames)
+    {
+        PyErr_Format(PyExc_TypeError,
+                     "%s() takes at most %d arguments (%zd given)",
+                     funcName, nNames, nargs + nkw);
+        return -1;
+    }
+    for (k = 0; k < nNames; k++)
+    {
+        out[k] = (k < nargs) ? args[k] : NULL;
+    }
+    for (i = 0; i < nkw; i++)
+    {
+        PyObject* key = PyTuple_GET_ITEM(kwnames, i);
+
+        for (k = 0; k < nNames; k++)
+        {
+            if (PyUnicode_CompareWithASCIIString(key, names[k]) == 0)
+            {
+                break;
+            }
+        }
+        if (k == nNames || out[k] != NULL)
+        {
+            PyErr_Format(PyExc_TypeError,
+                         "%s() got an unexpected or repeated keyword "
+                         "argument '%U'", funcName, key);
+            return -1;
+        }
+        out[k] = args[nargs + i];
+    }
+    if (out[0] == NULL)
+    {
+        PyErr_Format(PyExc_TypeError, "%s() missing required argument '%s'",
+                     funcName, names[0]);
+        return -1;
+    }
+    return 0;
+}
+
+#ifdef HAVE_VECTORCALL
+static PyObject*
+CrcEngine_vectorcall(PyObject* self, PyObject* const* args, size_t nargsf,
+                     PyObject* kwnames)
+{
+    static const char* const names[] = {"data", "crc"};
+    PyObject* argv[2];
+    UINT64 crc;
+
+    if (parseFastArgs("CrcEngine", args, PyVectorcall_NARGS(nargsf), kwnames,
+                      names, 2, argv) < 0 ||
+        engineStartCrc((CrcEngineObject*)self, argv[1], &crc) < 0)
+    {
+        return NULL;
+    }
+    return engineCompute((CrcEngineObject*)self, argv[0], crc);
+}
+#else
+static PyObject*
+CrcEngine_call(PyObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"data", "crc", NULL};
+    PyObject* data;
+    PyObject* crcObj = NULL;
+    UINT64 crc;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|O:CrcEngine", kwlist,
+                                     &data, &crcObj))
+    {
+        return NULL;
+    }
+
+    if (engineStartCrc((CrcEngineObject*)self, crcObj, &crc) < 0)
+    {
+        return NULL;
+    }
+    return engineCompute((CrcEngineObject*)self, data, crc);
+}
+#endif
+
+//-----------------------------------------------------------------------------
+// The CRC of a large buffer can be computed by several threads.  The Python
+// function that splits the buffer and merges the results is registered by
+// crcmod when it is imported.  It is called as fun(engine, data, crc, workers)
+// and returns the CRC.
+
+static PyObject* parallelHook = NULL;
+
+static PyObject*
+callParallel(CrcEngineObject* engine, PyObject* data, PyObject* crc,
+             PyObject* workers)
+{
+    if (parallelHook == NULL)
+    {
+        PyErr_SetString(PyExc_RuntimeError, "parallel CRC is not available");
+        return NULL;
+    }
+    return PyObject_CallFunctionObjArgs(parallelHook, (PyObject*)engine, data,
+                                        crc, workers, NULL);
+}
+
+static PyObject*
+_setParallelHook(PyObject* self, PyObject* fun)
+{
+    if (!PyCallable_Check(fun))
+    {
+        PyErr_SetString(PyExc_TypeError, "parallel hook must be callable");
+        return NULL;
+    }
+    Py_INCREF(fun);
+    Py_XSETREF(parallelHook, fun);
+    Py_RETURN_NONE;
+}
+
+//-----------------------------------------------------------------------------
+// Compute the CRC of the data using several threads.
+// Inputs:
+//   data - object supporting the buffer API
+//   crc - initial CRC value, defaults to initCrc
+//   workers - number of threads, defaults to the number of CPUs
+// Returns:
+//   crc - CRC of the data, the same as calling the engine
+
+static PyObject*
+CrcEngine_parallel(CrcEngineObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"data", "crc", "workers", NULL};
+    PyObject* data;
+    PyObject* crc = Py_None;
+    PyObject* workers = Py_None;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|OO:parallel", kwlist,
+                                     &data, &crc, &workers))
+    {
+        return NULL;
+    }
+    return callParallel(self, data, crc, workers);
+}
+
+//-----------------------------------------------------------------------------
+// Computing the CRC of a file.  The file is read into a buffer that is reused
+// for the whole file, and the read and CRC loop runs with the GIL released.
+// The GIL is only taken back to check for signals every SIGNAL_INTERVAL bytes,
+// to report the progress, and to handle interrupted reads.  Positioned reads (pread) are used
+// when an offset is given.  Otherwise the data is read from the current
+// position of the file descriptor, which then moves past the data.
+//
+// Files that are already in the page cache can be mapped into memory instead.
+// The file must not be truncated while it is mapped.
+
+#define FILE_BUFFER_SIZE (1 << 20)
+#define FILE_BUFFER_ALIGN 4096
+#define MMAP_WINDOW (64 << 20)
+#define PROGRESS_INTERVAL (64 << 20)
+#define SIGNAL_INTERVAL (16 << 20)
+
+typedef struct {
+    CrcEngineObject* engine;
+    const void* table;
+    int fd;
+    int positioned;         // read at offset instead of the current position
+    long long offset;
+    long long length;       // -1 reads to the end of the file
+    PyObject* progress;     // optional callable
+    long long interval;
+    long long nextProgress;
+    long long nextCheck;    // the signals are checked after this many bytes
+    UINT64 crc;             // CRC register, without the final XOR
+    long long total;        // number of bytes processed
+} FileJob;
+
+// Call the progress function with the number of bytes processed.  Called with
+// the GIL held.  Returns -1 with an exception set if the function raised, which
+// cancels the calculation.
+static int
+fileProgress(FileJob* job)
+{
+    PyObject* result;
+
+    if (PyErr_CheckSignals() < 0)
+    {
+        return -1;
+    }
+    if (job->progress == NULL)
+    {
+        return 0;
+    }
+    job->nextProgress = job->total + job->interval;
+    result = PyObject_CallFunction(job->progress, "L", job->total);
+    if (result == NULL)
+    {
+        return -1;
+    }
+    Py_DECREF(result);
+    return 0;
+}
+
+// Return whether the GIL must be taken back to check for signals or to report
+// the progress.  Can be called without the GIL.
+static int
+fileCheckDue(FileJob* job)
+{
+    return job->total >= job->nextCheck ||
+           (job->progress != NULL && job->total >= job->nextProgress);
+}
+
+// Check for signals, and report the progress when it is due.  Called with the
+// GIL held.  Returns -1 with an exception set if a signal handler raised, or
+// if the progress function raised.
+static int
+fileCheckpoint(FileJob* job)
+{
+    job->nextCheck = job->total + SIGNAL_INTERVAL;
+    if (PyErr_CheckSignals() < 0)
+    {
+        return -1;
+    }
+    if (job->progress != NULL && job->total >= job->nextProgress)
+    {
+        return fileProgress(job);
+    }
+    return 0;
+}
+
+static Py_ssize_t
+fileRead(FileJob* job, UINT8* buf, size_t size)
+{
+#ifdef HAVE_POSIX_FILES
+    if (job->positioned)
+    {
+        return pread(job->fd, buf, size, (off_t)(job->offset + job->total));
+    }
+    return read(job->fd, buf, size);
+#else
+    if (job->positioned &&
+        _lseeki64(job->fd, job->offset + job->total, SEEK_SET) < 0)
+    {
+        return -1;
+    }
+    return _read(job->fd, buf, (unsigned int)size);
+#endif
+}
+
+// Read the file and compute the CRC.  Called with the GIL held, and returns -1
+// with an exception set on errors.
+static int
+fileReadLoop(FileJob* job)
+{
+    UINT8* buf;
+    PyThreadState* save;
+
+#ifdef HAVE_POSIX_FILES
+    if (posix_memalign((void**)&buf, FILE_BUFFER_ALIGN, FILE_BUFFER_SIZE) != 0)
+    {
+        buf = NULL;
+    }
+#else
+    buf = PyMem_Malloc(FILE_BUFFER_SIZE);
+#endif
+    if (buf == NULL)
+    {
+        PyErr_NoMemory();
+        return -1;
+    }
+
+    save = PyEval_SaveThread();
+#ifdef POSIX_FADV_SEQUENTIAL
+    posix_fadvise(job->fd, job->positioned ? (off_t)job->offset : 0,
+                  job->length < 0 ? 0 : (off_t)job->length,
+                  POSIX_FADV_SEQUENTIAL);
+#endif
+    for (;;)
+    {
+        size_t size = FILE_BUFFER_SIZE;
+        Py_ssize_t n;
+
+        if (job->length >= 0 && job->length - job->total < (long long)size)
+        {
+            size = (size_t)(job->length - job->total);
+        }
+        if (size == 0)
+        {
+            break;
+        }
+
+        n = fileRead(job, buf, size);
+        if (n < 0)
+        {
+            int err = errno;
+
+            PyEval_RestoreThread(save);
+            if (err != EINTR)
+            {
+                errno = err;
+                PyErr_SetFromErrno(PyExc_OSError);
+                goto error;
+            }
+            if (PyErr_CheckSignals() < 0)
+            {
+                goto error;
+            }
+            save = PyEval_SaveThread();
+            continue;
+        }
+        if (n == 0)
+        {
+            break;
+        }
+
+        job->crc = engineCrc(job->engine, job->crc, buf, n, job->table);
+        job->total += n;
+
+        if (fileCheckDue(job))
+        {
+            PyEval_RestoreThread(save);
+            if (fileCheckpoint(job) < 0)
+            {
+                goto error;
+            }
+            save = PyEval_SaveThread();
+        }
+    }
+    PyEval_RestoreThread(save);
+
+#ifdef HAVE_POSIX_FILES
+    free(buf);
+#else
+    PyMem_Free(buf);
+#endif
+    return 0;
+
+error:
+#ifdef HAVE_POSIX_FILES
+    free(buf);
+#else
+    PyMem_Free(buf);
+#endif
+    return -1;
+}
+
+#ifdef HAVE_POSIX_FILES
+// Map the file into memory in windows and compute the CRC.  Files that cannot
+// be mapped, such as pipes, are read instead.
+static int
+fileMmapLoop(FileJob* job)
+{
+    struct stat st;
+    long long page = sysconf(_SC_PAGESIZE);
+    long long window = MMAP_WINDOW;
+    long long start;
+    long long end;
+    long long pos;
+    PyThreadState* save;
+
+    // Use smaller windows when they are needed to report the progress.
+    if (job->progress != NULL && job->interval < window)
+    {
+        window = (job->interval + page - 1) / page * page;
+    }
+
+    if (fstat(job->fd, &st) < 0)
+    {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    if (!S_ISREG(st.st_mode))
+    {
+        return fileReadLoop(job);
+    }
+
+    start = job->offset;
+    if (!job->positioned)
+    {
+        start = lseek(job->fd, 0, SEEK_CUR);
+        if (start < 0)
+        {
+            PyErr_SetFromErrno(PyExc_OSError);
+            return -1;
+        }
+    }
+    end = st.st_size;
+    if (job->length >= 0 && start + job->length < end)
+    {
+        end = start + job->length;
+    }
+
+    pos = start + job->total;
+    while (pos < end)
+    {
+        long long winStart = pos - pos % page;
+        long long winLen = end - winStart;
+        UINT8* p;
+
+        if (winLen > window)
+        {
+            winLen = window;
+        }
+
+        save = PyEval_SaveThread();
+        p = mmap(NULL, (size_t)winLen, PROT_READ, MAP_SHARED, job->fd,
+                 (off_t)winStart);
+        if (p != MAP_FAILED)
+        {
+#ifdef MADV_SEQUENTIAL
+            madvise(p, (size_t)winLen, MADV_SEQUENTIAL);
+#endif
+            job->crc = engineCrc(job->engine, job->crc, p + (pos - winStart),
+                                 winLen - (pos - winStart), job->table);
+            munmap(p, (size_t)winLen);
+        }
+        PyEval_RestoreThread(save);
+        if (p == MAP_FAILED)
+        {
+            PyErr_SetFromErrno(PyExc_OSError);
+            return -1;
+        }
+
+        job->total += winStart + winLen - pos;
+        pos = winStart + winLen;
+
+        if (fileCheckDue(job) && fileCheckpoint(job) < 0)
+        {
+            return -1;
+        }
+    }
+
+    if (!job->positioned && lseek(job->fd, pos, SEEK_SET) < 0)
+    {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    return 0;
+}
+#endif
+
+#if defined(HAVE_POSIX_FILES) && defined(SEEK_DATA) && defined(SEEK_HOLE)
+#define HAVE_SEEK_HOLE
+
+// Compute the CRC of a sparse file.  Only the data extents are read.  The CRC
+// is extended over the holes, which read as zeros, in time proportional to the
+// log of their length.  The holes are found with SEEK_DATA and SEEK_HOLE, which
+// move the file position, so the extents are read with positioned reads and
+// the position is set at the end.
+static int
+fileSparseLoop(FileJob* job, int useMmap)
+{
+    CrcEngineObject* engine = job->engine;
+    struct stat st;
+    int positioned = job->positioned;
+    long long cur;
+    long long start;
+    long long end;
+    long long pos;
+    int status = 0;
+
+    if (fstat(job->fd, &st) < 0)
+    {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    if (!S_ISREG(st.st_mode))
+    {
+        return fileReadLoop(job);
+    }
+
+    cur = lseek(job->fd, 0, SEEK_CUR);
+    if (cur < 0)
+    {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    start = positioned ? job->offset : cur;
+    end = st.st_size;
+    if (job->length >= 0 && start + job->length < end)
+    {
+        end = start + job->length;
+    }
+
+    job->positioned = 1;
+    job->offset = start;
+    pos = start;
+    while (pos < end)
+    {
+        long long data = lseek(job->fd, pos, SEEK_DATA);
+        long long hole = end;
+
+        if (data < 0 && errno == ENXIO)
+        {
+            // The rest of the file is a hole.
+            data = end;
+        }
+        else if (data < 0 && errno == EINVAL)
+        {
+            // The file system does not report holes.
+            data = pos;
+        }
+        else if (data < 0)
+        {
+            PyErr_SetFromErrno(PyExc_OSError);
+            status = -1;
+            break;
+        }
+        else if (data < end)
+        {
+            hole = lseek(job->fd, data, SEEK_HOLE);
+            if (hole < 0)
+            {
+                PyErr_SetFromErrno(PyExc_OSError);
+                status = -1;
+                break;
+            }
+        }
+        if (data > end)
+        {
+            data = end;
+        }
+        if (hole > end)
+        {
+            hole = end;
+        }
+
+        if (data > pos)
+        {
+            job->crc = shiftCrc(engine->xpow, engine->poly, engine->width,
+                                engine->rev,
+                                job->crc & WIDTH_MASK(engine->width),
+                                (UINT64)(data - pos));
+            job->total += data - pos;
+            if (fileCheckDue(job) && fileCheckpoint(job) < 0)
+            {
+                status = -1;
+                break;
+            }
+        }
+        if (hole > data)
+        {
+            job->length = hole - start;
+            status = useMmap ? fileMmapLoop(job) : fileReadLoop(job);
+            if (status < 0)
+            {
+                break;
+            }
+            if (job->total < job->length)
+            {
+                // The file was truncated while it was read.
+                break;
+            }
+        }
+        pos = start + job->total;
+    }
+
+    job->positioned = positioned;
+    if (lseek(job->fd, positioned ? cur : start + job->total, SEEK_SET) < 0 &&
+        status == 0)
+    {
+        PyErr_SetFromErrno(PyExc_OSError);
+        status = -1;
+    }
+    return status;
+}
+#endif
+
+// Compute the CRC of the file described by the job.  *crc holds the starting
+// CRC value, including the final XOR, and is updated.
+static int
+fileCrc(FileJob* job, int useMmap, int sparse, UINT64* crc)
+{
+    int status;
+
+    job->table = job->engine->tableData;
+    job->crc = (*crc ^ job->engine->xorOut) & WIDTH_MASK(job->engine->width);
+    job->total = 0;
+    job->nextProgress = job->interval;
+    job->nextCheck = SIGNAL_INTERVAL;
+
+#ifdef HAVE_SEEK_HOLE
+    if (sparse)
+    {
+        status = fileSparseLoop(job, useMmap);
+    }
+    else
+#endif
+#ifdef HAVE_POSIX_FILES
+    if (useMmap)
+    {
+        status = fileMmapLoop(job);
+    }
+    else
+#endif
+    {
+        status = fileReadLoop(job);
+    }
+    if (status < 0)
+    {
+        return -1;
+    }
+
+    // Report the end of the file.
+    if (job->progress != NULL && job->total != job->nextProgress - job->interval
+        && fileProgress(job) < 0)
+    {
+        return -1;
+    }
+
+    *crc = (job->crc & WIDTH_MASK(job->engine->width)) ^ job->engine->xorOut;
+    return 0;
+}
+
+// Convert an optional non-negative integer argument.  None gives -1.
+static int
+optionalSize(PyObject* obj, const char* name, long long* value)
+{
+    if (obj == NULL || obj == Py_None)
+    {
+        *value = -1;
+        return 0;
+    }
+    *value = PyLong_AsLongLong(obj);
+    if (*value == -1 && PyErr_Occurred())
+    {
+        return -1;
+    }
+    if (*value < 0)
+    {
+        PyErr_Format(PyExc_ValueError, "%s must be >= 0", name);
+        return -1;
+    }
+    return 0;
+}
+
+// Fill in the progress settings of the job.
+static int
+fileJobProgress(FileJob* job, PyObject* progress, long long interval)
+{
+    if (progress == Py_None)
+    {
+        progress = NULL;
+    }
+    if (progress != NULL && !PyCallable_Check(progress))
+    {
+        PyErr_SetString(PyExc_TypeError, "progress must be callable");
+        return -1;
+    }
+    if (interval <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "progress_interval must be > 0");
+        return -1;
+    }
+    job->progress = progress;
+    job->interval = interval;
+    return 0;
+}
+
+//-----------------------------------------------------------------------------
+// Compute the CRC of the data in a file descriptor.
+// Inputs:
+//   fd - file descriptor
+//   offset - position of the data in the file.  When None, the data is read
+//            from the current position, which is moved past the data.
+//   length - number of bytes, or None to read to the end of the file
+//   crc - initial CRC value, defaults to initCrc
+//   progress - optional function called with the number of bytes processed
+//              every progress_interval bytes and at the end.  An exception
+//              raised by the function stops the calculation.
+//   use_mmap - map the file into memory instead of reading it
+//   sparse - skip the holes of a sparse file instead of reading their zeros
+// Returns:
+//   crc - CRC of the data
+
+static PyObject*
+CrcEngine_from_fd(CrcEngineObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"fd", "offset", "length", "crc", "progress",
+                             "progress_interval", "use_mmap", "sparse", NULL};
+    FileJob job;
+    PyObject* offsetObj = NULL;
+    PyObject* lengthObj = Py_None;
+    PyObject* crcObj = Py_None;
+    PyObject* progress = Py_None;
+    long long interval = PROGRESS_INTERVAL;
+    int useMmap = 0;
+    int sparse = 0;
+    UINT64 crc;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "i|OOOOLpp:from_fd", kwlist,
+                                     &job.fd, &offsetObj, &lengthObj, &crcObj,
+                                     &progress, &interval, &useMmap, &sparse))
+    {
+        return NULL;
+    }
+
+    job.engine = self;
+    job.positioned = (offsetObj != Py_None);
+    if (optionalSize(offsetObj, "offset", &job.offset) < 0 ||
+        optionalSize(lengthObj, "length", &job.length) < 0 ||
+        fileJobProgress(&job, progress, interval) < 0 ||
+        engineStartCrc(self, crcObj, &crc) < 0)
+    {
+        return NULL;
+    }
+    if (offsetObj == NULL)
+    {
+        job.offset = 0;
+    }
+
+    if (fileCrc(&job, useMmap, sparse, &crc) < 0)
+    {
+        return NULL;
+    }
+    return PyLong_FromUnsignedLongLong(crc);
+}
+
+//-----------------------------------------------------------------------------
+// Compute the CRC of the concatenation A+B from the CRCs of A and B and the
+// length of B.  Runs in time proportional to the log of the length.
+// Inputs:
+//   crcA - CRC of A, including the initial value and the final XOR
+//   crcB - CRC of B, including the initial value and the final XOR
+//   lenB - number of bytes in B
+// Returns:
+//   crc - CRC of A+B
+
+static PyObject*
+CrcEngine_combine(CrcEngineObject* self, PyObject* args)
+{
+    PyObject* crcObjA;
+    PyObject* crcObjB;
+    Py_ssize_t lenB;
+    UINT64 crcA;
+    UINT64 crcB;
+    UINT64 crc;
+
+    if (!PyArg_ParseTuple(args, "OOn:combine", &crcObjA, &crcObjB, &lenB))
+    {
+        return NULL;
+    }
+    if (lenB < 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "length must be >= 0");
+        return NULL;
+    }
+    if (engineStartCrc(self, crcObjA, &crcA) < 0 ||
+        engineStartCrc(self, crcObjB, &crcB) < 0)
+    {
+        return NULL;
+    }
+
+    // The CRC registers after A and B are crcA^xorOut and crcB^xorOut.  The
+    // register for A+B is the register after A shifted over the length of B,
+    // plus the contribution of B starting from zero.  The initial value shifted
+    // over B is removed from crcB the same way, so the final XOR cancels.
+    crc = shiftCrc(self->xpow, self->poly, self->width, self->rev,
+                   (crcA ^ self->initCrc) & WIDTH_MASK(self->width),
+                   (UINT64)lenB);
+    crc ^= crcB & WIDTH_MASK(self->width);
+
+    return PyLong_FromUnsignedLongLong(crc);
+}
+
+//-----------------------------------------------------------------------------
+// Extend a CRC over a run of zero bytes without processing them.  Runs in time
+// proportional to the log of the number of bytes.
+
+// Return the CRC, including the final XOR, followed by n zero bytes.
+static UINT64
+engineZeros(CrcEngineObject* self, UINT64 crc, long long n)
+{
+    crc = shiftCrc(self->xpow, self->poly, self->width, self->rev,
+                   (crc ^ self->xorOut) & WIDTH_MASK(self->width), (UINT64)n);
+    return crc ^ self->xorOut;
+}
+
+// Inputs:
+//   crc - CRC of the data, including the initial value and the final XOR
+//   n - number of zero bytes
+// Returns:
+//   crc - CRC of the data followed by n zero bytes
+
+static PyObject*
+CrcEngine_extend_zeros(CrcEngineObject* self, PyObject* args)
+{
+    PyObject* crcObj;
+    long long n;
+    UINT64 crc;
+
+    if (!PyArg_ParseTuple(args, "OL:extend_zeros", &crcObj, &n))
+    {
+        return NULL;
+    }
+    if (n < 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "length must be >= 0");
+        return NULL;
+    }
+    if (engineStartCrc(self, crcObj, &crc) < 0)
+    {
+        return NULL;
+    }
+    return PyLong_FromUnsignedLongLong(engineZeros(self, crc, n));
+}
+
+//-----------------------------------------------------------------------------
+// Compute the CRC of a message after some of its bytes were replaced, from the
+// CRC of the original message.  The CRC is linear, so the change of the CRC is
+// the CRC, with a zero initial value and no final XOR, of the XOR of the old and
+// new bytes followed by the zeros of the unchanged bytes after them.  Runs in
+// time proportional to the length of the patch plus the log of the length of
+// the message.
+// Inputs:
+//   crc - CRC of the original message
+//   total_len - length of the message
+//   offset - position of the patch in the message
+//   old_bytes - bytes that were replaced
+//   new_bytes - bytes written in their place, the same length as old_bytes
+// Returns:
+//   crc - CRC of the patched message
+
+#define PATCH_BUFFER_SIZE 4096
+
+static PyObject*
+CrcEngine_patch(CrcEngineObject* self, PyObject* args)
+{
+    PyObject* crcObj;
+    long long totalLen;
+    long long offset;
+    PyObject* oldObj;
+    PyObject* newObj;
+    Py_buffer oldBuf;
+    Py_buffer newBuf;
+    const void* table = self->tableData;
+    UINT8 delta[PATCH_BUFFER_SIZE];
+    PyThreadState* save;
+    UINT64 crc;
+    UINT64 value = 0;
+    Py_ssize_t pos;
+
+    if (!PyArg_ParseTuple(args, "OLLOO:patch", &crcObj, &totalLen, &offset,
+                          &oldObj, &newObj))
+    {
+        return NULL;
+    }
+    if (engineStartCrc(self, crcObj, &crc) < 0)
+    {
+        return NULL;
+    }
+    if (getBufferView(oldObj, &oldBuf) < 0)
+    {
+        return NULL;
+    }
+    if (getBufferView(newObj, &newBuf) < 0)
+    {
+        PyBuffer_Release(&oldBuf);
+        return NULL;
+    }
+
+    if (oldBuf.len != newBuf.len)
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "old_bytes and new_bytes must have the same length");
+        goto error;
+    }
+    if (offset < 0 || totalLen < offset + oldBuf.len)
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "patch is outside of the message");
+        goto error;
+    }
+
+    save = releaseGil(oldBuf.len);
+    for (pos = 0; pos < oldBuf.len; pos += PATCH_BUFFER_SIZE)
+    {
+        const UINT8* p = (const UINT8*)oldBuf.buf + pos;
+        const UINT8* q = (const UINT8*)newBuf.buf + pos;
+        Py_ssize_t n = oldBuf.len - pos;
+        Py_ssize_t i;
+
+        if (n > PATCH_BUFFER_SIZE)
+        {
+            n = PATCH_BUFFER_SIZE;
+        }
+        for (i = 0; i < n; i++)
+        {
+            delta[i] = p[i] ^ q[i];
+        }
+        value = engineCrc(self, value, delta, n, table);
+    }
+    acquireGil(save);
+
+    PyBuffer_Release(&oldBuf);
+    PyBuffer_Release(&newBuf);
+
+    value = shiftCrc(self->xpow, self->poly, self->width, self->rev,
+                     value & WIDTH_MASK(self->width),
+                     (UINT64)(totalLen - offset - oldBuf.len));
+    return PyLong_FromUnsignedLongLong(crc ^ value);
+
+error:
+    PyBuffer_Release(&oldBuf);
+    PyBuffer_Release(&newBuf);
+    return NULL;
+}
+
+static PyObject*
+CrcEngine_get_rev(CrcEngineObject* self, void* closure)
+{
+    return PyBool_FromLong(self->rev);
+}
+
+static PyObject*
+CrcEngine_get_poly(CrcEngineObject* self, void* closure)
+{
+    // The engine only keeps the low bits, so the leading term is added back.
+    PyObject* low = PyLong_FromUnsignedLongLong(self->poly);
+    PyObject* one = NULL;
+    PyObject* lead = NULL;
+    PyObject* width = NULL;
+    PyObject* result = NULL;
+
+    if (low != NULL && (one = PyLong_FromLong(1)) != NULL &&
+        (width = PyLong_FromLong(self->width)) != NULL &&
+        (lead = PyNumber_Lshift(one, width)) != NULL)
+    {
+        result = PyNumber_Or(lead, low);
+    }
+    Py_XDECREF(low);
+    Py_XDECREF(one);
+    Py_XDECREF(width);
+    Py_XDECREF(lead);
+    return result;
+}
+
+//-----------------------------------------------------------------------------
+// Create a CrcEngine object.
+// Inputs:
+//   poly - generator polynomial.  The leading term is ignored.
+//   table - bytes object containing the table corresponding to the generator
+//           polynomial, optionally extended with the slicing tables.
+//   width - number of bits in the CRC
+//   rev - true if the data is processed bit reversed
+//   initCrc - default initial CRC value, including the final XOR
+//   xorOut - final XOR value
+//   consts - optional bytes object containing the folding constants (see
+//            foldEngine).  The folding engine is used when the CPU supports it.
+//   crc32c - true if the polynomial is the CRC-32C polynomial, which selects the
+//            crc32 instruction when the CPU supports it.
+
+static PyObject*
+CrcEngine_new(PyTypeObject* type, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"poly", "table", "width", "rev", "initCrc",
+                             "xorOut", "consts", "crc32c", NULL};
+    UINT64 poly;
+    PyObject* table;
+    int width;
+    int rev;
+    UINT64 initCrc;
+    UINT64 xorOut;
+    PyObject* consts = Py_None;
+    int crc32c = 0;
+    const void* tableData;
+    Py_ssize_t tableLen;
+    int nTables;
+    CrcEngineObject* self;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "KOipKK|Op:CrcEngine",
+                                     kwlist, &poly, &table, &width, &rev,
+                                     &initCrc, &xorOut, &consts, &crc32c))
+    {
+        return NULL;
+    }
+
+    if (width != 8 && width != 16 && width != 24 && width != 32 &&
+        width != 64)
+    {
+        PyErr_SetString(PyExc_ValueError, "invalid CRC width");
+        return NULL;
+    }
+
+    if (getEngineTable(table, &tableData, &tableLen) < 0)
+    {
+        return NULL;
+    }
+    nTables = tableCount(tableLen, ENTRY_SIZE(width));
+    if (nTables == 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "invalid CRC table");
+        return NULL;
+    }
+
+    if (consts != Py_None &&
+        (!PyBytes_Check(consts) ||
+         PyBytes_GET_SIZE(consts) != FOLD_CONSTS*8 ||
+         ((UINT64*)PyBytes_AS_STRING(consts))[0] != (UINT64)width ||
+         (((UINT64*)PyBytes_AS_STRING(consts))[1] != 0) != (rev != 0)))
+    {
+        PyErr_SetString(PyExc_ValueError, "invalid folding constants");
+        return NULL;
+    }
+
+    self = (CrcEngineObject*)type->tp_alloc(type, 0);
+    if (self == NULL)
+    {
+        return NULL;
+    }
+
+#ifdef HAVE_VECTORCALL
+    self->vectorcall = CrcEngine_vectorcall;
+#endif
+    Py_INCREF(table);
+    self->table = table;
+    self->tableData = tableData;
+    self->nTables = nTables;
+    self->width = width;
+    self->rev = rev;
+    self->poly = poly & WIDTH_MASK(width);
+    self->initCrc = initCrc & WIDTH_MASK(width);
+    self->xorOut = xorOut & WIDTH_MASK(width);
+    xpowTable(self->xpow, self->poly, width);
+
+    self->engine = ENGINE_TABLE;
+    if (crc32c && hasCrc32c && width == 32 && rev)
+    {
+        self->engine = ENGINE_CRC32C;
+    }
+    else if (consts != Py_None && hasClmul)
+    {
+        self->engine = ENGINE_FOLD;
+        memcpy(self->consts, PyBytes_AS_STRING(consts), FOLD_CONSTS*8);
+    }
+
+    return (PyObject*)self;
+}
+
+static void
+CrcEngine_dealloc(CrcEngineObject* self)
+{
+    Py_XDECREF(self->table);
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+static PyMemberDef CrcEngine_members[] = {
+{"table", T_OBJECT, offsetof(CrcEngineObject, table), READONLY},
+{"width", T_INT, offsetof(CrcEngineObject, width), READONLY},
+{"initCrc", T_ULONGLONG, offsetof(CrcEngineObject, initCrc), READONLY},
+{"xorOut", T_ULONGLONG, offsetof(CrcEngineObject, xorOut), READONLY},
+{NULL}
+};
+
+static PyGetSetDef CrcEngine_getset[] = {
+{"rev", (getter)CrcEngine_get_rev},
+{"poly", (getter)CrcEngine_get_poly},
+{NULL}
+};
+
+static PyMethodDef CrcEngine_methods[] = {
+{"combine", (PyCFunction)CrcEngine_combine, METH_VARARGS,
+ "combine(crcA, crcB, lenB) -> CRC of A+B from the CRCs of A and B and the\n"
+ "length of B."},
+{"from_fd", (PyCFunction)(void(*)(void))CrcEngine_from_fd,
+ METH_VARARGS | METH_KEYWORDS,
+ "from_fd(fd, offset=0, length=None, crc=initCrc, progress=None,\n"
+ "        progress_interval=64 MiB, use_mmap=False, sparse=False) -> CRC of\n"
+ "the data in the file descriptor."},
+{"patch", (PyCFunction)CrcEngine_patch, METH_VARARGS,
+ "patch(crc, total_len, offset, old_bytes, new_bytes) -> CRC of the message\n"
+ "after old_bytes at offset were replaced by new_bytes, from the CRC of the\n"
+ "original message."},
+{"extend_zeros", (PyCFunction)CrcEngine_extend_zeros, METH_VARARGS,
+ "extend_zeros(crc, n) -> CRC of the data followed by n zero bytes from the\n"
+ "CRC of the data."},
+{"parallel", (PyCFunction)(void(*)(void))CrcEngine_parallel,
+ METH_VARARGS | METH_KEYWORDS,
+ "parallel(data, crc=initCrc, workers=None) -> CRC of the data computed by\n"
+ "several threads."},
+{NULL, NULL}
+};
+
+static PyTypeObject CrcEngineType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "crcmod._crcfunext.CrcEngine",      // tp_name
+    sizeof(CrcEngineObject),            // tp_basicsize
+    0,                                  // tp_itemsize
+    (destructor)CrcEngine_dealloc,      // tp_dealloc
+#ifdef HAVE_VECTORCALL
+    offsetof(CrcEngineObject, vectorcall), // tp_vectorcall_offset
+#else
+    0,                                  // tp_print
+#endif
+    0,                                  // tp_getattr
+    0,                                  // tp_setattr
+    0,                                  // tp_as_async
+    0,                                  // tp_repr
+    0,                                  // tp_as_number
+    0,                                  // tp_as_sequence
+    0,                                  // tp_as_mapping
+    0,                                  // tp_hash
+#ifdef HAVE_VECTORCALL
+    PyVectorcall_Call,                  // tp_call
+#else
+    CrcEngine_call,                     // tp_call
+#endif
+    0,                                  // tp_str
+    0,                                  // tp_getattro
+    0,                                  // tp_setattro
+    0,                                  // tp_as_buffer
+    Py_TPFLAGS_DEFAULT | TPFLAGS_VECTORCALL, // tp_flags
+    "Compute a CRC with fixed tables and parameters.\n\n"
+    "engine(data, crc=initCrc) returns the CRC of the data.", // tp_doc
+    0,                                  // tp_traverse
+    0,                                  // tp_clear
+    0,                                  // tp_richcompare
+    0,                                  // tp_weaklistoffset
+    0,                                  // tp_iter
+    0,                                  // tp_iternext
+    CrcEngine_methods,                  // tp_methods
+    CrcEngine_members,                  // tp_members
+    CrcEngine_getset,                   // tp_getset
+    0,                                  // tp_base
+    0,                                  // tp_dict
+    0,                                  // tp_descr_get
+    0,                                  // tp_descr_set
+    0,                                  // tp_dictoffset
+    0,                                  // tp_init
+    0,                                  // tp_alloc
+    CrcEngine_new,                      // tp_new
+};
+
+//-----------------------------------------------------------------------------
+// CrcBase is the base type of crcmod.Crc.  It keeps the state of a CRC
+// calculation in fixed fields and implements the hashlib style methods, while
+// the Python subclass verifies the parameters and creates the CrcEngine.
+//
+// The methods that process data release the GIL for large buffers, so the
+// engine and the CRC value are protected by a lock of the object, as hashlib
+// does.  It is taken by every method that reads or changes the CRC value and
+// by __init__, which replaces the engine.
+
+typedef struct {
+    PyObject_HEAD
+    PyThread_type_lock lock;
+    unsigned long owner;    // thread holding the lock, valid while locked
+    int locked;
+    CrcEngineObject* engine;
+    PyObject* poly;
+    PyObject* table;
+    UINT64 crcValue;
+} CrcBaseObject;
+
+static int
+crcBaseReady(CrcBaseObject* self)
+{
+    if (self->engine == NULL)
+    {
+        PyErr_SetString(PyExc_ValueError, "Crc object is not initialized");
+        return -1;
+    }
+    return 0;
+}
+
+// Take the lock of the object, waiting for it without the GIL if another
+// thread holds it.  Called with the GIL held.  The lock is not reentrant, so
+// using the object from a function called while the same thread holds it,
+// such as the read or progress function of update_from_file, is an error.
+// Returns -1 with an exception set, without the lock, in that case.
+static int
+crcBaseTake(CrcBaseObject* self)
+{
+    unsigned long thread = PyThread_get_thread_ident();
+
+    if (self->locked && self->owner == thread)
+    {
+        PyErr_SetString(PyExc_RuntimeError,
+                        "Crc object is already in use by this thread");
+        return -1;
+    }
+    if (!PyThread_acquire_lock(self->lock, NOWAIT_LOCK))
+    {
+        Py_BEGIN_ALLOW_THREADS
+        PyThread_acquire_lock(self->lock, WAIT_LOCK);
+        Py_END_ALLOW_THREADS
+    }
+    self->owner = thread;
+    self->locked = 1;
+    return 0;
+}
+
+// Check that the object is initialized and take its lock.  Returns -1 with an
+// exception set, without the lock, if it is not initialized.  The lock is
+// allocated by __init__ before the engine is set.
+static int
+crcBaseLock(CrcBaseObject* self)
+{
+    if (crcBaseReady(self) < 0)
+    {
+        return -1;
+    }
+    return crcBaseTake(self);
+}
+
+static void
+crcBaseUnlock(CrcBaseObject* self)
+{
+    self->locked = 0;
+    PyThread_release_lock(self->lock);
+}
+
+// Create an instance of the same type holding the same CRC algorithm.  The
+// __init__ method is not called.
+static CrcBaseObject*
+crcBaseClone(CrcBaseObject* self)
+{
+    PyTypeObject* type = Py_TYPE(self);
+    CrcBaseObject* n;
+
+    n = (CrcBaseObject*)type->tp_alloc(type, 0);
+    if (n == NULL)
+    {
+        return NULL;
+    }
+    n->lock = PyThread_allocate_lock();
+    if (n->lock == NULL)
+    {
+        Py_DECREF(n);
+        PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+        return NULL;
+    }
+    if (crcBaseLock(self) < 0)
+    {
+        Py_DECREF(n);
+        return NULL;
+    }
+
+    Py_INCREF(self->engine);
+    n->engine = self->engine;
+    Py_XINCREF(self->poly);
+    n->poly = self->poly;
+    Py_XINCREF(self->table);
+    n->table = self->table;
+    n->crcValue = self->crcValue;
+    crcBaseUnlock(self);
+    return n;
+}
+
+//-----------------------------------------------------------------------------
+// Initialize the object.
+// Inputs:
+//   engine - CrcEngine object used to compute the CRC
+//   poly - generator polynomial, only kept for information
+//   table - CRC table, only kept for information
+
+static int
+CrcBase_init(CrcBaseObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"engine", "poly", "table", NULL};
+    PyObject* engine;
+    PyObject* poly = Py_None;
+    PyObject* table = Py_None;
+    PyObject* oldEngine;
+    PyObject* oldPoly;
+    PyObject* oldTable;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|OO:CrcBase", kwlist,
+                                     &CrcEngineType, &engine, &poly, &table))
+    {
+        return -1;
+    }
+
+    if (self->lock == NULL)
+    {
+        self->lock = PyThread_allocate_lock();
+        if (self->lock == NULL)
+        {
+            PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+            return -1;
+        }
+    }
+    if (crcBaseTake(self) < 0)
+    {
+        return -1;
+    }
+
+    // The old values are released without the lock, since that may run
+    // arbitrary code.
+    oldEngine = (PyObject*)self->engine;
+    oldPoly = self->poly;
+    oldTable = self->table;
+    Py_INCREF(engine);
+    self->engine = (CrcEngineObject*)engine;
+    Py_INCREF(poly);
+    self->poly = poly;
+    Py_INCREF(table);
+    self->table = table;
+    self->crcValue = self->engine->initCrc;
+    crcBaseUnlock(self);
+
+    Py_XDECREF(oldEngine);
+    Py_XDECREF(oldPoly);
+    Py_XDECREF(oldTable);
+    return 0;
+}
+
+static int
+CrcBase_traverse(CrcBaseObject* self, visitproc visit, void* arg)
+{
+    Py_VISIT(self->engine);
+    Py_VISIT(self->poly);
+    Py_VISIT(self->table);
+    return 0;
+}
+
+static int
+CrcBase_clear(CrcBaseObject* self)
+{
+    Py_CLEAR(self->engine);
+    Py_CLEAR(self->poly);
+    Py_CLEAR(self->table);
+    return 0;
+}
+
+static void
+CrcBase_dealloc(CrcBaseObject* self)
+{
+    PyObject_GC_UnTrack(self);
+    CrcBase_clear(self);
+    if (self->lock != NULL)
+    {
+        PyThread_free_lock(self->lock);
+    }
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+//-----------------------------------------------------------------------------
+static PyObject*
+CrcBase_new_method(CrcBaseObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"arg", NULL};
+    PyObject* arg = Py_None;
+    CrcBaseObject* n;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|O:new", kwlist, &arg))
+    {
+        return NULL;
+    }
+
+    n = crcBaseClone(self);
+    if (n == NULL)
+    {
+        return NULL;
+    }
+    n->crcValue = n->engine->initCrc;
+
+    if (arg != Py_None && engineUpdate(n->engine, arg, &n->crcValue) < 0)
+    {
+        Py_DECREF(n);
+        return NULL;
+    }
+    return (PyObject*)n;
+}
+
+static PyObject*
+CrcBase_copy(CrcBaseObject* self, PyObject* unused)
+{
+    return (PyObject*)crcBaseClone(self);
+}
+
+// Clone the object for the copy module.  The CrcEngine object and the table
+// are immutable, so they are shared, and the __dict__ of subclasses is copied,
+// deeply if memo is not NULL.
+static PyObject*
+crcBaseCopyObject(CrcBaseObject* self, PyObject* memo)
+{
+    CrcBaseObject* n;
+    PyObject* dict;
+    PyObject* newDict;
+    PyObject* module;
+    PyObject* id;
+    int status;
+
+    n = crcBaseClone(self);
+    if (n == NULL)
+    {
+        return NULL;
+    }
+
+    if (memo != NULL)
+    {
+        id = PyLong_FromVoidPtr(self);
+        if (id == NULL)
+        {
+            goto error;
+        }
+        status = PyObject_SetItem(memo, id, (PyObject*)n);
+        Py_DECREF(id);
+        if (status < 0)
+        {
+            goto error;
+        }
+    }
+
+    dict = PyObject_GetAttrString((PyObject*)self, "__dict__");
+    if (dict == NULL)
+    {
+        if (!PyErr_ExceptionMatches(PyExc_AttributeError))
+        {
+            goto error;
+        }
+        PyErr_Clear();
+        return (PyObject*)n;
+    }
+
+    if (memo == NULL)
+    {
+        newDict = PyDict_Copy(dict);
+    }
+    else
+    {
+        newDict = NULL;
+        module = PyImport_ImportModule("copy");
+        if (module != NULL)
+        {
+            newDict = PyObject_CallMethod(module, "deepcopy", "OO", dict,
+                                          memo);
+            Py_DECREF(module);
+        }
+    }
+    Py_DECREF(dict);
+    if (newDict == NULL)
+    {
+        goto error;
+    }
+    status = PyObject_SetAttrString((PyObject*)n, "__dict__", newDict);
+    Py_DECREF(newDict);
+    if (status < 0)
+    {
+        goto error;
+    }
+    return (PyObject*)n;
+
+error:
+    Py_DECREF(n);
+    return NULL;
+}
+
+static PyObject*
+CrcBase_copy_copy(CrcBaseObject* self, PyObject* unused)
+{
+    return crcBaseCopyObject(self, NULL);
+}
+
+static PyObject*
+CrcBase_deepcopy(CrcBaseObject* self, PyObject* memo)
+{
+    return crcBaseCopyObject(self, memo);
+}
+
+static PyObject*
+CrcBase_update(CrcBaseObject* self, PyObject* const* args, Py_ssize_t nargs,
+               PyObject* kwnames)
+{
+    static const char* const names[] = {"data", "workers"};
+    PyObject* argv[2];
+    PyObject* crcObj;
+    PyObject* result;
+    int status;
+
+    if (nargs == 1 && kwnames == NULL)
+    {
+        argv[0] = args[0];
+        argv[1] = NULL;
+    }
+    else if (parseFastArgs("update", args, nargs, kwnames, names, 2,
+                           argv) < 0)
+    {
+        return NULL;
+    }
+
+    if (crcBaseLock(self) < 0)
+    {
+        return NULL;
+    }
+
+    if (argv[1] == NULL || argv[1] == Py_None)
+    {
+        status = engineUpdate(self->engine, argv[0], &self->crcValue);
+        crcBaseUnlock(self);
+        if (status < 0)
+        {
+            return NULL;
+        }
+        Py_RETURN_NONE;
+    }
+
+    status = -1;
+    crcObj = PyLong_FromUnsignedLongLong(self->crcValue);
+    if (crcObj != NULL)
+    {
+        result = callParallel(self->engine, argv[0], crcObj, argv[1]);
+        Py_DECREF(crcObj);
+        if (result != NULL)
+        {
+            status = engineStartCrc(self->engine, result, &self->crcValue);
+            Py_DECREF(result);
+        }
+    }
+    crcBaseUnlock(self);
+    if (status < 0)
+    {
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+//-----------------------------------------------------------------------------
+// Update the CRC with the data from a file object or a file descriptor,
+// starting at the current position.  The position is moved past the data as if
+// the data had been read.  Files without a file descriptor, or that are not
+// seekable, are read with their read method.
+// Inputs:
+//   f - file object or file descriptor
+//   length - number of bytes, or None to read to the end of the file
+//   progress, progress_interval, use_mmap, sparse - see from_fd
+// Returns:
+//   number of bytes read
+
+// Read a file object with its read method.
+static int
+crcBaseReadObject(CrcBaseObject* self, PyObject* f, FileJob* job)
+{
+    job->total = 0;
+    job->nextProgress = job->interval;
+    job->nextCheck = SIGNAL_INTERVAL;
+    for (;;)
+    {
+        long long size = FILE_BUFFER_SIZE;
+        PyObject* data;
+        Py_ssize_t n;
+        int status;
+
+        if (job->length >= 0 && job->length - job->total < size)
+        {
+            size = job->length - job->total;
+        }
+        if (size == 0)
+        {
+            break;
+        }
+
+        data = PyObject_CallMethod(f, "read", "L", size);
+        if (data == NULL)
+        {
+            return -1;
+        }
+        n = PyObject_Length(data);
+        status = (n < 0) ? -1 :
+            engineUpdate(self->engine, data, &self->crcValue);
+        Py_DECREF(data);
+        if (status < 0)
+        {
+            return -1;
+        }
+        if (n == 0)
+        {
+            break;
+        }
+        job->total += n;
+
+        if (fileCheckDue(job) && fileCheckpoint(job) < 0)
+        {
+            return -1;
+        }
+    }
+    if (job->progress != NULL && job->total != job->nextProgress - job->interval
+        && fileProgress(job) < 0)
+    {
+        return -1;
+    }
+    return 0;
+}
+
+// Read the file with the lock of the object held.  Returns -1 with an
+// exception set on errors.
+static int
+crcBaseReadFile(CrcBaseObject* self, PyObject* f, FileJob* job, int useMmap,
+                int sparse)
+{
+    PyObject* obj;
+
+    job->engine = self->engine;
+    job->positioned = 0;
+    job->offset = 0;
+
+    if (PyLong_Check(f))
+    {
+        job->fd = PyObject_AsFileDescriptor(f);
+        if (job->fd < 0)
+        {
+            return -1;
+        }
+    }
+    else
+    {
+        // Read at the position reported by the file object, since a buffered
+        // file may have read ahead.  Then move the file object past the data.
+        obj = PyObject_CallMethod(f, "fileno", NULL);
+        if (obj != NULL)
+        {
+            job->fd = PyObject_AsFileDescriptor(obj);
+            Py_DECREF(obj);
+            if (job->fd < 0)
+            {
+                return -1;
+            }
+            obj = PyObject_CallMethod(f, "tell", NULL);
+        }
+        if (obj == NULL)
+        {
+            if (!PyErr_ExceptionMatches(PyExc_OSError) &&
+                !PyErr_ExceptionMatches(PyExc_AttributeError))
+            {
+                return -1;
+            }
+            PyErr_Clear();
+            return crcBaseReadObject(self, f, job);
+        }
+        job->offset = PyLong_AsLongLong(obj);
+        Py_DECREF(obj);
+        if (job->offset == -1 && PyErr_Occurred())
+        {
+            return -1;
+        }
+        job->positioned = 1;
+    }
+
+    return fileCrc(job, useMmap, sparse, &self->crcValue);
+}
+
+static PyObject*
+CrcBase_update_from_file(CrcBaseObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"f", "length", "progress", "progress_interval",
+                             "use_mmap", "sparse", NULL};
+    FileJob job;
+    PyObject* f;
+    PyObject* lengthObj = Py_None;
+    PyObject* progress = Py_None;
+    long long interval = PROGRESS_INTERVAL;
+    int useMmap = 0;
+    int sparse = 0;
+    PyObject* obj;
+    int status;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|OOLpp:update_from_file",
+                                     kwlist, &f, &lengthObj, &progress,
+                                     &interval, &useMmap, &sparse))
+    {
+        return NULL;
+    }
+    if (optionalSize(lengthObj, "length", &job.length) < 0 ||
+        fileJobProgress(&job, progress, interval) < 0 ||
+        crcBaseLock(self) < 0)
+    {
+        return NULL;
+    }
+    status = crcBaseReadFile(self, f, &job, useMmap, sparse);
+    crcBaseUnlock(self);
+    if (status < 0)
+    {
+        return NULL;
+    }
+
+    if (job.positioned)
+    {
+        obj = PyObject_CallMethod(f, "seek", "L", job.offset + job.total);
+        if (obj == NULL)
+        {
+            return NULL;
+        }
+        Py_DECREF(obj);
+    }
+    return PyLong_FromLongLong(job.total);
+}
+
+static PyObject*
+CrcBase_combine(CrcBaseObject* self, PyObject* args)
+{
+    CrcEngineObject* engine;
+    PyObject* result;
+
+    if (crcBaseReady(self) < 0)
+    {
+        return NULL;
+    }
+    // Keep the engine alive if another thread calls __init__.
+    engine = self->engine;
+    Py_INCREF(engine);
+    result = CrcEngine_combine(engine, args);
+    Py_DECREF(engine);
+    return result;
+}
+
+static PyObject*
+CrcBase_patch(CrcBaseObject* self, PyObject* args)
+{
+    CrcEngineObject* engine;
+    PyObject* result;
+
+    if (crcBaseReady(self) < 0)
+    {
+        return NULL;
+    }
+    // Keep the engine alive if another thread calls __init__.
+    engine = self->engine;
+    Py_INCREF(engine);
+    result = CrcEngine_patch(engine, args);
+    Py_DECREF(engine);
+    return result;
+}
+
+static PyObject*
+CrcBase_update_zeros(CrcBaseObject* self, PyObject* args)
+{
+    long long n;
+
+    if (!PyArg_ParseTuple(args, "L:update_zeros", &n))
+    {
+        return NULL;
+    }
+    if (n < 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "length must be >= 0");
+        return NULL;
+    }
+    if (crcBaseLock(self) < 0)
+    {
+        return NULL;
+    }
+    self->crcValue = engineZeros(self->engine, self->crcValue, n);
+    crcBaseUnlock(self);
+    Py_RETURN_NONE;
+}
+
+static PyObject*
+CrcBase_digest(CrcBaseObject* self, PyObject* unused)
+{
+    UINT8 out[8];
+    UINT64 crc;
+    int n;
+    int i;
+
+    if (crcBaseLock(self) < 0)
+    {
+        return NULL;
+    }
+    crc = self->crcValue;
+    n = self->engine->width/8;
+    crcBaseUnlock(self);
+
+    for (i = n-1; i >= 0; i--)
+    {
+        out[i] = BYTE0(crc);
+        crc >>= 8;
+    }
+    return PyBytes_FromStringAndSize((const char*)out, n);
+}
+
+static PyObject*
+CrcBase_hexdigest(CrcBaseObject* self, PyObject* unused)
+{
+    static const char hexDigits[] = "0123456789ABCDEF";
+    char out[16];
+    UINT64 crc;
+    int n;
+    int i;
+
+    if (crcBaseLock(self) < 0)
+    {
+        return NULL;
+    }
+    crc = self->crcValue;
+    n = self->engine->width/4;
+    crcBaseUnlock(self);
+
+    for (i = n-1; i >= 0; i--)
+    {
+        out[i] = hexDigits[crc & 0xF];
+        crc >>= 4;
+    }
+    return PyUnicode_FromStringAndSize(out, n);
+}
+
+//-----------------------------------------------------------------------------
+// Attributes.  The parameters of the algorithm come from the engine.
+
+static PyObject*
+CrcBase_get_crcValue(CrcBaseObject* self, void* closure)
+{
+    UINT64 crc;
+
+    if (crcBaseLock(self) < 0)
+    {
+        return NULL;
+    }
+    crc = self->crcValue;
+    crcBaseUnlock(self);
+    return PyLong_FromUnsignedLongLong(crc);
+}
+
+static int
+CrcBase_set_crcValue(CrcBaseObject* self, PyObject* value, void* closure)
+{
+    UINT64 crc;
+
+    if (value == NULL)
+    {
+        PyErr_SetString(PyExc_AttributeError, "cannot delete crcValue");
+        return -1;
+    }
+    if (crcBaseLock(self) < 0)
+    {
+        return -1;
+    }
+    if (engineStartCrc(self->engine, value, &crc) < 0)
+    {
+        crcBaseUnlock(self);
+        return -1;
+    }
+    self->crcValue = crc & WIDTH_MASK(self->engine->width);
+    crcBaseUnlock(self);
+    return 0;
+}
+
+static PyObject*
+CrcBase_get_engine(CrcBaseObject* self, void* closure)
+{
+    if (crcBaseReady(self) < 0)
+    {
+        return NULL;
+    }
+    Py_INCREF(self->engine);
+    return (PyObject*)self->engine;
+}
+
+static PyObject*
+CrcBase_get_digest_size(CrcBaseObject* self, void* closure)
+{
+    if (crcBaseReady(self) < 0)
+    {
+        return NULL;
+    }
+    return PyLong_FromLong(self->engine->width/8);
+}
+
+static PyObject*
+CrcBase_get_initCrc(CrcBaseObject* self, void* closure)
+{
+    if (crcBaseReady(self) < 0)
+    {
+        return NULL;
+    }
+    return PyLong_FromUnsignedLongLong(self->engine->initCrc);
+}
+
+static PyObject*
+CrcBase_get_xorOut(CrcBaseObject* self, void* closure)
+{
+    if (crcBaseReady(self) < 0)
+    {
+        return NULL;
+    }
+    return PyLong_FromUnsignedLongLong(self->engine->xorOut);
+}
+
+static PyObject*
+CrcBase_get_reverse(CrcBaseObject* self, void* closure)
+{
+    if (crcBaseReady(self) < 0)
+    {
+        return NULL;
+    }
+    return PyBool_FromLong(self->engine->rev);
+}
+
+static PyGetSetDef CrcBase_getset[] = {
+{"crcValue", (getter)CrcBase_get_crcValue, (setter)CrcBase_set_crcValue},
+{"_crc", (getter)CrcBase_get_engine},
+{"digest_size", (getter)CrcBase_get_digest_size},
+{"initCrc", (getter)CrcBase_get_initCrc},
+{"xorOut", (getter)CrcBase_get_xorOut},
+{"reverse", (getter)CrcBase_get_reverse},
+{NULL}
+};
+
+static PyMemberDef CrcBase_members[] = {
+{"poly", T_OBJECT, offsetof(CrcBaseObject, poly), 0},
+{"table", T_OBJECT, offsetof(CrcBaseObject, table), 0},
+{NULL}
+};
+
+static PyMethodDef CrcBase_methods[] = {
+{"new", (PyCFunction)(void(*)(void))CrcBase_new_method,
+ METH_VARARGS | METH_KEYWORDS,
+ "Create a new instance with the CRC set to the initial value.  The data in\n"
+ "the optional argument is passed to the update method."},
+{"copy", (PyCFunction)CrcBase_copy, METH_NOARGS,
+ "Create a new instance with the CRC set to the current value."},
+{"__copy__", (PyCFunction)CrcBase_copy_copy, METH_NOARGS, NULL},
+{"__deepcopy__", (PyCFunction)CrcBase_deepcopy, METH_O, NULL},
+{"update", (PyCFunction)(void(*)(void))CrcBase_update,
+ METH_FASTCALL | METH_KEYWORDS,
+ "update(data, workers=None)\n\n"
+ "Update the current CRC value with the data.  The CRC is computed by\n"
+ "several threads if workers is given."},
+{"update_from_file", (PyCFunction)(void(*)(void))CrcBase_update_from_file,
+ METH_VARARGS | METH_KEYWORDS,
+ "update_from_file(f, length=None, progress=None, progress_interval=64 MiB,\n"
+ "                 use_mmap=False, sparse=False) -> number of bytes read\n\n"
+ "Update the current CRC value with the data from a file object or a file\n"
+ "descriptor, starting at its current position."},
+{"update_zeros", (PyCFunction)CrcBase_update_zeros, METH_VARARGS,
+ "update_zeros(n)\n\n"
+ "Update the current CRC value as if n zero bytes were passed to update."},
+{"combine", (PyCFunction)CrcBase_combine, METH_VARARGS,
+ "combine(crcA, crcB, lenB) -> CRC of A+B from the CRCs of A and B and the\n"
+ "length of B."},
+{"patch", (PyCFunction)CrcBase_patch, METH_VARARGS,
+ "patch(crc, total_len, offset, old_bytes, new_bytes) -> CRC of the message\n"
+ "after old_bytes at offset were replaced by new_bytes, from the CRC of the\n"
+ "original message."},
+{"digest", (PyCFunction)CrcBase_digest, METH_NOARGS,
+ "Return the current CRC value as a string of bytes."},
+{"hexdigest", (PyCFunction)CrcBase_hexdigest, METH_NOARGS,
+ "Return the current CRC value as a string of hex digits."},
+{NULL, NULL}
+};
+
+static PyTypeObject CrcBaseType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "crcmod._crcfunext.CrcBase",        // tp_name
+    sizeof(CrcBaseObject),              // tp_basicsize
+    0,                                  // tp_itemsize
+    (destructor)CrcBase_dealloc,        // tp_dealloc
+    0,                                  // tp_vectorcall_offset
+    0,                                  // tp_getattr
+    0,                                  // tp_setattr
+    0,                                  // tp_as_async
+    0,                                  // tp_repr
+    0,                                  // tp_as_number
+    0,                                  // tp_as_sequence
+    0,                                  // tp_as_mapping
+    0,                                  // tp_hash
+    0,                                  // tp_call
+    0,                                  // tp_str
+    0,                                  // tp_getattro
+    0,                                  // tp_setattro
+    0,                                  // tp_as_buffer
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC, // tp_flags
+    "Base type of crcmod.Crc holding the state of a CRC calculation.", // tp_doc
+    (traverseproc)CrcBase_traverse,     // tp_traverse
+    (inquiry)CrcBase_clear,             // tp_clear
+    0,                                  // tp_richcompare
+    0,                                  // tp_weaklistoffset
+    0,                                  // tp_iter
+    0,                                  // tp_iternext
+    CrcBase_methods,                    // tp_methods
+    CrcBase_members,                    // tp_members
+    CrcBase_getset,                     // tp_getset
+    0,                                  // tp_base
+    0,                                  // tp_dict
+    0,                                  // tp_descr_get
+    0,                                  // tp_descr_set
+    0,                                  // tp_dictoffset
+    (initproc)CrcBase_init,             // tp_init
+    0,                                  // tp_alloc
+    PyType_GenericNew,                  // tp_new
+};
+
+//-----------------------------------------------------------------------------
+// RollingBase is the base type of crcmod.RollingCrc, which computes the CRC of
+// the last window bytes of a stream after each byte.  The CRC register is kept
+// with a zero initial value.  Each step adds the incoming byte with the CRC
+// table and removes the byte leaving the window with the outgoing table, whose
+// entries are the contributions of a byte to the register window bytes later.
+// The initial value shifted over the window and the final XOR are constant and
+// are added to the register to give the CRC.  Until window bytes have been
+// seen, the window holds zero bytes.  The Python subclass computes the tables.
+//
+// The methods that process data release the GIL for large buffers, so the
+// state is protected by a lock of the object, as hashlib does.  It is taken
+// by every method that reads or changes the state, including __init__.
+
+typedef struct {
+    PyObject_HEAD
+    PyThread_type_lock lock;
+    int width;
+    int rev;
+    Py_ssize_t window;
+    UINT8* ring;            // the bytes in the window, the oldest at ringPos
+    Py_ssize_t ringPos;
+    UINT64 reg;             // CRC register of the window with zero initial value
+    UINT64 base;            // constant part of the CRC
+    UINT64 table[256];
+    UINT64 outTable[256];
+} RollingBaseObject;
+
+// Take the lock of the object, waiting for it without the GIL if another
+// thread holds it.  Called with the GIL held.  The lock is allocated by
+// __init__, so it exists once the object is initialized.
+static void
+rollingLock(RollingBaseObject* self)
+{
+    if (!PyThread_acquire_lock(self->lock, NOWAIT_LOCK))
+    {
+        Py_BEGIN_ALLOW_THREADS
+        PyThread_acquire_lock(self->lock, WAIT_LOCK);
+        Py_END_ALLOW_THREADS
+    }
+}
+
+static void
+rollingUnlock(RollingBaseObject* self)
+{
+    PyThread_release_lock(self->lock);
+}
+
+// Check that the object is initialized and take its lock.  Returns -1 with an
+// exception set, without the lock, if it is not initialized.
+static int
+rollingReady(RollingBaseObject* self)
+{
+    if (self->lock == NULL)
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "RollingCrc object is not initialized");
+        return -1;
+    }
+    rollingLock(self);
+    return 0;
+}
+
+// Move the window by one byte: add the incoming byte b to the register and
+// remove the outgoing byte o.
+#define ROLLING_STEP(reg, b, o) \
+    do { \
+        if (rev) \
+        { \
+            reg = (reg >> 8) ^ table[(reg ^ (b)) & 0xFF]; \
+        } \
+        else \
+        { \
+            reg = ((reg << 8) ^ table[((reg >> shift) ^ (b)) & 0xFF]) & mask; \
+        } \
+        reg ^= outTable[o]; \
+    } while (0)
+
+// Return the outgoing byte for data[i] and update the ring.  The outgoing bytes
+// come from the ring until the window has moved past it, then from the data.
+#define ROLLING_OUT(o, i) \
+    do { \
+        if ((i) < window) \
+        { \
+            o = ring[pos]; \
+            ring[pos] = data[i]; \
+            pos = (pos + 1 == window) ? 0 : pos + 1; \
+        } \
+        else \
+        { \
+            o = data[(i) - window]; \
+        } \
+    } while (0)
+
+// Keep the last bytes of the data in the ring after the first n bytes of the
+// data were added.
+static void
+rollingKeep(RollingBaseObject* self, const UINT8* data, Py_ssize_t n,
+            Py_ssize_t pos)
+{
+    if (n > self->window)
+    {
+        memcpy(self->ring, data + n - self->window, self->window);
+        pos = 0;
+    }
+    self->ringPos = pos;
+}
+
+// Add the bytes to the window.  When out is not NULL, the CRC of the window
+// after each byte is stored in it as an array of itemSize byte integers.  Safe
+// to call without the GIL.
+static void
+rollingUpdate(RollingBaseObject* self, const UINT8* data, Py_ssize_t len,
+              UINT8* out, int itemSize)
+{
+    const UINT64* table = self->table;
+    const UINT64* outTable = self->outTable;
+    UINT8* ring = self->ring;
+    Py_ssize_t window = self->window;
+    Py_ssize_t pos = self->ringPos;
+    UINT64 mask = WIDTH_MASK(self->width);
+    UINT64 reg = self->reg;
+    UINT64 base = self->base;
+    int shift = self->width - 8;
+    int rev = self->rev;
+    Py_ssize_t i;
+
+    for (i = 0; i < len; i++)
+    {
+        UINT8 o;
+
+        ROLLING_OUT(o, i);
+        ROLLING_STEP(reg, data[i], o);
+
+        if (out != NULL)
+        {
+            switch (itemSize)
+            {
+            case 1:
+                out[i] = (UINT8)(reg ^ base);
+                break;
+            case 2:
+                ((UINT16*)out)[i] = (UINT16)(reg ^ base);
+                break;
+            case 4:
+                ((UINT32*)out)[i] = (UINT32)(reg ^ base);
+                break;
+            default:
+                ((UINT64*)out)[i] = reg ^ base;
+                break;
+            }
+        }
+    }
+
+    rollingKeep(self, data, len, pos);
+    self->reg = reg;
+}
+
+// Add the bytes to the window up to the first chunk boundary and return the
+// number of bytes added, or -1 if there is no boundary in the data.  A chunk
+// ends after a byte where the low bits of the CRC of the window selected by
+// mask are zero, provided the chunk holds at least minSize bytes, or when it
+// reaches maxSize bytes.  chunkLen is the number of bytes of the chunk before
+// the data.  Safe to call without the GIL.
+static Py_ssize_t
+rollingFind(RollingBaseObject* self, const UINT8* data, Py_ssize_t len,
+            UINT64 match, long long chunkLen, long long minSize,
+            long long maxSize)
+{
+    const UINT64* table = self->table;
+    const UINT64* outTable = self->outTable;
+    UINT8* ring = self->ring;
+    Py_ssize_t window = self->window;
+    Py_ssize_t pos = self->ringPos;
+    UINT64 mask = WIDTH_MASK(self->width);
+    UINT64 reg = self->reg;
+    UINT64 base = self->base & match;
+    int shift = self->width - 8;
+    int rev = self->rev;
+    Py_ssize_t found = -1;
+    Py_ssize_t i;
+
+    for (i = 0; i < len; i++)
+    {
+        UINT8 o;
+
+        ROLLING_OUT(o, i);
+        ROLLING_STEP(reg, data[i], o);
+
+        chunkLen++;
+        if (chunkLen >= maxSize ||
+            (chunkLen >= minSize && (reg & match) == base))
+        {
+            found = ++i;
+            break;
+        }
+    }
+
+    rollingKeep(self, data, i, pos);
+    self->reg = reg;
+    return found;
+}
+
+// Convert a sequence of 256 integers to a table.
+static int
+rollingTable(PyObject* obj, UINT64* table, UINT64 mask)
+{
+    PyObject* seq = PySequence_Fast(obj, "table must be a sequence");
+    Py_ssize_t i;
+
+    if (seq == NULL)
+    {
+        return -1;
+    }
+    if (PySequence_Fast_GET_SIZE(seq) != 256)
+    {
+        PyErr_SetString(PyExc_ValueError, "invalid CRC table");
+        Py_DECREF(seq);
+        return -1;
+    }
+    for (i = 0; i < 256; i++)
+    {
+        UINT64 value =
+            PyLong_AsUnsignedLongLong(PySequence_Fast_GET_ITEM(seq, i));
+        if (value == (UINT64)-1 && PyErr_Occurred())
+        {
+            Py_DECREF(seq);
+            return -1;
+        }
+        table[i] = value & mask;
+    }
+    Py_DECREF(seq);
+    return 0;
+}
+
+//-----------------------------------------------------------------------------
+// Initialize the object.
+// Inputs:
+//   width - number of bits in the CRC
+//   rev - true if the data is processed bit reversed
+//   window - number of bytes in the window
+//   table - CRC table from _mkTable or _mkTable_r
+//   outTable - table of the contributions of the outgoing bytes
+//   base - CRC of a window of zero bytes
+
+static int
+RollingBase_init(RollingBaseObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"width", "rev", "window", "table", "outTable",
+                             "base", NULL};
+    int width;
+    int rev;
+    Py_ssize_t window;
+    PyObject* table;
+    PyObject* outTable;
+    UINT64 base;
+    UINT8* ring;
+    UINT64 newTable[256];
+    UINT64 newOutTable[256];
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "ipnOOK:RollingBase", kwlist,
+                                     &width, &rev, &window, &table, &outTable,
+                                     &base))
+    {
+        return -1;
+    }
+    if (width != 8 && width != 16 && width != 24 && width != 32 &&
+        width != 64)
+    {
+        PyErr_SetString(PyExc_ValueError, "invalid CRC width");
+        return -1;
+    }
+    if (window < 1)
+    {
+        PyErr_SetString(PyExc_ValueError, "window must be >= 1");
+        return -1;
+    }
+    if (rollingTable(table, newTable, WIDTH_MASK(width)) < 0 ||
+        rollingTable(outTable, newOutTable, WIDTH_MASK(width)) < 0)
+    {
+        return -1;
+    }
+
+    ring = PyMem_Calloc(window, 1);
+    if (ring == NULL)
+    {
+        PyErr_NoMemory();
+        return -1;
+    }
+    if (self->lock == NULL)
+    {
+        self->lock = PyThread_allocate_lock();
+        if (self->lock == NULL)
+        {
+            PyMem_Free(ring);
+            PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+            return -1;
+        }
+    }
+
+    rollingLock(self);
+    PyMem_Free(self->ring);
+    self->ring = ring;
+    self->ringPos = 0;
+    self->width = width;
+    self->rev = rev;
+    self->window = window;
+    self->reg = 0;
+    self->base = base & WIDTH_MASK(width);
+    memcpy(self->table, newTable, sizeof(newTable));
+    memcpy(self->outTable, newOutTable, sizeof(newOutTable));
+    rollingUnlock(self);
+    return 0;
+}
+
+static void
+RollingBase_dealloc(RollingBaseObject* self)
+{
+    if (self->lock != NULL)
+    {
+        PyThread_free_lock(self->lock);
+    }
+    PyMem_Free(self->ring);
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+//-----------------------------------------------------------------------------
+static PyObject*
+RollingBase_update(RollingBaseObject* self, PyObject* data)
+{
+    Py_buffer buf;
+    PyThreadState* save;
+
+    if (getBufferView(data, &buf) < 0)
+    {
+        return NULL;
+    }
+    if (rollingReady(self) < 0)
+    {
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+    save = releaseGil(buf.len);
+    rollingUpdate(self, buf.buf, buf.len, NULL, 0);
+    acquireGil(save);
+    rollingUnlock(self);
+    PyBuffer_Release(&buf);
+    Py_RETURN_NONE;
+}
+
+//-----------------------------------------------------------------------------
+// Add the data to the window and store the CRC of the window after each byte.
+// Inputs:
+//   data - object supporting the buffer API
+//   out - writable buffer of integers of the size of the CRC, such as an
+//         array, with at least one item for each byte of data
+
+static PyObject*
+RollingBase_roll_into(RollingBaseObject* self, PyObject* args)
+{
+    PyObject* data;
+    PyObject* out;
+    Py_buffer buf;
+    Py_buffer outBuf;
+    PyThreadState* save;
+    int itemSize;
+
+    if (!PyArg_ParseTuple(args, "OO:roll_into", &data, &out) ||
+        getBufferView(data, &buf) < 0)
+    {
+        return NULL;
+    }
+    if (PyObject_GetBuffer(out, &outBuf, PyBUF_WRITABLE | PyBUF_FORMAT) < 0)
+    {
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+    if (rollingReady(self) < 0)
+    {
+        PyBuffer_Release(&outBuf);
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+    itemSize = ENTRY_SIZE(self->width);
+    if (outBuf.itemsize != itemSize || outBuf.len / itemSize < buf.len)
+    {
+        rollingUnlock(self);
+        PyErr_Format(PyExc_ValueError,
+                     "out must hold len(data) integers of %d bytes", itemSize);
+        PyBuffer_Release(&outBuf);
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+
+    save = releaseGil(buf.len);
+    rollingUpdate(self, buf.buf, buf.len, outBuf.buf, itemSize);
+    acquireGil(save);
+    rollingUnlock(self);
+
+    PyBuffer_Release(&outBuf);
+    PyBuffer_Release(&buf);
+    Py_RETURN_NONE;
+}
+
+//-----------------------------------------------------------------------------
+// Add the data to the window up to the first content-defined chunk boundary.
+// Inputs:
+//   data - object supporting the buffer API
+//   mask - bits of the CRC of the window that must be zero at a boundary
+//   chunk_len - number of bytes of the current chunk before the data
+//   min_size - minimum chunk size
+//   max_size - maximum chunk size
+// Returns:
+//   number of bytes added up to and including the last byte of the chunk, or
+//   -1 if all of the data was added without reaching a boundary
+
+static PyObject*
+RollingBase_find_boundary(RollingBaseObject* self, PyObject* args)
+{
+    PyObject* data;
+    UINT64 match;
+    long long chunkLen;
+    long long minSize;
+    long long maxSize;
+    Py_buffer buf;
+    PyThreadState* save;
+    Py_ssize_t found;
+
+    if (!PyArg_ParseTuple(args, "OKLLL:find_boundary", &data, &match,
+                          &chunkLen, &minSize, &maxSize) ||
+        getBufferView(data, &buf) < 0)
+    {
+        return NULL;
+    }
+    if (maxSize < 1)
+    {
+        PyBuffer_Release(&buf);
+        PyErr_SetString(PyExc_ValueError, "max_size must be >= 1");
+        return NULL;
+    }
+    if (rollingReady(self) < 0)
+    {
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+
+    save = releaseGil(buf.len);
+    found = rollingFind(self, buf.buf, buf.len, match, chunkLen, minSize,
+                        maxSize);
+    acquireGil(save);
+    rollingUnlock(self);
+
+    PyBuffer_Release(&buf);
+    return PyLong_FromSsize_t(found);
+}
+
+//-----------------------------------------------------------------------------
+// Add the data to the window up to the first window whose CRC may be in a set.
+// The set is given by a bitmap indexed by the low bits of the CRC, so the
+// candidates must be confirmed by the caller.  Safe to call without the GIL.
+static Py_ssize_t
+rollingMatch(RollingBaseObject* self, const UINT8* data, Py_ssize_t len,
+             const UINT8* bitmap, UINT64 bitMask, Py_ssize_t skip)
+{
+    const UINT64* table = self->table;
+    const UINT64* outTable = self->outTable;
+    UINT8* ring = self->ring;
+    Py_ssize_t window = self->window;
+    Py_ssize_t pos = self->ringPos;
+    UINT64 mask = WIDTH_MASK(self->width);
+    UINT64 reg = self->reg;
+    UINT64 base = self->base;
+    int shift = self->width - 8;
+    int rev = self->rev;
+    Py_ssize_t found = -1;
+    Py_ssize_t i;
+
+    for (i = 0; i < len; i++)
+    {
+        UINT64 bit;
+        UINT8 o;
+
+        ROLLING_OUT(o, i);
+        ROLLING_STEP(reg, data[i], o);
+
+        bit = (reg ^ base) & bitMask;
+        if ((bitmap[bit >> 3] & (1 << (bit & 7))) && i >= skip)
+        {
+            found = ++i;
+            break;
+        }
+    }
+
+    rollingKeep(self, data, i, pos);
+    self->reg = reg;
+    return found;
+}
+
+// Inputs:
+//   data - object supporting the buffer API
+//   bitmap - bytes-like object whose length is a power of two.  Bit n, the
+//            bit n % 8 of byte n / 8, is set if a CRC with low bits equal to n
+//            is in the set.
+//   skip - number of bytes at the start of the data where no match is
+//          reported
+// Returns:
+//   number of bytes added up to and including the last byte of the matching
+//   window, or -1 if all of the data was added without a match
+
+static PyObject*
+RollingBase_find_match(RollingBaseObject* self, PyObject* args)
+{
+    PyObject* data;
+    PyObject* bitmap;
+    Py_ssize_t skip = 0;
+    Py_buffer buf;
+    Py_buffer bitBuf;
+    PyThreadState* save;
+    Py_ssize_t found;
+
+    if (!PyArg_ParseTuple(args, "OO|n:find_match", &data, &bitmap, &skip) ||
+        getBufferView(data, &buf) < 0)
+    {
+        return NULL;
+    }
+    if (getBufferView(bitmap, &bitBuf) < 0)
+    {
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+    if (bitBuf.len == 0 || (bitBuf.len & (bitBuf.len - 1)) != 0)
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "the bitmap length must be a power of two");
+        PyBuffer_Release(&bitBuf);
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+    if (rollingReady(self) < 0)
+    {
+        PyBuffer_Release(&bitBuf);
+        PyBuffer_Release(&buf);
+        return NULL;
+    }
+
+    save = releaseGil(buf.len);
+    found = rollingMatch(self, buf.buf, buf.len, bitBuf.buf,
+                         (UINT64)bitBuf.len*8 - 1, skip);
+    acquireGil(save);
+    rollingUnlock(self);
+
+    PyBuffer_Release(&bitBuf);
+    PyBuffer_Release(&buf);
+    return PyLong_FromSsize_t(found);
+}
+
+static PyObject*
+RollingBase_copy(RollingBaseObject* self, PyObject* unused)
+{
+    PyTypeObject* type = Py_TYPE(self);
+    RollingBaseObject* n;
+
+    n = (RollingBaseObject*)type->tp_alloc(type, 0);
+    if (n == NULL)
+    {
+        return NULL;
+    }
+    n->lock = PyThread_allocate_lock();
+    if (n->lock == NULL)
+    {
+        Py_DECREF(n);
+        PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+        return NULL;
+    }
+    if (rollingReady(self) < 0)
+    {
+        Py_DECREF(n);
+        return NULL;
+    }
+    n->ring = PyMem_Malloc(self->window);
+    if (n->ring == NULL)
+    {
+        rollingUnlock(self);
+        Py_DECREF(n);
+        return PyErr_NoMemory();
+    }
+    memcpy(n->ring, self->ring, self->window);
+    n->ringPos = self->ringPos;
+    n->width = self->width;
+    n->rev = self->rev;
+    n->window = self->window;
+    n->reg = self->reg;
+    n->base = self->base;
+    memcpy(n->table, self->table, sizeof(self->table));
+    memcpy(n->outTable, self->outTable, sizeof(self->outTable));
+    rollingUnlock(self);
+    return (PyObject*)n;
+}
+
+static PyObject*
+RollingBase_reset(RollingBaseObject* self, PyObject* unused)
+{
+    if (rollingReady(self) < 0)
+    {
+        return NULL;
+    }
+    memset(self->ring, 0, self->window);
+    self->ringPos = 0;
+    self->reg = 0;
+    rollingUnlock(self);
+    Py_RETURN_NONE;
+}
+
+static PyObject*
+RollingBase_get_crcValue(RollingBaseObject* self, void* closure)
+{
+    UINT64 crc;
+
+    if (rollingReady(self) < 0)
+    {
+        return NULL;
+    }
+    crc = self->reg ^ self->base;
+    rollingUnlock(self);
+    return PyLong_FromUnsignedLongLong(crc);
+}
+
+static PyObject*
+RollingBase_get_reverse(RollingBaseObject* self, void* closure)
+{
+    return PyBool_FromLong(self->rev);
+}
+
+static PyMemberDef RollingBase_members[] = {
+{"width", T_INT, offsetof(RollingBaseObject, width), READONLY},
+{"window", T_PYSSIZET, offsetof(RollingBaseObject, window), READONLY},
+{NULL}
+};
+
+static PyGetSetDef RollingBase_getset[] = {
+{"crcValue", (getter)RollingBase_get_crcValue, NULL,
+ "CRC of the bytes in the window."},
+{"reverse", (getter)RollingBase_get_reverse},
+{NULL}
+};
+
+static PyMethodDef RollingBase_methods[] = {
+{"update", (PyCFunction)RollingBase_update, METH_O,
+ "update(data)\n\n"
+ "Add the data to the window."},
+{"roll_into", (PyCFunction)RollingBase_roll_into, METH_VARARGS,
+ "roll_into(data, out)\n\n"
+ "Add the data to the window and store the CRC of the window after each\n"
+ "byte in the writable buffer out, such as an array of the CRC size."},
+{"find_boundary", (PyCFunction)RollingBase_find_boundary, METH_VARARGS,
+ "find_boundary(data, mask, chunk_len, min_size, max_size) -> number of\n"
+ "bytes added up to the first content-defined chunk boundary, or -1."},
+{"find_match", (PyCFunction)RollingBase_find_match, METH_VARARGS,
+ "find_match(data, bitmap, skip=0) -> number of bytes added up to the first\n"
+ "window whose CRC may be in the set given by the bitmap, or -1."},
+{"copy", (PyCFunction)RollingBase_copy, METH_NOARGS,
+ "Create a new instance with the same window."},
+{"__copy__", (PyCFunction)RollingBase_copy, METH_NOARGS, NULL},
+{"reset", (PyCFunction)RollingBase_reset, METH_NOARGS,
+ "Fill the window with zero bytes."},
+{NULL, NULL}
+};
+
+static PyTypeObject RollingBaseType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "crcmod._crcfunext.RollingBase",    // tp_name
+    sizeof(RollingBaseObject),          // tp_basicsize
+    0,                                  // tp_itemsize
+    (destructor)RollingBase_dealloc,    // tp_dealloc
+    0,                                  // tp_vectorcall_offset
+    0,                                  // tp_getattr
+    0,                                  // tp_setattr
+    0,                                  // tp_as_async
+    0,                                  // tp_repr
+    0,                                  // tp_as_number
+    0,                                  // tp_as_sequence
+    0,                                  // tp_as_mapping
+    0,                                  // tp_hash
+    0,                                  // tp_call
+    0,                                  // tp_str
+    0,                                  // tp_getattro
+    0,                                  // tp_setattro
+    0,                                  // tp_as_buffer
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, // tp_flags
+    "Base type of crcmod.RollingCrc holding the window of a rolling CRC.", // tp_doc
+    0,                                  // tp_traverse
+    0,                                  // tp_clear
+    0,                                  // tp_richcompare
+    0,                                  // tp_weaklistoffset
+    0,                                  // tp_iter
+    0,                                  // tp_iternext
+    RollingBase_methods,                // tp_methods
+    RollingBase_members,                // tp_members
+    RollingBase_getset,                 // tp_getset
+    0,                                  // tp_base
+    0,                                  // tp_dict
+    0,                                  // tp_descr_get
+    0,                                  // tp_descr_set
+    0,                                  // tp_dictoffset
+    (initproc)RollingBase_init,         // tp_init
+    0,                                  // tp_alloc
+    PyType_GenericNew,                  // tp_new
+};
+
+//-----------------------------------------------------------------------------
+// Get and set the buffer size at which the CRC functions release the GIL.
+
+static PyObject*
+_getGilThreshold(PyObject* self, PyObject* args)
+{
+    return PyLong_FromSsize_t(gilThreshold);
+}
+
+static PyObject*
+_setGilThreshold(PyObject* self, PyObject* args)
+{
+    Py_ssize_t size;
+
+    if (!PyArg_ParseTuple(args, "n", &size))
+    {
+        return NULL;
+    }
+
+    if (size < 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "GIL threshold must be >= 0");
+        return NULL;
+    }
+
+    gilThreshold = size;
+
+    Py_RETURN_NONE;
+}
+
+//-----------------------------------------------------------------------------
+// Return the tables of a predefined algorithm as a read-only memoryview of the
+// packed tables and the bytes of the folding constants, or None if the tables
+// of the polynomial are not compiled in.
+
+static PyObject*
+_predefinedTable(PyObject* self, PyObject* args)
+{
+    UINT64 poly;
+    int width;
+    int rev;
+    const PredefinedTable* p;
+    PyObject* table;
+    PyObject* consts;
+
+    if (!PyArg_ParseTuple(args, "Kip", &poly, &width, &rev))
+    {
+        return NULL;
+    }
+
+    p = findPredefinedTable(poly, width, rev);
+    if (p == NULL)
+    {
+        Py_RETURN_NONE;
+    }
+
+    table = PyMemoryView_FromMemory((char*)p->table, p->tableLen, PyBUF_READ);
+    if (table == NULL)
+    {
+        return NULL;
+    }
+    consts = PyBytes_FromStringAndSize((const char*)p->consts,
+                                       FOLD_CONSTS*8);
+    if (consts == NULL)
+    {
+        Py_DECREF(table);
+        return NULL;
+    }
+    return Py_BuildValue("(NN)", table, consts);
+}
+
+//-----------------------------------------------------------------------------
+// Generate CRC tables, which is much faster than doing it in Python.  Table k
+// holds the CRC of each byte value followed by k zero bytes, the same as the
+// tables built by _mkTable, _mkTable_r and _mkSliceTables in crcmod.py.  Only
+// the entries of table 0 for single bits are computed bit by bit; the others
+// follow from the linearity of the CRC, T[a^b] = T[a]^T[b].  Each following
+// table is computed from the previous one by shifting in a zero byte.
+
+#define MAX_TABLE_SHIFT 65536
+
+static void
+mkTable(UINT64* table, UINT64 poly, int width, int rev)
+{
+    UINT64 mask = WIDTH_MASK(width);
+    UINT64 top = (UINT64)1 << (width - 1);
+    int i, j;
+
+    poly &= mask;
+    if (rev)
+    {
+        poly = reflect(poly, width);
+    }
+
+    table[0] = 0;
+    for (i = 0; i < 8; i++)
+    {
+        UINT64 crc = rev ? (UINT64)1 << i : (UINT64)1 << (width - 8 + i);
+        for (j = 0; j < 8; j++)
+        {
+            if (rev)
+            {
+                crc = (crc & 1) ? (crc >> 1) ^ poly : crc >> 1;
+            }
+            else
+            {
+                crc = (crc & top) ? ((crc << 1) ^ poly) & mask
+                                  : (crc << 1) & mask;
+            }
+        }
+        for (j = 0; j < (1 << i); j++)
+        {
+            table[(1 << i) + j] = table[j] ^ crc;
+        }
+    }
+}
+
+static void
+shiftTable(UINT64* next, const UINT64* table, int width, int rev)
+{
+    UINT64 mask = WIDTH_MASK(width);
+    int shift = width - 8;
+    int i;
+
+    for (i = 0; i < 256; i++)
+    {
+        UINT64 x = next[i];
+        if (rev)
+        {
+            next[i] = (x >> 8) ^ table[x & 0xFF];
+        }
+        else
+        {
+            next[i] = ((x << 8) & mask) ^ table[x >> shift];
+        }
+    }
+}
+
+static void
+packTable(UINT8* out, const UINT64* table, int entrySize)
+{
+    int i;
+
+    for (i = 0; i < 256; i++)
+    {
+        switch (entrySize)
+        {
+        case 1:
+            out[i] = (UINT8)table[i];
+            break;
+        case 2:
+            ((UINT16*)out)[i] = (UINT16)table[i];
+            break;
+        case 4:
+            ((UINT32*)out)[i] = (UINT32)table[i];
+            break;
+        default:
+            ((UINT64*)out)[i] = table[i];
+            break;
+        }
+    }
+}
+
+// Return the bytes of the tables with the numbers of zero bytes in the
+// sequence shifts, packed in that order with entries of the native size used
+// by the engines.
+static PyObject*
+_mkTables(PyObject* self, PyObject* args)
+{
+    UINT64 poly;
+    int width;
+    int rev;
+    PyObject* shifts;
+    PyObject* seq;
+    PyObject* result;
+    Py_ssize_t n, i;
+    long k, maxShift = 0;
+    long* ks;
+    int entrySize;
+    UINT64 table[256];
+    UINT64 cur[256];
+
+    if (!PyArg_ParseTuple(args, "KipO", &poly, &width, &rev, &shifts))
+    {
+        return NULL;
+    }
+    if (width != 8 && width != 16 && width != 24 && width != 32 &&
+        width != 64)
+    {
+        PyErr_SetString(PyExc_ValueError, "invalid CRC width");
+        return NULL;
+    }
+
+    seq = PySequence_Fast(shifts, "shifts must be a sequence");
+    if (seq == NULL)
+    {
+        return NULL;
+    }
+    n = PySequence_Fast_GET_SIZE(seq);
+    ks = PyMem_New(long, n ? n : 1);
+    if (ks == NULL)
+    {
+        Py_DECREF(seq);
+        return PyErr_NoMemory();
+    }
+    for (i = 0; i < n; i++)
+    {
+        k = PyLong_AsLong(PySequence_Fast_GET_ITEM(seq, i));
+        if (k == -1 && PyErr_Occurred())
+        {
+            goto error;
+        }
+        if (k < 0 || k > MAX_TABLE_SHIFT)
+        {
+            PyErr_SetString(PyExc_ValueError, "invalid table shift");
+            goto error;
+        }
+        ks[i] = k;
+        if (k > maxShift)
+        {
+            maxShift = k;
+        }
+    }
+    Py_CLEAR(seq);
+
+    entrySize = ENTRY_SIZE(width);
+    result = PyBytes_FromStringAndSize(NULL, n*256*entrySize);
+    if (result == NULL)
+    {
+        PyMem_Free(ks);
+        return NULL;
+    }
+
+    mkTable(table, poly, width, rev);
+    memcpy(cur, table, sizeof(cur));
+    for (k = 0; k <= maxShift; k++)
+    {
+        if (k > 0)
+        {
+            shiftTable(cur, table, width, rev);
+        }
+        for (i = 0; i < n; i++)
+        {
+            if (ks[i] == k)
+            {
+                packTable((UINT8*)PyBytes_AS_STRING(result) + i*256*entrySize,
+                          cur, entrySize);
+            }
+        }
+    }
+
+    PyMem_Free(ks);
+    return result;
+
+error:
+    Py_XDECREF(seq);
+    PyMem_Free(ks);
+    return NULL;
+}
+
+//-----------------------------------------------------------------------------
+static PyMethodDef methodTable[] = {
+{"_crc8", _crc8, METH_VARARGS},
+{"_crc8r", _crc8r, METH_VARARGS},
+{"_crc16", _crc16, METH_VARARGS},
+{"_crc16r", _crc16r, METH_VARARGS},
+{"_crc24", _crc24, METH_VARARGS},
+{"_crc24r", _crc24r, METH_VARARGS},
+{"_crc32", _crc32, METH_VARARGS},
+{"_crc32r", _crc32r, METH_VARARGS},
+{"_crc64", _crc64, METH_VARARGS},
+{"_crc64r", _crc64r, METH_VARARGS},
+{"_getGilThreshold", _getGilThreshold, METH_NOARGS},
+{"_setGilThreshold", _setGilThreshold, METH_VARARGS},
+{"_setParallelHook", _setParallelHook, METH_O},
+{"_predefinedTable", _predefinedTable, METH_VARARGS},
+{"_mkTables", _mkTables, METH_VARARGS},
+{NULL, NULL}
+};
+
+//-----------------------------------------------------------------------------
+static struct PyModuleDef moduleDef = {
+   PyModuleDef_HEAD_INIT,
+   "_crcfunext",  // name of module
+   NULL,          // module documentation, may be NULL
+   -1,            // size of per-interpreter state of the module,
+                  // or -1 if the module keeps state in global variables.
+   methodTable
+};
+
+//-----------------------------------------------------------------------------
+PyMODINIT_FUNC
+PyInit__crcfunext(void)
+{
+    PyObject* module;
+
+    if ((sizeof(UINT8) != 1) || (sizeof(UINT16) != 2) || 
+        (sizeof(UINT32) != 4) || (sizeof(UINT64) != 8))
+    {
+        Py_FatalError("crcfunext: One of the data types is invalid");
+    }
+
+#ifdef HAVE_X86_ENGINES
+    hasClmul = detectClmul();
+    hasCrc32c = detectCrc32c();
+    if (hasCrc32c)
+    {
+        crc32cZerosTable(crc32cLong, CRC32C_LONG);
+        crc32cZerosTable(crc32cShort, CRC32C_SHORT);
+    }
+#endif
+
+    if (PyType_Ready(&CrcEngineType) < 0 || PyType_Ready(&CrcBaseType) < 0 ||
+        PyType_Ready(&RollingBaseType) < 0)
+    {
+        return NULL;
+    }
+
+    module = PyModule_Create(&moduleDef);
+    if (module == NULL)
+    {
+        return NULL;
+    }
+
+    Py_INCREF(&CrcEngineType);
+    if (PyModule_AddObject(module, "CrcEngine", (PyObject*)&CrcEngineType) < 0)
+    {
+        Py_DECREF(&CrcEngineType);
+        Py_DECREF(module);
+        return NULL;
+    }
+
+    Py_INCREF(&CrcBaseType);
+    if (PyModule_AddObject(module, "CrcBase", (PyObject*)&CrcBaseType) < 0)
+    {
+        Py_DECREF(&CrcBaseType);
+        Py_DECREF(module);
+        return NULL;
+    }
+
+    Py_INCREF(&RollingBaseType);
+    if (PyModule_AddObject(module, "RollingBase",
+                           (PyObject*)&RollingBaseType) < 0)
+    {
+        Py_DECREF(&RollingBaseType);
+        Py_DECREF(module);
+        return NULL;
+    }
+
+    // Let the Python layer know which of the hardware engines are available.
+    if (PyModule_AddIntConstant(module, "_hasClmul", hasClmul) < 0 ||
+        PyModule_AddIntConstant(module, "_hasCrc32c", hasCrc32c) < 0)
+    {
+        Py_DECREF(module);
+        return NULL;
     }
 
-    return PyModule_Create(&moduleDef);
+    return module;
 }
 
@@ -0,0 +1,92 @@
+#-----------------------------------------------------------------------------
+# Generate the C header holding the tables of the algorithms in
+# crcmod.predefined, which are compiled into the extension module.  Run by
+# setup.py before the extension module is built:
+#
+#     python mktables.py _crctables.h
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#-----------------------------------------------------------------------------
+import os
+import struct
+import sys
+
+# Use the crcmod package next to this directory with the Python
+# implementation, since the extension module is what is being built.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+sys.modules['crcmod._crcfunext'] = None
+
+from crcmod.crcmod import _verifyPoly, _mkTable, _mkTable_r
+from crcmod.crcmod import _mkEngineTableList, _mkFoldConsts
+from crcmod.predefined import _crc_definitions_table
+
+_entryTypes = { 8: 'UINT8', 16: 'UINT16', 24: 'UINT32', 32: 'UINT32',
+                64: 'UINT64' }
+
+def _array(out, ctype, name, values, digits):
+    fmt = '0x%%0%dX' % digits
+    out.append('static const %s %s[%d] = {' % (ctype, name, len(values)))
+    perLine = max(1, 72 // (digits + 4))
+    for i in range(0, len(values), perLine):
+        out.append('    ' + ', '.join(fmt % v for v in values[i:i+perLine]) +
+                   ',')
+    out.append('};')
+    out.append('')
+
+def mkTables():
+    out = [
+        '// Automatically generated by mktables.py from the algorithms in',
+        '// crcmod/predefined.py.  Do not edit.',
+        '',
+    ]
+    entries = []
+    seen = set()
+    for definition in _crc_definitions_table:
+        poly, rev = definition[2], definition[3]
+        n = _verifyPoly(poly)
+        if (poly, n, rev) in seen:
+            continue
+        seen.add((poly, n, rev))
+
+        k = len(entries)
+        if rev:
+            table = _mkTable_r(poly, n)
+        else:
+            table = _mkTable(poly, n)
+        digits = (n + 3) // 4
+        _array(out, _entryTypes[n], 'predefinedTable%d' % k,
+               _mkEngineTableList(table, n, rev), digits)
+        consts = _mkFoldConsts(poly, n, rev)
+        _array(out, 'UINT64', 'predefinedConsts%d' % k,
+               struct.unpack('%dQ' % (len(consts) // 8), consts), 16)
+        entries.append('    {0x%XULL, %d, %d, predefinedTable%d, '
+                       'sizeof(predefinedTable%d), predefinedConsts%d},' %
+                       (poly & ((1 << n) - 1), n, int(rev), k, k, k))
+
+    out.append('static const PredefinedTable predefinedTables[] = {')
+    out.extend(entries)
+    out.append('};')
+    out.append('')
+    out.append('#define PREDEFINED_TABLES %d' % len(entries))
+    return '\n'.join(out) + '\n'
+
+if __name__ == '__main__':
+    with open(sys.argv[1], 'w') as f:
+        f.write(mkTables())
@@ -1,12 +1,31 @@
 from distutils.core import setup
 from distutils.extension import Extension
-import sys,os
+from distutils.command.build_ext import build_ext
+import sys,os,subprocess
 
 if sys.version_info[0] == 2:
     base_dir = 'python2'
 elif sys.version_info[0] == 3:
     base_dir = 'python3'
 
+class build_ext_tables(build_ext):
+    # Generate the tables of the algorithms in crcmod.predefined, which are
+    # compiled into the extension module.  The module is built without them if
+    # they cannot be generated.
+    def run(self):
+        if base_dir == 'python3':
+            src = os.path.join(base_dir, 'src')
+            try:
+                subprocess.check_call([sys.executable,
+                                       os.path.join(src, 'mktables.py'),
+                                       os.path.join(src, '_crctables.h')])
+            except (OSError, subprocess.CalledProcessError):
+                print('warning: the predefined CRC tables were not generated')
+            else:
+                for ext in self.extensions:
+                    ext.define_macros.append(('HAVE_PREDEFINED_TABLES', None))
+        build_ext.run(self)
+
 setup_dict = dict(
 name='crcmod',
 version='1.7',
@@ -22,8 +41,10 @@ package_dir={
 
 ext_modules=[ 
     Extension('crcmod._crcfunext', [os.path.join(base_dir,'src/_crcfunext.c'), ],
+    depends=[os.path.join(base_dir,'src/_crctables.h'), ],
     ),
 ],
+cmdclass={'build_ext' : build_ext_tables},
 
 long_description=open('README').read(),
 
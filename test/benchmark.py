@@ -0,0 +1,375 @@
+#-----------------------------------------------------------------------------
+# Benchmarks for crcmod.  Run all of them or only the named ones:
+#
+#     python benchmark.py [name ...]
+#
+# The results depend heavily on the machine, so they are only useful for
+# comparing changes on the same system.
+import sys
+import threading
+import time
+
+import crcmod
+import crcmod.predefined
+from crcmod.crcmod import _usingExtension
+
+benchmarks = []
+
+def benchmark(fun):
+    benchmarks.append(fun)
+    return fun
+
+def message(size):
+    return bytes(i*7 & 0xFF for i in range(256)) * (size // 256)
+
+def timeit(fun, minTime=0.5):
+    # Return the best time per call over enough calls to run for minTime.
+    best = None
+    total = 0.0
+    while total < minTime:
+        start = time.perf_counter()
+        fun()
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+#-----------------------------------------------------------------------------
+# Throughput of several threads computing the CRC of their own buffers.  The
+# extension module releases the GIL for large buffers, so this scales with the
+# number of cores.
+
+@benchmark
+def threads():
+    crcfun = crcmod.predefined.mkPredefinedCrcFun('crc-32')
+    msg = message(1 << 20)
+    calls = 32
+
+    def worker():
+        for i in range(calls):
+            crcfun(msg)
+
+    print('%-8s %10s %10s' % ('threads', 'MB/s', 'speedup'))
+    base = None
+    for nThreads in (1, 2, 4, 8):
+        def run():
+            ts = [ threading.Thread(target=worker) for i in range(nThreads) ]
+            for t in ts:
+                t.start()
+            for t in ts:
+                t.join()
+        rate = nThreads*calls*len(msg) / timeit(run) / 1e6
+        if base is None:
+            base = rate
+        print('%-8d %10.1f %10.2f' % (nThreads, rate, rate/base))
+
+#-----------------------------------------------------------------------------
+# Cost of a call with a short message.  The CrcEngine objects returned by
+# mkCrcFun are compared with calling the low level function through a Python
+# wrapper, which is how mkCrcFun worked before.
+
+@benchmark
+def calls():
+    from crcmod.crcmod import _sizeMap, _mkTable_r, _mkEngineTable
+
+    table = _mkTable_r(0x104C11DB7, 32)
+    if _usingExtension:
+        table = _mkEngineTable(table, 32, True)
+    def wrapper(data, crc=0, table=table, fun=_sizeMap[32][1]):
+        return 0xFFFFFFFF ^ fun(data, 0xFFFFFFFF ^ crc, table)
+
+    engine = crcmod.mkCrcFun(0x104C11DB7, initCrc=0, xorOut=0xFFFFFFFF)
+    msg = message(256)[:16]
+    calls = 100000
+
+    def run(fun):
+        def loop():
+            for i in range(calls):
+                fun(msg)
+        return timeit(loop) / calls * 1e9
+
+    print('%-10s %10s' % ('16 bytes', 'ns/call'))
+    print('%-10s %10.1f' % ('wrapper', run(wrapper)))
+    print('%-10s %10.1f' % ('engine', run(engine)))
+
+#-----------------------------------------------------------------------------
+# Throughput of the CRC of one large buffer computed with several threads.
+
+@benchmark
+def parallel():
+    crcfun = crcmod.predefined.mkPredefinedCrcFun('crc-32')
+    msg = message(64 << 20)
+
+    print('%-8s %10s %10s' % ('workers', 'MB/s', 'speedup'))
+    base = len(msg) / timeit(lambda: crcfun(msg)) / 1e6
+    print('%-8s %10.1f %10.2f' % ('serial', base, 1.0))
+    for workers in (2, 4, 8):
+        rate = len(msg) / timeit(lambda: crcfun.parallel(msg, workers=workers)) / 1e6
+        print('%-8d %10.1f %10.2f' % (workers, rate, rate/base))
+
+#-----------------------------------------------------------------------------
+# Throughput of the CRC of a file in the page cache read with Python read()
+# calls compared with the native file paths.
+
+@benchmark
+def files():
+    import os, tempfile
+    crcfun = crcmod.predefined.mkPredefinedCrcFun('crc-32')
+    fd, path = tempfile.mkstemp()
+    try:
+        os.write(fd, message(64 << 20))
+        size = os.fstat(fd).st_size
+
+        def pythonRead():
+            crc = crcfun.initCrc
+            with open(path, 'rb') as f:
+                for data in iter(lambda: f.read(1 << 20), b''):
+                    crc = crcfun(data, crc)
+            return crc
+
+        print('%-10s %10s' % ('method', 'MB/s'))
+        for name, fun in [ ('read', pythonRead),
+                           ('from_fd', lambda: crcfun.from_fd(fd)),
+                           ('mmap', lambda: crcfun.from_fd(fd, use_mmap=True)) ]:
+            print('%-10s %10.1f' % (name, size / timeit(fun) / 1e6))
+    finally:
+        os.close(fd)
+        os.unlink(path)
+
+#-----------------------------------------------------------------------------
+# Throughput of shutil.copyfileobj between in-memory files, plain and through
+# the crcmod.io wrappers, compared with copying and then computing the CRC.
+
+@benchmark
+def copy():
+    import io, shutil
+    import crcmod.io
+    msg = message(64 << 20)
+
+    def plain():
+        shutil.copyfileobj(io.BytesIO(msg), io.BytesIO())
+
+    def separate():
+        dst = io.BytesIO()
+        shutil.copyfileobj(io.BytesIO(msg), dst)
+        crcmod.predefined.PredefinedCrc('crc-32').update(dst.getbuffer())
+
+    def reader():
+        src = crcmod.io.CrcReader(io.BytesIO(msg),
+                                  crcmod.predefined.PredefinedCrc('crc-32'))
+        shutil.copyfileobj(src, io.BytesIO())
+
+    def writer():
+        dst = crcmod.io.CrcWriter(io.BytesIO(),
+                                  crcmod.predefined.PredefinedCrc('crc-32'))
+        shutil.copyfileobj(io.BytesIO(msg), dst)
+
+    print('%-10s %10s' % ('copy', 'MB/s'))
+    for name, fun in [ ('plain', plain), ('separate', separate),
+                       ('CrcReader', reader), ('CrcWriter', writer) ]:
+        print('%-10s %10.1f' % (name, len(msg) / timeit(fun) / 1e6))
+
+#-----------------------------------------------------------------------------
+# Throughput of the rolling CRC, which computes the CRC of the window at every
+# byte.  The cost per byte does not depend on the size of the window.
+
+@benchmark
+def rolling():
+    msg = message(16 << 20)
+
+    print('%-8s %10s' % ('window', 'MB/s'))
+    for window in (16, 48, 4096, 1 << 20):
+        r = crcmod.RollingCrc(0x11EDC6F41, window)
+        print('%-8d %10.1f' % (window, len(msg) / timeit(lambda: r.roll_many(msg)) / 1e6))
+
+#-----------------------------------------------------------------------------
+# Throughput of content-defined chunking, which finds the boundaries with the
+# rolling CRC and computes the CRC of each chunk.
+
+@benchmark
+def chunking():
+    import io, random
+    import crcmod.chunking
+    msg = random.Random(1).getrandbits(8 << 25).to_bytes(32 << 20, 'little')
+
+    def run():
+        for chunk in crcmod.chunking.chunk_stream(io.BytesIO(msg), 'crc-32c'):
+            pass
+
+    print('%-10s %10s' % ('chunking', 'MB/s'))
+    print('%-10s %10.1f' % ('8 KiB', len(msg) / timeit(run) / 1e6))
+
+#-----------------------------------------------------------------------------
+# Throughput of the delta of a file with a few changes from the signature of
+# the old version.  Most windows are rejected by the bitmap in the extension
+# module without being looked up.
+
+@benchmark
+def delta():
+    import io, random
+    import crcmod.delta
+    old = random.Random(1).getrandbits(8 << 25).to_bytes(32 << 20, 'little')
+    new = bytearray(old)
+    for pos in range(12345, len(new), 1 << 20):
+        new[pos:pos+100] = bytes(50)
+    new = bytes(new)
+
+    print('%-10s %10s' % ('block', 'MB/s'))
+    for size in (512, 4096):
+        sig = crcmod.delta.signature(io.BytesIO(old), size)
+        def run():
+            for instruction in crcmod.delta.delta(sig, io.BytesIO(new)):
+                pass
+        print('%-10d %10.1f' % (size, len(new) / timeit(run) / 1e6))
+
+#-----------------------------------------------------------------------------
+# Time to build the tables of a polynomial that is not cached or compiled in,
+# for each CRC width: the byte table built in Python and a complete CRC
+# function, which includes the slicing tables when the extension is used.
+
+@benchmark
+def tables():
+    from crcmod.crcmod import _mkTable_r
+    polys = { 8: 0x1A7, 16: 0x1C867, 24: 0x1D80C4F, 32: 0x1741B8CD7,
+              64: 0x1A17870F5D4F51B49 }
+
+    print('%-6s %12s %12s' % ('width', 'table us', 'mkCrcFun us'))
+    for width, poly in sorted(polys.items()):
+        def function():
+            crcmod.clearTableCache()
+            crcmod.mkCrcFun(poly)
+        print('%-6d %12.1f %12.1f' % (width,
+                                      timeit(lambda: _mkTable_r(poly, width)) * 1e6,
+                                      timeit(function) * 1e6))
+
+#-----------------------------------------------------------------------------
+# Time to import crcmod and crcmod.predefined in a new interpreter, as reported
+# by -X importtime, compared with importing zlib.  Exits with an error if
+# importing crcmod is over the budget checked by ImportTest in crcmod/test.py,
+# which also checks which modules are imported.
+
+@benchmark
+def imports():
+    from crcmod.test import importTime, importBudget
+
+    reference = importTime('zlib')
+    print('%-18s %10s %10s' % ('import', 'us', 'vs zlib'))
+    print('%-18s %10d' % ('zlib', reference))
+    for module in ('crcmod', 'crcmod.predefined'):
+        t = importTime(module)
+        print('%-18s %10d %10.2f' % (module, t, t/reference))
+        if module == 'crcmod' and t > importBudget*reference:
+            sys.exit('importing crcmod takes more than %d times as long as '
+                     'importing zlib' % importBudget)
+
+#-----------------------------------------------------------------------------
+# Throughput of the slicing-by-8 Python engine used when the extension module
+# is not available, compared with the byte-at-a-time loop, and its peak memory
+# compared with the previous loop that copied the whole buffer first.
+
+@benchmark
+def fallback():
+    import tracemalloc
+    from crcmod import _crcfunpy
+    from crcmod.crcmod import _mkTable, _mkTable_r, _mkSliceTables
+    msg = message(4 << 20)
+
+    def copyLoop(data, crc, table):
+        data = memoryview(data).tobytes()
+        crc = crc & 0xFFFFFFFF
+        for x in data:
+            crc = table[x ^ (crc & 0xFF)] ^ (crc >> 8)
+        return crc
+
+    def peak(fun):
+        tracemalloc.start()
+        fun()
+        size = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return size / 1e6
+
+    print('%-10s %10s %10s %10s' % ('width', 'byte MB/s', 'MB/s', 'speedup'))
+    for width, poly in ((16, 0x18005), (32, 0x104C11DB7),
+                        (64, 0x1AD93D23594C935A9)):
+        for rev in (False, True):
+            table = (_mkTable_r if rev else _mkTable)(poly, width)
+            byte = _crcfunpy._engineFuns[width][rev]
+            engine = _crcfunpy.CrcEngine(poly, _mkSliceTables(table, width, rev, 8),
+                                         width, rev, 0, 0)
+            byteRate = len(msg) / timeit(lambda: byte(msg, 0, table), 2.0) / 1e6
+            rate = len(msg) / timeit(lambda: engine(msg), 2.0) / 1e6
+            print('%-10s %10.1f %10.1f %10.2f' % ('%d%s' % (width, 'r' if rev else ''),
+                                                  byteRate, rate, rate/byteRate))
+
+    print()
+    print('%-10s %10s' % ('32r', 'peak MB'))
+    table = _mkTable_r(0x104C11DB7, 32)
+    engine = _crcfunpy.CrcEngine(0x104C11DB7, _mkSliceTables(table, 32, True, 8),
+                                 32, True, 0, 0)
+    print('%-10s %10.1f' % ('copy', peak(lambda: copyLoop(msg, 0, table))))
+    print('%-10s %10.1f' % ('engine', peak(lambda: engine(msg))))
+
+#-----------------------------------------------------------------------------
+# Throughput of the functions generated for each polynomial compared with the
+# generic slicing-by-8 loops of the Python engine.  The generated functions
+# are used on PyPy, so run this with both CPython and PyPy.
+
+@benchmark
+def specialized():
+    from crcmod import _crcfunpy
+    from crcmod.crcmod import _mkTable, _mkTable_r, _mkSliceTables
+    msg = message(4 << 20)
+
+    print('%-10s %10s %10s %10s' % (sys.implementation.name, 'MB/s',
+                                    'gen MB/s', 'speedup'))
+    for width, poly in ((16, 0x18005), (32, 0x104C11DB7),
+                        (64, 0x1AD93D23594C935A9)):
+        for rev in (False, True):
+            table = (_mkTable_r if rev else _mkTable)(poly, width)
+            slices = _mkSliceTables(table, width, rev, 8)
+            fun = _crcfunpy._mkSpecializedFun(
+                [ slices[256*k:256*(k+1)] for k in range(8) ], width, rev, poly)
+            generic = _crcfunpy.CrcEngine(poly, slices, width, rev, 0, 0)
+            engine = _crcfunpy.CrcEngine(poly, slices, width, rev, 0, 0,
+                                         fun=fun)
+            rate = len(msg) / timeit(lambda: generic(msg), 2.0) / 1e6
+            genRate = len(msg) / timeit(lambda: engine(msg), 2.0) / 1e6
+            print('%-10s %10.1f %10.1f %10.2f' % ('%d%s' % (width, 'r' if rev else ''),
+                                                  rate, genRate, genRate/rate))
+
+#-----------------------------------------------------------------------------
+# Throughput of the Python engine for the CRCs computed by the standard
+# library, with the generic loops and with the native routines.
+
+@benchmark
+def native():
+    from crcmod import _crcfunpy
+    from crcmod.crcmod import _mkTable, _mkTable_r, _mkSliceTables
+    msg = message(4 << 20)
+
+    print('%-10s %10s %12s %10s' % ('routine', 'MB/s', 'native MB/s', 'speedup'))
+    for name, poly, width, rev in (('zlib', 0x104C11DB7, 32, True),
+                                   ('binascii', 0x11021, 16, False)):
+        table = (_mkTable_r if rev else _mkTable)(poly, width)
+        slices = _mkSliceTables(table, width, rev, 8)
+        generic = _crcfunpy.CrcEngine(poly, slices, width, rev, 0, 0)
+        engine = _crcfunpy.CrcEngine(poly, slices, width, rev, 0, 0,
+                                     fun=_crcfunpy._mkNativeFun(poly, width, rev))
+        rate = len(msg) / timeit(lambda: generic(msg), 2.0) / 1e6
+        nativeRate = len(msg) / timeit(lambda: engine(msg)) / 1e6
+        print('%-10s %10.1f %12.1f %10.2f' % (name, rate, nativeRate,
+                                              nativeRate/rate))
+
+#-----------------------------------------------------------------------------
+def main(names):
+    print('Using extension:', _usingExtension)
+    for fun in benchmarks:
+        if names and fun.__name__ not in names:
+            continue
+        print()
+        print('--', fun.__name__)
+        fun()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])